@@ -0,0 +1,188 @@
+import cProfile
+import io
+import pstats
+import random
+import time
+from collections import deque
+
+
+class CallStats:
+    """
+    This class represent the counters of one call of an instrumented GraphAlgo method
+    (shortest_path, dijkstra, dfs, SCC, load_from_json), see StatsHook.
+    settled: the nodes settled by the search (popped with their final distance, or finished by the dfs),
+    for load_from_json the nodes read.
+    relaxed: the edges scanned from the settled nodes, for load_from_json the edges read.
+    pushes: the entries pushed into the queue (or the dfs stack).
+    stale_pops: the entries popped after their node was already settled (skipped).
+    seconds: the wall time of the call.
+    v_size, e_size: the size of the graph the call ran on.
+    """
+
+    __slots__ = ("name", "v_size", "e_size", "settled", "relaxed", "pushes", "stale_pops", "seconds")
+
+    def __init__(self, name: str, v_size: int = 0, e_size: int = 0):
+        self.name = name
+        self.v_size = v_size
+        self.e_size = e_size
+        self.settled = 0
+        self.relaxed = 0
+        self.pushes = 0
+        self.stale_pops = 0
+        self.seconds = 0.0
+
+    def counting(self, func):
+        """
+        Return func wrapped so each call adds one to pushes,
+        the algorithms push through it only when they are instrumented.
+        """
+        def counted(*args):
+            self.pushes += 1
+            return func(*args)
+        return counted
+
+    def add_search(self, pops: int, settled: int, degrees):
+        """
+        Add the counters of one search, found from its state at the end of the search.
+        :param pops: the number of entries popped by the search
+        :param settled: the number of nodes settled by the search
+        :param degrees: the out degree of each settled node whose edges were scanned
+        """
+        self.settled += settled
+        self.stale_pops += pops - settled
+        self.relaxed += int(sum(degrees))
+
+    def as_dict(self) -> dict:
+        """
+        :return: the counters as a dictionary
+        """
+        return {key: getattr(self, key) for key in CallStats.__slots__}
+
+    def __repr__(self) -> str:
+        return str(self.as_dict())
+
+
+class StatsHook:
+    """
+    This class represent the instrumentation hook of a GraphAlgo (see GraphAlgo.set_hook).
+    Every call of an instrumented method runs through run(), which passes a new CallStats to the algorithm,
+    measures the wall time and records the counters: the last calls are kept (calls), the totals by method
+    are summed (totals), and the callback (if given) is called with the CallStats of each call.
+    A GraphAlgo without a hook does not create or update any counter.
+    """
+
+    def __init__(self, callback=None, capacity: int = 1000):
+        """
+        :param callback: a function (CallStats) -> None called after each call
+        :param capacity: the number of the last calls that are kept
+        """
+        self.callback = callback
+        self.calls = deque(maxlen=capacity)
+        self.totals = {}
+
+    def run(self, name: str, graph, func, *args):
+        """
+        Call func(*args, stats) with a new CallStats, and record it.
+        :param name: the name of the method
+        :param graph: the graph the method runs on (None if it has no graph yet)
+        :param func: the algorithm, it takes the CallStats as its last argument
+        :return: the result of func
+        """
+        stats = self.new_stats(name, graph)
+        start = time.perf_counter()
+        try:
+            return func(*args, stats)
+        finally:
+            stats.seconds = time.perf_counter() - start
+            self.record(stats)
+
+    def new_stats(self, name: str, graph) -> CallStats:
+        """
+        Returns the CallStats of a new call of the method name on graph (None if it has no graph yet).
+        """
+        return CallStats(name, *((graph.v_size(), graph.e_size()) if graph is not None else ()))
+
+    def record(self, stats: CallStats):
+        """
+        Keep the counters of a call and add them to the totals of its method.
+        """
+        self.calls.append(stats)
+        total = self.totals.setdefault(stats.name, {"calls": 0, "settled": 0, "relaxed": 0, "pushes": 0,
+                                                    "stale_pops": 0, "seconds": 0.0})
+        total["calls"] += 1
+        for key in ("settled", "relaxed", "pushes", "stale_pops", "seconds"):
+            total[key] += getattr(stats, key)
+        if self.callback is not None:
+            self.callback(stats)
+
+    def reset(self):
+        """
+        Forget all the recorded calls and totals.
+        """
+        self.calls.clear()
+        self.totals.clear()
+
+
+class ProfileHook(StatsHook):
+    """
+    This class represent a StatsHook that also runs a sample of the calls under cProfile.
+    The profiles of the sampled calls are summed into one pstats.Stats (see get_profile).
+    A call made inside a profiled call (dijkstra called by a_star for example) is part of its profile.
+    """
+
+    def __init__(self, rate: float = 1.0, seed: int = None, callback=None, capacity: int = 1000):
+        """
+        :param rate: the fraction of the calls that are profiled (1 - all of them)
+        :param seed: the seed of the sampling
+        :param callback: a function (CallStats) -> None called after each call
+        :param capacity: the number of the last calls that are kept
+        """
+        super().__init__(callback, capacity)
+        self.rate = rate
+        self.profiled = 0
+        self.__random = random.Random(seed)
+        self.__profile = None
+        self.__active = False
+
+    def run(self, name: str, graph, func, *args):
+        """
+        Call func(*args, stats) with a new CallStats (see StatsHook.run), under cProfile if the call is sampled.
+        :return: the result of func
+        """
+        if self.__active or self.__random.random() >= self.rate:
+            return super().run(name, graph, func, *args)
+        profile = cProfile.Profile()
+        self.__active = True
+        profile.enable()
+        try:
+            return super().run(name, graph, func, *args)
+        finally:
+            profile.disable()
+            self.__active = False
+            self.profiled += 1
+            if self.__profile is None:
+                self.__profile = pstats.Stats(profile, stream=io.StringIO())
+            else:
+                self.__profile.add(profile)
+
+    def get_profile(self):
+        """
+        :return: the summed profile of the sampled calls (pstats.Stats), None if no call was profiled.
+        """
+        return self.__profile
+
+    def print_profile(self, sort: str = "cumulative", limit: int = 20, stream=None):
+        """
+        Print the functions of the summed profile, sorted by sort (a pstats sort key).
+        """
+        if self.__profile is not None:
+            self.__profile.stream = stream
+            self.__profile.sort_stats(sort).print_stats(limit)
+
+    def reset(self):
+        """
+        Forget all the recorded calls, totals and profiles.
+        """
+        super().reset()
+        self.profiled = 0
+        self.__profile = None
@@ -0,0 +1,401 @@
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from typing import List
+import GraphPool as graph_pool
+from AlgoStats import StatsHook
+from GraphAlgo import GraphAlgo
+from ResultCache import ResultCache
+
+
+class QueryToken:
+    """
+    This class represent the cancellation state of one running query: cancelled by its callers (cancel)
+    or past its deadline (a time.time() value, None for no deadline).
+    The searches of the query check it (see GraphAlgo.set_check) and stop by raising an exception.
+    """
+
+    def __init__(self, deadline: float = None):
+        self.deadline = deadline
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Stop the query at its next check.
+        """
+        self.cancelled = True
+
+    def extend(self, deadline: float):
+        """
+        Move the deadline to a later deadline (None - no deadline), for a caller that joins the query.
+        """
+        if self.deadline is not None:
+            self.deadline = None if deadline is None else max(self.deadline, deadline)
+
+    def check(self):
+        """
+        Raise CancelledError if the query was cancelled, TimeoutError if it is past its deadline.
+        """
+        if self.cancelled:
+            raise CancelledError('The query was cancelled')
+        if self.deadline is not None and time.time() > self.deadline:
+            raise TimeoutError('The query timed out')
+
+
+class WorkerToken(QueryToken):
+    """
+    This class represent the token of a query that runs in a worker process of the pool:
+    its callers cancel it by its flag in the memory shared with the workers (see GraphPool.submit_cancellable).
+    """
+
+    def __init__(self, deadline: float, flag: int):
+        super().__init__(deadline)
+        self.flag = flag
+
+    def check(self):
+        """
+        Raise CancelledError if the flag of the query was set, TimeoutError if it is past its deadline.
+        """
+        if graph_pool.flag_is_set(self.flag):
+            self.cancel()
+        super().check()
+
+
+def query_algo(graph, hook: StatsHook = None) -> GraphAlgo:
+    """
+    Returns a new GraphAlgo that runs queries on graph: with the hook (if given) and no result cache of its own
+    (the results are cached by AsyncGraphAlgo).
+    """
+    algo = GraphAlgo(graph)
+    algo.cache = ResultCache(capacity=0)
+    algo.set_hook(hook)
+    return algo
+
+
+def run_query(algo: GraphAlgo, token: QueryToken, name: str, args: tuple):
+    """
+    Run the GraphAlgo method name with args on algo, its searches check the token (see GraphAlgo.set_check).
+    :return: the result of the method
+    """
+    token.check()
+    algo.set_check(token.check)
+    try:
+        return getattr(algo, name)(*args)
+    finally:
+        algo.set_check(None)
+
+
+# the GraphAlgo of a worker process of the pool (see run_in_worker)
+worker_algo = None
+
+
+def run_in_worker(name: str, args: tuple, deadline: float, flag: int):
+    """
+    Runs in a worker process of the GraphPool of an AsyncGraphAlgo: one query on the graph of the worker,
+    stopped when its cancel flag is set or at the deadline.
+    """
+    global worker_algo
+    if worker_algo is None or worker_algo.get_graph() is not graph_pool.worker_graph:
+        worker_algo = query_algo(graph_pool.worker_graph)
+    return run_query(worker_algo, WorkerToken(deadline, flag), name, args)
+
+
+def start_pool(view, workers: int) -> (graph_pool.GraphPool, str):
+    """
+    Start a GraphPool of the view of the graph.
+    :return: the pool and the file name of its first version
+    """
+    pool = graph_pool.GraphPool(view, workers)
+    return pool, pool.get_file()
+
+
+def close_pool(future: asyncio.Future):
+    """
+    Done callback of the future of a GraphPool (and a version) that is not used anymore: close the pool in a thread,
+    which waits for the queries that still run in it.
+    """
+    if not future.cancelled() and future.exception() is None:
+        threading.Thread(target=future.result()[0].close, daemon=True).start()
+
+
+def remove_version(future: asyncio.Future):
+    """
+    Done callback of the future of an old version of the graph in a GraphPool: remove its file from the pool.
+    """
+    if not future.cancelled() and future.exception() is None:
+        pool, file_name = future.result()
+        pool.remove(file_name)
+
+
+class AsyncGraphAlgo:
+    """
+    This class represent an asyncio front-end of GraphAlgo: the queries run in an executor, so the event loop
+    is never blocked by a search.
+    executor="thread" - a pool of threads, each query runs on a snapshot of the graph (see DiGraph.snapshot)
+    taken when it is asked, so the graph may change while the queries run.
+    executor="process" - a pool of worker processes (see GraphPool) over a frozen copy of the graph,
+    the pool is started once (in a thread, not on the event loop) and a changed graph is written to it
+    as a new version.
+    The queries call the GraphAlgo methods, so they use its shortest paths trees and SCC index.
+    Identical queries on the same version of the graph that are in flight together run once,
+    and the results are cached (see ResultCache).
+    A query stops when all its callers were cancelled or timed out: the searches check the query token
+    (see GraphAlgo.set_check), in a process the token checks a cancel flag shared with the worker
+    (see WorkerToken) and the deadline.
+    """
+
+    def __init__(self, graph=None, executor="thread", workers: int = None, timeout: float = None,
+                 hook: StatsHook = None):
+        """
+        :param graph: a DiGraph, a CompactDiGraph or a GraphAlgo (its graph is used)
+        :param executor: "thread", "process" or a ThreadPoolExecutor to run the queries in
+        :param workers: the number of threads (default 1: the searches hold the GIL, more threads take turns
+        with the event loop and stall it longer) or processes (default: the number of CPUs)
+        :param timeout: the default timeout of the queries in seconds (None - no timeout)
+        :param hook: a StatsHook that records the searches of the queries that run in threads (None - not recorded)
+        """
+        self.graph = graph.get_graph() if hasattr(graph, "shortest_path") else graph
+        self.timeout = timeout
+        self.cache = ResultCache()
+        self.__workers = workers
+        self.__process = executor == "process"
+        self.__own_executor = isinstance(executor, str)
+        if executor == "thread":
+            self.__executor = ThreadPoolExecutor(workers or 1, thread_name_prefix="graph_query")
+        elif self.__process or not self.__own_executor:
+            self.__executor = None if self.__process else executor
+        else:
+            raise Exception('Unknown executor {}'.format(executor))
+        self.__pool, self.__version = None, None
+        self.__local = threading.local()
+        self.__hook = hook
+        self.__in_flight = {}
+        self.__stats = {"queries": 0, "computations": 0, "coalesced": 0, "cache_hits": 0, "cancelled": 0,
+                        "timeouts": 0}
+
+    def get_graph(self):
+        """
+        :return: the graph the queries run on.
+        """
+        return self.graph
+
+    def get_hook(self) -> StatsHook:
+        """
+        :return: the hook of the queries that run in threads (see StatsHook), None if they are not recorded.
+        """
+        return self.__hook
+
+    async def shortest_path(self, id1: int, id2: int, method: str = "auto", timeout: float = None) -> (float, list):
+        """
+        Returns the shortest path from node id1 to node id2 (see GraphAlgo.shortest_path),
+        the search of every method stops inside its loop when the query stops
+        (a contraction hierarchy that has to be built for method="ch" is built first).
+        @param timeout: the timeout in seconds, the default timeout if None
+        @return: The distance of the path, the path as a list
+        """
+        dist, path = await self.__query("shortest_path", (id1, id2, method), timeout, lambda r: len(r[1]))
+        return dist, list(path)
+
+    async def connected_component(self, id1: int, timeout: float = None) -> list:
+        """
+        Finds the Strongly Connected Component(SCC) that node id1 is a part of (see GraphAlgo.connected_component).
+        @param timeout: the timeout in seconds, the default timeout if None
+        @return: The list of nodes in the SCC
+        """
+        return list(await self.__query("connected_component", (id1,), timeout, len))
+
+    async def connected_components(self, timeout: float = None) -> List[list]:
+        """
+        Finds all the Strongly Connected Component(SCC) in the graph (see GraphAlgo.connected_components).
+        @param timeout: the timeout in seconds, the default timeout if None
+        @return: a list all SCCs
+        """
+        components = await self.__query("connected_components", (), timeout, lambda r: sum(map(len, r)) + len(r))
+        return [list(c) for c in components]
+
+    async def call(self, name: str, *args, timeout: float = None):
+        """
+        Run any GraphAlgo method by its name in the executor, for example: await aga.call("center_point").
+        The result is not cached (it may be shared by the identical calls in flight),
+        and only the searches that check (see GraphAlgo.set_check) stop when the call stops.
+        @param timeout: the timeout in seconds, the default timeout if None
+        @return: the result of the method
+        """
+        return await self.__query(name, args, timeout, None)
+
+    async def __query(self, name: str, args: tuple, timeout: float, size):
+        """
+        Run a query in the executor: a cached result is returned at once, an identical query in flight is
+        joined, otherwise the query is submitted with a new token.
+        The caller waits at most timeout seconds, the query itself is stopped when no caller waits for it.
+        :param size: a function (result) -> the number of node ids in it (see ResultCache), None - not cached
+        """
+        self.__stats["queries"] += 1
+        timeout = self.timeout if timeout is None else timeout
+        deadline = None if timeout is None else time.time() + timeout
+        graph, mc = self.graph, self.graph.get_mc()
+        key = (name, args)
+        if size is not None:
+            result = self.cache.get(graph, key)
+            if result is not None:
+                self.__stats["cache_hits"] += 1
+                return result
+        entry = self.__in_flight.get((key, mc))
+        if entry is not None and (not self.__process or entry["token"].deadline is None or
+                                  (deadline is not None and deadline <= entry["token"].deadline)):
+            entry["token"].extend(deadline)
+            self.__stats["coalesced"] += 1
+        else:
+            entry = self.__submit(name, args, deadline)
+            if size is not None:
+                entry["future"].add_done_callback(functools.partial(self.__cache_result, graph, mc, key, size))
+            if (key, mc) not in self.__in_flight:
+                self.__in_flight[(key, mc)] = entry
+                entry["future"].add_done_callback(functools.partial(self.__forget, (key, mc), entry))
+        entry["waiters"] += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(entry["future"]), timeout)
+        except asyncio.TimeoutError:
+            self.__stats["timeouts"] += 1
+            raise
+        except asyncio.CancelledError:
+            self.__stats["cancelled"] += 1
+            raise
+        finally:
+            entry["waiters"] -= 1
+            if not entry["waiters"] and not entry["future"].done():
+                entry["token"].cancel()
+                entry["future"].cancel()
+                self.__forget((key, mc), entry)
+
+    def __cache_result(self, graph, mc: int, key: tuple, size, future: asyncio.Future):
+        """
+        Done callback of a query: cache its result for the version (mc) of the graph it ran on,
+        unless the query was cancelled or failed.
+        """
+        if not future.cancelled() and future.exception() is None:
+            result = future.result()
+            self.cache.put(graph, mc, key, result, size(result))
+
+    def __forget(self, version_key: tuple, entry: dict, future: asyncio.Future = None):
+        """
+        Remove the entry of a query from the queries in flight (called when it is done or has no caller),
+        if a newer query of the same key did not replace it.
+        """
+        if self.__in_flight.get(version_key) is entry:
+            self.__in_flight.pop(version_key)
+
+    def __submit(self, name: str, args: tuple, deadline: float) -> dict:
+        """
+        Submit a query to the executor.
+        :return: the entry of the query: its (asyncio) future, its token and the number of its callers
+        """
+        self.__stats["computations"] += 1
+        token = QueryToken(deadline)
+        view = self.graph.snapshot() if hasattr(self.graph, "snapshot") else self.graph
+        if self.__process:
+            version = self.__get_version(view)
+            version["queries"] += 1
+            future = asyncio.ensure_future(self.__run_in_pool(version["pool"], name, args, deadline))
+            future.add_done_callback(functools.partial(self.__release, version))
+        else:
+            future = asyncio.wrap_future(self.__executor.submit(self.__run, view, name, args, token))
+        return {"future": future, "token": token, "waiters": 0}
+
+    def __run(self, view, name: str, args: tuple, token: QueryToken):
+        """
+        Runs in a thread of the executor: one query on the view of the graph, with the token of the query.
+        Each thread keeps a GraphAlgo of the last view it used, so the searches of a thread share its caches.
+        """
+        algo = getattr(self.__local, "algo", None)
+        if algo is None or algo.get_graph() is not view:
+            algo = self.__local.algo = query_algo(view, self.__hook)
+        return run_query(algo, token, name, args)
+
+    @staticmethod
+    async def __run_in_pool(version: asyncio.Future, name: str, args: tuple, deadline: float):
+        """
+        Wait for the version of the graph the query was asked on to be in the pool, then run the query in a worker.
+        When the query is cancelled its flag is set, so the search in the worker stops at its next check.
+        """
+        pool, file_name = await asyncio.shield(version)
+        future, cancel = pool.submit_cancellable(file_name, run_in_worker, name, args, deadline)
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            cancel()
+            raise
+
+    @staticmethod
+    async def __load(pool: asyncio.Future, view) -> (graph_pool.GraphPool, str):
+        """
+        Wait for the pool to start, then write view to it as a new version in a thread of the event loop executor.
+        """
+        pool, _ = await asyncio.shield(pool)
+        return pool, await asyncio.get_running_loop().run_in_executor(None, pool.load, view)
+
+    def __get_version(self, view) -> dict:
+        """
+        Returns the current version of the graph in the pool of processes: the future of (pool, file name)
+        and the number of its queries that are not done.
+        The pool is started from view (the snapshot of the graph) for the first version, and a changed graph is
+        written to the same pool as a new version (see GraphPool.load), in a thread of the event loop executor,
+        so freezing the graph and starting the processes do not block the loop.
+        The file of an old version is removed when its queries are done.
+        """
+        key = (self.graph, self.graph.get_mc())
+        version = self.__version
+        if version is not None and version["key"][0] is key[0] and version["key"][1] == key[1]:
+            return version
+        if self.__pool is None:
+            loop = asyncio.get_running_loop()
+            self.__pool = asyncio.ensure_future(loop.run_in_executor(None, start_pool, view, self.__workers))
+            self.__version = {"key": key, "pool": self.__pool, "queries": 0}
+        else:
+            self.__version = {"key": key, "pool": asyncio.ensure_future(self.__load(self.__pool, view)), "queries": 0}
+        if version is not None:
+            self.__release(version)
+        return self.__version
+
+    def __release(self, version: dict, future: asyncio.Future = None):
+        """
+        Done callback of a query in the pool (and called when its version gets old): remove the file of the version
+        from the pool when it is not the current version and its last query is done.
+        """
+        if future is not None:
+            version["queries"] -= 1
+        if version is not self.__version and not version["queries"]:
+            version["pool"].add_done_callback(remove_version)
+
+    def get_stats(self) -> dict:
+        """
+        :return: the counters of the queries: queries asked, computations submitted, queries that joined
+        an identical query in flight (coalesced), results from the cache, cancelled and timed out callers.
+        """
+        return dict(self.__stats, in_flight=len(self.__in_flight))
+
+    def close(self):
+        """
+        Stop the executor (the running queries are cancelled) and the pool of processes
+        (a pool that is still starting is closed when it is started).
+        """
+        for entry in self.__in_flight.values():
+            entry["token"].cancel()
+            entry["future"].cancel()
+        self.__in_flight.clear()
+        if self.__executor is not None and self.__own_executor:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+        if self.__pool is not None:
+            if not self.__pool.done():
+                self.__pool.add_done_callback(close_pool)
+            elif not self.__pool.cancelled() and self.__pool.exception() is None:
+                self.__pool.result()[0].close()
+            self.__pool, self.__version = None, None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,306 @@
+import struct
+import numpy as np
+from GraphInterface import GraphInterface
+from Node import Node
+
+
+class CompactDiGraph(GraphInterface):
+    """
+    This class represent a frozen (read only) directed weighted graph stored in compressed sparse arrays.
+    It implement GraphInterface abstract class, so it can be used everywhere a DiGraph is used for reading.
+    """
+
+    is_compact = True
+    # binary file: header (magic, version, |V|, |E|, mc) followed by the arrays, each one 8 bytes aligned
+    MAGIC = b'DIGRAPH\0'
+    VERSION = 1
+    HEADER = struct.Struct('<8sIQQQ')
+    LAYOUT = (("ids", np.int64, 'v'), ("pos", np.float64, 'v3'), ("out_offsets", np.int64, 'v1'),
+              ("out_targets", np.int32, 'e'), ("out_weights", np.float64, 'e'), ("in_offsets", np.int64, 'v1'),
+              ("in_sources", np.int32, 'e'), ("in_weights", np.float64, 'e'))
+
+    def __init__(self, ids, pos, out_offsets, out_targets, out_weights, in_offsets, in_sources, in_weights,
+                 mc: int = 0, index: dict = None):
+        """
+        Each CompactDiGraph holds the graph in NumPy arrays, every node is represented by his index (0..|V|-1):
+        ids: the node_id of each index.
+        index: a dictionary that holds the index of each node_id.
+        pos: a |V|x3 array of the nodes positions, a node without position is stored as NaN.
+        out_offsets, out_targets, out_weights: the edges that connected from each node (CSR),
+        the edges of node i are stored between out_offsets[i] and out_offsets[i+1].
+        in_offsets, in_sources, in_weights: the edges that connected to each node (CSC).
+        mc: the mode counter of the graph this graph was frozen from.
+        """
+        self.ids = ids
+        self.index = index if index is not None else {k: i for i, k in enumerate(ids.tolist())}
+        self.pos = pos
+        self.out_offsets = out_offsets
+        self.out_targets = out_targets
+        self.out_weights = out_weights
+        self.in_offsets = in_offsets
+        self.in_sources = in_sources
+        self.in_weights = in_weights
+        self.__mc = mc
+
+    @classmethod
+    def from_digraph(cls, graph):
+        """
+        Build a CompactDiGraph from a DiGraph.
+        The neighbors of each node are kept in the same order as in the original graph.
+        Complexity: O(|V|+|E|).
+        :param graph: the DiGraph to freeze
+        :return: a new CompactDiGraph
+        """
+        nodes = graph.get_all_v()
+        ids = np.fromiter(nodes.keys(), dtype=np.int64, count=len(nodes))
+        index = {k: i for i, k in enumerate(nodes.keys())}
+        pos = np.full((len(nodes), 3), np.nan)
+        for i, node in enumerate(nodes.values()):
+            if node.get_location() is not None:
+                pos[i] = node.get_location()
+
+        def build(get_connections):
+            offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+            targets, weights = [], []
+            for i, node in enumerate(nodes.values()):
+                connections = get_connections(node)
+                targets.extend(index[k] for k in connections.keys())
+                weights.extend(connections.values())
+                offsets[i + 1] = len(targets)
+            return offsets, np.array(targets, dtype=np.int32), np.array(weights, dtype=np.float64)
+
+        out_offsets, out_targets, out_weights = build(Node.get_connections_out)
+        in_offsets, in_sources, in_weights = build(Node.get_connections_in)
+        return cls(ids, pos, out_offsets, out_targets, out_weights, in_offsets, in_sources, in_weights,
+                   graph.get_mc(), index)
+
+    def v_size(self) -> int:
+        """
+        Returns the number of vertices in this graph
+        :return: The number of vertices in this graph
+        """
+        return len(self.ids)
+
+    def e_size(self) -> int:
+        """
+        Returns the number of edges in this graph
+        :return: The number of edges in this graph
+        """
+        return len(self.out_targets)
+
+    def get_all_v(self) -> dict:
+        """
+        Return a dictionary of all the nodes in the Graph,
+        each node is represented using a pair (node_id, Node).
+        Note: the nodes are built on demand, changing them does not change this graph.
+        :return: dictionary of all the nodes in the Graph
+        """
+        return {k: self.get_node(k) for k in self.ids.tolist()}
+
+    def all_in_edges_of_node(self, id1: int) -> dict:
+        """
+        Return a dictionary of all the nodes connected to (into) node_id ,
+        each node is represented using a pair (key, edge weight)
+        :return: return a dictionary of all the nodes connected to (into) node_id
+        """
+        if id1 not in self.index:
+            raise Exception('Node {} is not exist in the graph'.format(id1))
+        sources, weights = self.in_edges_at(self.index[id1])
+        return dict(zip(self.ids[sources].tolist(), weights))
+
+    def all_out_edges_of_node(self, id1: int) -> dict:
+        """
+        Return a dictionary of all the nodes connected from node_id ,
+        each node is represented using a pair (key, edge weight)
+        :return: return a dictionary of all the nodes connected from node_id
+        """
+        if id1 not in self.index:
+            raise Exception('Node {} is not exist in the graph'.format(id1))
+        targets, weights = self.out_edges_at(self.index[id1])
+        return dict(zip(self.ids[targets].tolist(), weights))
+
+    def out_edges_at(self, i: int) -> (list, list):
+        """
+        Return the edges that connected from the node in index i.
+        :param i: the node index
+        :return: a list of the dest indices and a list of the edges weights
+        """
+        a, b = self.out_offsets[i], self.out_offsets[i + 1]
+        return self.out_targets[a:b].tolist(), self.out_weights[a:b].tolist()
+
+    def in_edges_at(self, i: int) -> (list, list):
+        """
+        Return the edges that connected to the node in index i.
+        :param i: the node index
+        :return: a list of the src indices and a list of the edges weights
+        """
+        a, b = self.in_offsets[i], self.in_offsets[i + 1]
+        return self.in_sources[a:b].tolist(), self.in_weights[a:b].tolist()
+
+    def get_mc(self) -> int:
+        """
+        Returns the version of the graph this graph was frozen from.
+        :return: The version of this graph.
+        """
+        return self.__mc
+
+    def add_edge(self, id1: int, id2: int, weight: float) -> bool:
+        """
+        A frozen graph can not be changed, the method simply does nothing.
+        :return: False
+        """
+        return False
+
+    def add_node(self, node_id: int, pos: tuple = None) -> bool:
+        """
+        A frozen graph can not be changed, the method simply does nothing.
+        :return: False
+        """
+        return False
+
+    def remove_node(self, node_id: int) -> bool:
+        """
+        A frozen graph can not be changed, the method simply does nothing.
+        :return: False
+        """
+        return False
+
+    def remove_edge(self, node_id1: int, node_id2: int) -> bool:
+        """
+        A frozen graph can not be changed, the method simply does nothing.
+        :return: False
+        """
+        return False
+
+    def add_nodes_from(self, nodes) -> int:
+        """
+        A frozen graph can not be changed, the method simply does nothing.
+        :return: 0
+        """
+        return 0
+
+    def add_edges_from(self, edges) -> int:
+        """
+        A frozen graph can not be changed, the method simply does nothing.
+        :return: 0
+        """
+        return 0
+
+    def remove_edges_from(self, edges) -> int:
+        """
+        A frozen graph can not be changed, the method simply does nothing.
+        :return: 0
+        """
+        return 0
+
+    def get_node(self, node_id: int) -> Node:
+        """
+        Return the node by his key (node_id).
+        Note: the node is built on demand, changing it does not change this graph.
+        :param node_id: this node key
+        :return: the node by his key.
+        """
+        if node_id not in self.index:
+            raise Exception('Node {} is not exist in the graph'.format(node_id))
+        i = self.index[node_id]
+        loc = None if np.isnan(self.pos[i]).any() else tuple(self.pos[i].tolist())
+        n = Node(node_id, loc)
+        for k, w in self.all_out_edges_of_node(node_id).items():
+            n.add_neighbor_out(k, w)
+        for k, w in self.all_in_edges_of_node(node_id).items():
+            n.add_neighbor_in(k, w)
+        return n
+
+    def transpose(self):
+        """
+        Return transpose graph.
+        Meaning each edge in the original graph transpose (src-->dest)-->(src<--dest).
+        The transpose graph shares the arrays of this graph, so it costs O(1).
+        :return: the transpose graph
+        """
+        return CompactDiGraph(self.ids, self.pos, self.in_offsets, self.in_sources, self.in_weights,
+                              self.out_offsets, self.out_targets, self.out_weights, self.__mc, self.index)
+
+    def thaw(self):
+        """
+        Return a new (mutable) DiGraph with the same nodes and edges as this graph,
+        added by one add_nodes_from and one add_edges_from (the arrays are converted to lists at once).
+        :return: a new DiGraph
+        """
+        from DiGraph import DiGraph
+        gra = DiGraph()
+        ids, missing = self.ids.tolist(), np.isnan(self.pos).any(axis=1).tolist()
+        gra.add_nodes_from((k, None if gone else tuple(pos)) for k, gone, pos in zip(ids, missing, self.pos.tolist()))
+        sources = np.repeat(self.ids, np.diff(self.out_offsets)).tolist()
+        gra.add_edges_from(list(zip(sources, self.ids[self.out_targets].tolist(), self.out_weights.tolist())))
+        return gra
+
+    def save(self, file_name: str) -> None:
+        """
+        Write this graph to a binary file: a versioned header and then the arrays of the graph as is.
+        :param file_name: The path to the out file
+        """
+        with open(file_name, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, self.v_size(), self.e_size(), self.__mc))
+            for name, dtype, _ in self.LAYOUT:
+                f.write(b'\0' * (-f.tell() % 8))
+                f.write(np.ascontiguousarray(getattr(self, name), dtype=dtype).tobytes())
+
+    @classmethod
+    def load(cls, file_name: str):
+        """
+        Open a binary file that was written by save.
+        The arrays are memory mapped (read only) instead of read, so opening costs only building the
+        node_id index, and processes that open the same file share its pages.
+        :param file_name: The path to the binary file
+        :return: a CompactDiGraph backed by the file
+        """
+        data = np.memmap(file_name, dtype=np.uint8, mode='r')
+        if len(data) < cls.HEADER.size:
+            raise Exception('{} is not a binary graph file'.format(file_name))
+        magic, version, v, e, mc = cls.HEADER.unpack(data[:cls.HEADER.size].tobytes())
+        if magic != cls.MAGIC:
+            raise Exception('{} is not a binary graph file'.format(file_name))
+        if version != cls.VERSION:
+            raise Exception('Unsupported binary graph version {}'.format(version))
+        shapes = {'v': (v,), 'v3': (v, 3), 'v1': (v + 1,), 'e': (e,)}
+        arrays, offset = {}, cls.HEADER.size
+        for name, dtype, shape in cls.LAYOUT:
+            offset += -offset % 8
+            size = int(np.prod(shapes[shape])) * np.dtype(dtype).itemsize
+            if offset + size > len(data):
+                raise Exception('{} is truncated'.format(file_name))
+            arrays[name] = data[offset:offset + size].view(dtype).reshape(shapes[shape])
+            offset += size
+        return cls(mc=mc, **arrays)
+
+    def nbytes(self) -> int:
+        """
+        Return the number of bytes used by the arrays of this graph.
+        :return: the size of the arrays in bytes
+        """
+        return sum(a.nbytes for a in (self.ids, self.pos, self.out_offsets, self.out_targets, self.out_weights,
+                                      self.in_offsets, self.in_sources, self.in_weights))
+
+    def as_dict(self):
+        """
+        Return the graph as dictionary {"Edges": ...., "Nodes": ....}
+        :return: the graph as dictionary
+        """
+        return self.thaw().as_dict()
+
+    def __str__(self) -> str:
+        s = ''
+        for key in self.ids.tolist():
+            s += str(key) + ' : ' + str(self.get_node(key)) + '\n'
+        return s
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if other is None or self.__class__ is not other.__class__:
+            return False
+        return self.ids.tolist() == other.ids.tolist() and np.array_equal(self.pos, other.pos, equal_nan=True) \
+            and np.array_equal(self.out_offsets, other.out_offsets) \
+            and np.array_equal(self.out_targets, other.out_targets) \
+            and np.array_equal(self.out_weights, other.out_weights)
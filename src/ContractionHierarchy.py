@@ -0,0 +1,374 @@
+import heapq
+import zlib
+import numpy as np
+from numpy import inf
+from SearchCheck import checked
+
+
+class ContractionHierarchy:
+    """
+    This class represent a contraction hierarchy (CH) of a directed weighted graph, an index for fast shortest paths.
+    The nodes are contracted one by one (in order of importance): a contracted node is removed from the graph,
+    and a shortcut edge u-->w is added for each path u-->v-->w through it that is the only shortest path.
+    The rank of a node is the order it was contracted, so every shortest path has an "up then down" version
+    (by rank) made of edges and shortcuts, and a query only searches upward from both ends.
+    """
+
+    VERSION = 1
+
+    def __init__(self, ids: list, rank: list, up_out: list, up_in: list, middles: dict, fingerprint: int,
+                 graph=None, mc: int = None):
+        """
+        Each hierarchy holds lists indexed by the node index (0..|V|-1):
+        ids: the node_id of each index.
+        rank: the contraction order of each node, the nodes of the core (that were not contracted) share the top rank
+        (core_rank).
+        up_out: the edges (and shortcuts) from each node to higher ranked nodes, as a dictionary (dest, weight).
+        up_in: the edges (and shortcuts) to each node from higher ranked nodes, as a dictionary (src, weight).
+        In addition it holds the middle node of each shortcut (src, dest) --> middle, to unpack the paths,
+        a fingerprint of the nodes and edges it was built from, and the graph and mode counter (mc) it belongs to.
+        """
+        self.ids = ids
+        self.index = {k: i for i, k in enumerate(ids)}
+        self.rank = rank
+        self.core_rank = max(rank) if rank else 0
+        self.up_out = up_out
+        self.up_in = up_in
+        self.middles = middles
+        self.fingerprint = fingerprint
+        self.__graph = graph
+        self.__mc = mc if mc is not None else (graph.get_mc() if graph is not None else None)
+
+    @staticmethod
+    def edges_of(graph) -> (list, list):
+        """
+        Returns the node_ids of the graph and its out edges by node index.
+        :param graph: a DiGraph or a CompactDiGraph
+        :return: the node_ids, and a list (by node index) of dictionaries (dest index, weight)
+        """
+        ids = graph.ids.tolist() if getattr(graph, "is_compact", False) else list(graph.get_all_v().keys())
+        index = {k: i for i, k in enumerate(ids)}
+        return ids, [{index[k]: w for k, w in graph.all_out_edges_of_node(node_id).items()} for node_id in ids]
+
+    @staticmethod
+    def fingerprint_of(ids: list, out_edges: list) -> int:
+        """
+        Returns a checksum (crc32) of the nodes and the edges, to check that a saved hierarchy belongs to a graph.
+        """
+        crc = zlib.crc32(np.array(ids, dtype=np.int64).tobytes())
+        for i, edges in enumerate(out_edges):
+            crc = zlib.crc32(np.array(sorted(edges.items()), dtype=np.float64).tobytes(), crc)
+        return crc
+
+    @classmethod
+    def build(cls, graph, settle_limit: int = 64, core_growth: float = 1):
+        """
+        Build the hierarchy of a graph.
+        The next node to contract is the one with the smallest priority:
+        2 * (number of shortcuts it needs) - (number of its edges) + (number of its contracted neighbours)
+        + (its depth: the length of the longest chain of contracted neighbours below it).
+        The priorities are updated lazily: the popped node priority is computed again, and if it is not
+        the smallest anymore the node is pushed back. The first priorities count every path u-->v-->w as a shortcut,
+        so the witness searches run only for the popped nodes, not for all the nodes before the first contraction.
+        A shortcut u-->w for the path u-->v-->w is not needed if a witness search (Dijkstra from u without v,
+        that settles at most settle_limit nodes) finds a path that is not longer.
+        A limited search may miss a witness, it only adds a shortcut that is not needed.
+        The contraction stops when the remaining graph has more edges than core_growth times the edges of the graph,
+        as in random graphs where every contraction adds more shortcuts than it removes edges (on road like graphs
+        the number of edges only goes down). The remaining nodes are the core: they get the top rank and keep all
+        the edges between them, so a query searches the core with bidirectional Dijkstra.
+        :param graph: a DiGraph or a CompactDiGraph
+        :param settle_limit: the maximum number of nodes each witness search settles
+        :param core_growth: the edges of the remaining graph, relative to the graph, above which the contraction stops
+        :return: a new ContractionHierarchy
+        """
+        ids, out_edges = cls.edges_of(graph)
+        fingerprint = cls.fingerprint_of(ids, out_edges)
+        n = len(ids)
+        outs = [dict(edges) for edges in out_edges]
+        ins = [{} for _ in range(n)]
+        for i, edges in enumerate(out_edges):
+            for j, w in edges.items():
+                ins[j][i] = w
+        middles = {}
+        contracted = bytearray(n)
+        deleted_neighbours = [0] * n
+        depth = [0] * n
+        rank = [0] * n
+        up_out, up_in = [None] * n, [None] * n
+
+        def shortcuts(v):
+            result = []
+            for u, w_in in ins[v].items():
+                if not outs[v]:
+                    break
+                targets = {x: w_in + w_out for x, w_out in outs[v].items() if x != u}
+                if not targets:
+                    continue
+                witness = cls.__witness_search(outs, u, v, max(targets.values()), targets, settle_limit)
+                for x, length in targets.items():
+                    if witness.get(x, inf) > length:
+                        result.append((u, x, length))
+            return result
+
+        def priority(v, needed):
+            return 2 * len(needed) - len(ins[v]) - len(outs[v]) + deleted_neighbours[v] + depth[v]
+
+        # the first keys assume that every shortcut is needed (no witness search), an upper bound of the priority,
+        # so a node is searched only when it is popped, and a build that stops early searches few nodes
+        queue = [(2 * (len(ins[v]) * len(outs[v]) - len(ins[v].keys() & outs[v].keys())) - len(ins[v]) - len(outs[v]),
+                  v) for v in range(n)]
+        heapq.heapify(queue)
+        order = 0
+        edges_left = sum(len(edges) for edges in outs)
+        max_edges = core_growth * edges_left
+        while queue and edges_left <= max_edges:
+            _, v = heapq.heappop(queue)
+            if contracted[v]:
+                continue
+            needed = shortcuts(v)
+            p = priority(v, needed)
+            if queue and p > queue[0][0]:
+                heapq.heappush(queue, (p, v))
+                continue
+            for u, x, length in needed:
+                if length < outs[u].get(x, inf):
+                    edges_left += x not in outs[u]
+                    outs[u][x] = length
+                    ins[x][u] = length
+                    middles[(u, x)] = v
+            contracted[v] = 1
+            rank[v] = order
+            order += 1
+            edges_left -= len(outs[v]) + len(ins[v])
+            up_out[v], up_in[v] = outs[v], ins[v]
+            for x in outs[v]:
+                del ins[x][v]
+                deleted_neighbours[x] += 1
+                depth[x] = max(depth[x], depth[v] + 1)
+            for u in ins[v]:
+                del outs[u][v]
+                deleted_neighbours[u] += 1
+                depth[u] = max(depth[u], depth[v] + 1)
+        # the core: the nodes that were not contracted keep all the edges between them, with the same rank
+        for v in range(n):
+            if not contracted[v]:
+                rank[v] = order
+                up_out[v], up_in[v] = outs[v], ins[v]
+        return cls(ids, rank, up_out, up_in, middles, fingerprint, graph)
+
+    @staticmethod
+    def __witness_search(outs: list, u: int, v: int, max_length: float, targets: dict, settle_limit: int) -> dict:
+        """
+        Dijkstra from u over the remaining graph without v, that stops at max_length,
+        after settle_limit nodes, or when all the targets are settled.
+        :return: the distances that were found
+        """
+        distances = {u: 0}
+        queue = [(0, u)]
+        settled = 0
+        left = len(targets)
+        while queue and settled < settle_limit and left:
+            dist, current_node = heapq.heappop(queue)
+            if dist > distances[current_node]:
+                continue
+            if dist > max_length:
+                break
+            settled += 1
+            if current_node in targets:
+                left -= 1
+            for neighbour, w in outs[current_node].items():
+                if neighbour == v:
+                    continue
+                alternative_route = dist + w
+                if alternative_route < distances.get(neighbour, inf):
+                    distances[neighbour] = alternative_route
+                    heapq.heappush(queue, (alternative_route, neighbour))
+        return distances
+
+    def get_graph(self):
+        """
+        :return: the graph this hierarchy belongs to.
+        """
+        return self.__graph
+
+    def get_mc(self) -> int:
+        """
+        :return: the mode counter of the graph when this hierarchy was built (or loaded).
+        """
+        return self.__mc
+
+    def is_valid(self, graph) -> bool:
+        """
+        Check that this hierarchy can answer queries on the graph: the same graph, not changed since.
+        :param graph: a graph
+        :return: True if the hierarchy is up to date with the graph, False o.w.
+        """
+        return graph is self.__graph and graph.get_mc() == self.__mc
+
+    def shortest_path(self, src: int, dest: int, stats=None, check=None) -> (float, list):
+        """
+        The query runs in two phases.
+        Below the core: a bidirectional search that only goes up, forward from src over up_out and backward
+        from dest over up_in. A direction stops when its smallest queued distance is not smaller than the best path
+        found (the two searches do not run over the same edges, so only each direction alone bounds the paths),
+        and the core nodes it reaches are not expanded.
+        In the core: bidirectional Dijkstra from the core nodes that each direction reached (the core keeps its edges
+        in both directions), that stops when the sum of the two queue tops is not smaller than the best path
+        (see GraphAlgo.bidirectional_dijkstra), so a graph that is mostly core costs about as much as
+        bidirectional_dijkstra.
+        Last, the shortcuts of the best path are unpacked back into the original nodes.
+        :param src: the source node_id
+        :param dest: the destination node_id
+        :param stats: a CallStats the two searches are counted into (see AlgoStats), None to count nothing
+        :param check: a function () -> None called before every 64th pop (see GraphAlgo.set_check)
+        :return: The distance of the path, the path as a list (infinity and an empty list if there is no path)
+        """
+        s, t = self.index[src], self.index[dest]
+        if s == t:
+            return 0, [src]
+        push = heapq.heappush if stats is None else stats.counting(heapq.heappush)
+        pushed = stats.pushes if stats is not None else 0
+        pop = heapq.heappop if check is None else checked(heapq.heappop, check)
+        rank, core = self.rank, self.core_rank
+        distances = ({s: 0}, {t: 0})
+        parents = ({s: -1}, {t: -1})
+        below = ([(0, s)] if rank[s] < core else [], [(0, t)] if rank[t] < core else [])
+        initial = len(below[0]) + len(below[1])
+        edges = (self.up_out, self.up_in)
+        best, meeting = inf, -1
+        while (below[0] and below[0][0][0] < best) or (below[1] and below[1][0][0] < best):
+            for d in (0, 1):
+                queue = below[d]
+                if not queue or queue[0][0] >= best:
+                    continue
+                dist, current_node = pop(queue)
+                if dist > distances[d][current_node]:
+                    continue
+                other = distances[1 - d].get(current_node)
+                if other is not None and dist + other < best:
+                    best, meeting = dist + other, current_node
+                for neighbour, w in edges[d][current_node].items():
+                    alternative_route = dist + w
+                    if alternative_route < distances[d].get(neighbour, inf):
+                        distances[d][neighbour] = alternative_route
+                        parents[d][neighbour] = current_node
+                        if rank[neighbour] < core:
+                            push(queue, (alternative_route, neighbour))
+
+        queues = tuple([(dist, v) for v, dist in distances[d].items() if rank[v] == core] for d in (0, 1))
+        initial += len(queues[0]) + len(queues[1])
+        for d in (0, 1):
+            heapq.heapify(queues[d])
+        for dist, v in queues[0]:
+            if v in distances[1] and dist + distances[1][v] < best:
+                best, meeting = dist + distances[1][v], v
+        while queues[0] and queues[1]:
+            if queues[0][0][0] + queues[1][0][0] >= best:
+                break
+            d = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+            dist, current_node = pop(queues[d])
+            if dist > distances[d][current_node]:
+                continue
+            other_distances = distances[1 - d]
+            for neighbour, w in edges[d][current_node].items():
+                alternative_route = dist + w
+                if alternative_route < distances[d].get(neighbour, inf):
+                    distances[d][neighbour] = alternative_route
+                    parents[d][neighbour] = current_node
+                    push(queues[d], (alternative_route, neighbour))
+                if neighbour in other_distances:
+                    route = distances[d][neighbour] + other_distances[neighbour]
+                    if route < best:
+                        best, meeting = route, neighbour
+
+        if stats is not None:
+            live = [{v for dist, v in below[d] + queues[d] if dist == distances[d][v]} for d in (0, 1)]
+            settled = [[v for v in distances[d] if v not in live[d]] for d in (0, 1)]
+            stats.pushes += initial
+            stats.add_search(stats.pushes - pushed - sum(len(below[d]) + len(queues[d]) for d in (0, 1)),
+                             len(settled[0]) + len(settled[1]),
+                             (len(edges[d][v]) for d in (0, 1) for v in settled[d]))
+        if meeting == -1:
+            return inf, []
+        path, current_node = [], meeting
+        while current_node != -1:
+            path.append(current_node)
+            current_node = parents[0][current_node]
+        path.reverse()
+        current_node = parents[1][meeting]
+        while current_node != -1:
+            path.append(current_node)
+            current_node = parents[1][current_node]
+        return best, [self.ids[i] for i in self.unpack(path)]
+
+    def unpack(self, path: list) -> list:
+        """
+        Replace each shortcut of a path (of node indices) by the two edges it was made of, until no shortcut is left.
+        :param path: a path of node indices
+        :return: the path of node indices in the original graph
+        """
+        result = [path[0]]
+        stack = [(a, b) for a, b in zip(reversed(path[:-1]), reversed(path[1:]))]
+        while stack:
+            a, b = stack.pop()
+            middle = self.middles.get((a, b))
+            if middle is None:
+                result.append(b)
+            else:
+                stack.append((middle, b))
+                stack.append((a, middle))
+        return result
+
+    def save(self, file_name: str) -> None:
+        """
+        Write this hierarchy to a file (numpy .npz): the node_ids, the ranks, the upward edges and the shortcuts,
+        and the fingerprint of the graph.
+        :param file_name: The path to the out file
+        """
+        def csr(edges):
+            offsets = np.zeros(len(edges) + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum([len(e) for e in edges])
+            targets = np.fromiter((k for e in edges for k in e.keys()), dtype=np.int32, count=offsets[-1])
+            weights = np.fromiter((w for e in edges for w in e.values()), dtype=np.float64, count=offsets[-1])
+            return offsets, targets, weights
+
+        out_offsets, out_targets, out_weights = csr(self.up_out)
+        in_offsets, in_sources, in_weights = csr(self.up_in)
+        shortcuts = np.array([(a, b, m) for (a, b), m in self.middles.items()], dtype=np.int32).reshape(-1, 3)
+        with open(file_name, "wb") as f:
+            np.savez(f, version=self.VERSION, fingerprint=self.fingerprint, ids=np.array(self.ids, dtype=np.int64),
+                     rank=np.array(self.rank, dtype=np.int64), out_offsets=out_offsets, out_targets=out_targets,
+                     out_weights=out_weights, in_offsets=in_offsets, in_sources=in_sources, in_weights=in_weights,
+                     shortcuts=shortcuts)
+
+    @classmethod
+    def load(cls, file_name: str, graph):
+        """
+        Read a hierarchy that was written by save, for a graph.
+        :param file_name: The path to the file
+        :param graph: the graph the hierarchy was built for
+        :return: a ContractionHierarchy of the graph
+        """
+        with np.load(file_name) as data:
+            if int(data["version"]) != cls.VERSION:
+                raise Exception('Unsupported contraction hierarchy version {}'.format(int(data["version"])))
+            ids, out_edges = cls.edges_of(graph)
+            if ids != data["ids"].tolist() or cls.fingerprint_of(ids, out_edges) != int(data["fingerprint"]):
+                raise Exception('{} is not a contraction hierarchy of this graph'.format(file_name))
+
+            def edges(offsets, targets, weights):
+                offsets, targets, weights = offsets.tolist(), targets.tolist(), weights.tolist()
+                return [dict(zip(targets[offsets[i]:offsets[i + 1]], weights[offsets[i]:offsets[i + 1]]))
+                        for i in range(len(offsets) - 1)]
+
+            middles = {(a, b): m for a, b, m in data["shortcuts"].tolist()}
+            return cls(ids, data["rank"].tolist(), edges(data["out_offsets"], data["out_targets"], data["out_weights"]),
+                       edges(data["in_offsets"], data["in_sources"], data["in_weights"]), middles,
+                       int(data["fingerprint"]), graph)
+
+    def shortcuts_count(self) -> int:
+        """
+        :return: the number of shortcuts in the hierarchy.
+        """
+        return len(self.middles)
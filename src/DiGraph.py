@@ -1,5 +1,9 @@
+import threading
+import weakref
 from GraphInterface import GraphInterface
-from Node import Node
+from GraphSnapshot import GraphSnapshot
+from LayeredDict import LayeredDict
+from Node import Coordinates, Node
 
 
 class DiGraph(GraphInterface):
@@ -9,11 +13,22 @@ class DiGraph(GraphInterface):
         """
         Each DiGraph contain dictionary of his nodes, and each node contain his edges.
         In addition each DiGraph holds the number of edges in the graph and a mode counter (mc)
-        that represent the number of changes (add node, add edge, remove node or remove edge) in the graph.
+        that represent the number of changes (add node, add edge, remove node or remove edge) in the graph,
+        and a list of listeners that are told about every change (see add_listener).
+        The changes are made under a lock, and the nodes are copied on write while a snapshot shares them
+        (see snapshot), the snapshots that share the layers of the nodes are held by weak references.
+        The positions of all the nodes are kept in one coordinates array (see Node and Coordinates),
+        the slots of a removed node are given to the next node that gets a position.
         """
         self.nodes = dict()
+        self.__coordinates = Coordinates()
         self.__mc = 0
         self.__num_of_edges = 0
+        self.__listeners = []
+        self.__lock = threading.RLock()
+        self.__snapshot = None
+        self.__readers = weakref.WeakValueDictionary()
+        self.__copied = None
 
     def v_size(self) -> int:
         """
@@ -65,6 +80,14 @@ class DiGraph(GraphInterface):
         """
         return self.__mc
 
+    def get_positions_version(self) -> int:
+        """
+        Returns the version of the positions of the nodes, it changes on every change of a position
+        (set_location, or a node added or removed with a position) while the mc does not (see Coordinates).
+        :return: The version of the positions
+        """
+        return self.__coordinates.version
+
     def add_edge(self, id1: int, id2: int, weight: float) -> bool:
         """
         Adds an edge to the graph.
@@ -75,19 +98,25 @@ class DiGraph(GraphInterface):
         Note: If the edge already exists or one of the nodes dose not exists, the method simply does nothing
         Note2: If the weight is not positive the method raises an exception
         """
-        if self.nodes.get(id1) is None or self.nodes.get(id2) is None:
-            return False
-        if id2 in self.get_node(id1).get_connections_out().keys():
-            return False
-        if weight < 0:
-            raise Exception('Edge weight must be positive')
-        if id1 == id2:
-            return False
-        self.nodes.get(id1).add_neighbor_out(id2, weight)
-        self.nodes.get(id2).add_neighbor_in(id1, weight)
-        self.__mc += 1
-        self.__num_of_edges += 1
-        return True
+        with self.__lock:
+            if self.nodes.get(id1) is None or self.nodes.get(id2) is None:
+                return False
+            if id2 in self.get_node(id1).get_connections_out().keys():
+                return False
+            if weight < 0:
+                raise Exception('Edge weight must be positive')
+            if id1 == id2:
+                return False
+            self.__write((id1, id2))
+            src, dest = self.nodes.get(id1), self.nodes.get(id2)
+            # the keys of the nodes are used, so the edges do not hold a copy of the ids (ints parsed from a file)
+            src.add_neighbor_out(dest.get_key(), weight)
+            dest.add_neighbor_in(src.get_key(), weight)
+            self.__mc += 1
+            self.__num_of_edges += 1
+            if self.__listeners:
+                self.__notify("add_edges", [(id1, id2)])
+            return True
 
     def add_node(self, node_id: int, pos: tuple = None) -> bool:
         """
@@ -97,35 +126,127 @@ class DiGraph(GraphInterface):
         :return: True if the node was added successfully, False o.w.
         Note: if the node id already exists, the method simply does nothing
         """
-        if node_id in self.nodes:
-            return False
-        n = Node(node_id, pos)
-        self.nodes[node_id] = n
-        self.__mc += 1
-        return True
+        with self.__lock:
+            if node_id in self.nodes:
+                return False
+            self.__write()
+            n = Node(node_id, pos, self.__coordinates)
+            self.nodes[node_id] = n
+            self.__mc += 1
+            if self.__listeners:
+                self.__notify("add_nodes", [node_id])
+            return True
+
+    def add_nodes_from(self, nodes) -> int:
+        """
+        Adds many nodes to the graph in one batch.
+        :param: nodes: an iterable of node_ids or (node_id, pos) pairs
+        :return: the number of nodes that were added
+        Note: nodes that already exist are skipped, the mc is increased once for the whole batch,
+        a batch that adds nothing does not write (see snapshot)
+        """
+        with self.__lock:
+            nodes = [item if isinstance(item, tuple) else (item, None) for item in nodes]
+            if self.__copied is not None and all(node_id in self.nodes for node_id, _ in nodes):
+                return 0
+            self.__write()
+            added = []
+            for node_id, pos in nodes:
+                if node_id not in self.nodes:
+                    self.nodes[node_id] = Node(node_id, pos, self.__coordinates)
+                    added.append(node_id)
+            if added:
+                self.__mc += 1
+                if self.__listeners:
+                    self.__notify("add_nodes", added)
+            return len(added)
+
+    def add_edges_from(self, edges) -> int:
+        """
+        Adds many edges to the graph in one batch.
+        The edges are checked in the order of add_edge: an edge with a missing node or that already exists is skipped
+        whatever its weight, and a negative weight of any other edge raises before any edge is added,
+        so such a batch changes nothing.
+        :param: edges: an iterable of (id1, id2, weight) triples
+        :return: the number of edges that were added
+        Note: edges that add_edge does not add (already exists, missing node, id1 == id2) are skipped,
+        the mc is increased once for the whole batch, a batch that adds nothing does not write (see snapshot)
+        Note2: If one of the weights is not positive the method raises an exception
+        The source node of the previous edge is reused (the edges of a file usually come grouped by source),
+        and the key and the in edges of each destination node are looked up once for the whole batch.
+        """
+        edges = edges if isinstance(edges, list) else list(edges)
+        with self.__lock:
+            if any(w < 0 for _, _, w in edges):
+                self.__check_weights(edges)
+            if self.__copied is not None and not any(self.__adds_edge(id1, id2) for id1, id2, _ in edges):
+                return 0
+            self.__write(k for id1, id2, _ in edges for k in (id1, id2))
+            nodes = self.nodes
+            listening = bool(self.__listeners)
+            added, count = [], 0
+            destinations = {}
+            last_id, src_key, connections_out = object(), None, None
+            for id1, id2, weight in edges:
+                if id1 != last_id:
+                    last_id, src = id1, nodes.get(id1)
+                    src_key, connections_out = (None, None) if src is None else (src.get_key(),
+                                                                                 src.get_connections_out())
+                if connections_out is None or id2 in connections_out or id1 == id2:
+                    continue
+                dest = destinations.get(id2)
+                if dest is None:
+                    node = nodes.get(id2)
+                    if node is None:
+                        continue
+                    dest = destinations[id2] = (node.get_key(), node.get_connections_in())
+                connections_out[dest[0]] = weight
+                dest[1][src_key] = weight
+                count += 1
+                if listening:
+                    added.append((id1, id2))
+            if count:
+                self.__mc += 1
+                self.__num_of_edges += count
+                if listening:
+                    self.__notify("add_edges", added)
+            return count
 
     def remove_node(self, node_id: int) -> bool:
         """
         Removes a node from the graph.
-        If there are edges that go in or out from this node, they will also be removed.
+        If there are edges that go in or out from this node, they will also be removed:
+        each edge is deleted from the dictionary of its other node, and the dictionaries of the removed node
+        are dropped with it, its position slots are reused by the next nodes (see Node.release).
+        Complexity: O(deg(node)).
         :param: node_id: The node ID
         :return: True if the node was removed successfully, False o.w.
-        Note: if the node id does not exists, the method simply does nothing
+        Note: if the node id does not exists, the method simply does nothing,
+        the mc is increased for each removed edge and once for the node,
+        the listeners are told about all the removed edges in one batch and then about the node
         """
-        if node_id not in self.nodes.keys():
-            return False
-        removed_node = self.nodes[node_id]
-        keys = ()
-        for x in removed_node.get_connections_out().keys():
-            keys += (x,)
-        [self.remove_edge(node_id, x) for x in keys]
-        keys = ()
-        for x in removed_node.get_connections_in().keys():
-            keys += (x,)
-        [self.remove_edge(x, node_id) for x in keys]
-        del self.nodes[node_id]
-        self.__mc += 1
-        return True
+        with self.__lock:
+            removed_node = self.nodes.get(node_id)
+            if removed_node is None:
+                return False
+            connections_out, connections_in = removed_node.get_connections_out(), removed_node.get_connections_in()
+            self.__write((*connections_out, *connections_in))
+            nodes = self.nodes
+            del nodes[node_id]
+            removed_node.release()
+            for x in connections_out:
+                del nodes[x].get_connections_in()[node_id]
+            for x in connections_in:
+                del nodes[x].get_connections_out()[node_id]
+            removed = len(connections_out) + len(connections_in)
+            self.__mc += removed + 1
+            self.__num_of_edges -= removed
+            if self.__listeners:
+                if removed:
+                    self.__notify("remove_edges", [(node_id, x) for x in connections_out] +
+                                  [(x, node_id) for x in connections_in])
+                self.__notify("remove_nodes", [node_id])
+            return True
 
     def remove_edge(self, node_id1: int, node_id2: int) -> bool:
         """
@@ -135,16 +256,184 @@ class DiGraph(GraphInterface):
         :return: True if the edge was removed successfully, False o.w.
         Note: If such an edge does not exists, the method simply does nothing
         """
-        if self.nodes.get(node_id1) is None or self.nodes.get(node_id2) is None:
-            return False
-        if node_id2 not in self.nodes.get(node_id1).get_connections_out():
-            return False
-        del self.nodes.get(node_id1).get_connections_out()[node_id2]
-        del self.nodes.get(node_id2).get_connections_in()[node_id1]
-        self.__mc += 1
-        self.__num_of_edges -= 1
+        with self.__lock:
+            if self.nodes.get(node_id1) is None or self.nodes.get(node_id2) is None:
+                return False
+            if node_id2 not in self.nodes.get(node_id1).get_connections_out():
+                return False
+            self.__write((node_id1, node_id2))
+            del self.nodes.get(node_id1).get_connections_out()[node_id2]
+            del self.nodes.get(node_id2).get_connections_in()[node_id1]
+            self.__mc += 1
+            self.__num_of_edges -= 1
+            if self.__listeners:
+                self.__notify("remove_edges", [(node_id1, node_id2)])
+            return True
+
+    def remove_edges_from(self, edges) -> int:
+        """
+        Removes many edges from the graph in one batch.
+        :param: edges: an iterable of (id1, id2) pairs, (id1, id2, weight) triples are accepted as well
+        :return: the number of edges that were removed
+        Note: edges that do not exist are skipped, the mc is increased once for the whole batch,
+        a batch that removes nothing does not write (see snapshot)
+        """
+        edges = edges if isinstance(edges, list) else list(edges)
+        with self.__lock:
+            if self.__copied is not None and not any(self.__has_edge(edge[0], edge[1]) for edge in edges):
+                return 0
+            self.__write(k for edge in edges for k in (edge[0], edge[1]))
+            nodes = self.nodes
+            removed = []
+            for edge in edges:
+                id1, id2 = edge[0], edge[1]
+                src, dest = nodes.get(id1), nodes.get(id2)
+                if src is None or dest is None:
+                    continue
+                connections_out = src.get_connections_out()
+                if id2 not in connections_out:
+                    continue
+                del connections_out[id2]
+                del dest.get_connections_in()[id1]
+                removed.append((id1, id2))
+            if removed:
+                self.__mc += 1
+                self.__num_of_edges -= len(removed)
+                if self.__listeners:
+                    self.__notify("remove_edges", removed)
+            return len(removed)
+
+    def set_location(self, node_id: int, pos: tuple) -> bool:
+        """
+        Sets the position of a node, the node is copied first if a snapshot holds it (see snapshot),
+        so the snapshots keep the old position.
+        :param: node_id: The node ID
+        :param: pos: The new position of the node (x, y, z), or None
+        :return: True if the position was set, False if the node does not exist
+        Note: a position is not a change of the graph, the mc is not increased
+        """
+        with self.__lock:
+            if node_id not in self.nodes:
+                return False
+            self.__write((node_id,))
+            self.nodes[node_id].set_location(pos)
+            return True
+
+    def snapshot(self):
+        """
+        Return a read only view of this graph at its current version (see GraphSnapshot),
+        for readers (GraphAlgo) that run while other threads change the graph.
+        The snapshot shares the nodes with the graph, so taking it costs O(1), and the same snapshot is returned
+        until the graph changes, as long as a reader holds it (the graph holds its snapshots by weak references).
+        After a snapshot was taken, the first change puts a new layer over the dictionary of the nodes
+        (see LayeredDict.on_top), so only the changed entries are written and the snapshot keeps the old dictionary,
+        and each node is copied before its first change (O(deg(node))), so the snapshot never sees a change.
+        A snapshot for every request with a writer in between costs O(changes) amortized, not O(|V|),
+        the lookups of the graph and its snapshots walk O(log |V|) layers.
+        Once no snapshot that shares the layers is left, the next change or snapshot applies the layers to the dict
+        at the bottom (see LayeredDict.collapse), so the lookups are back to the speed of a dict
+        (see benchmark_snapshot in Ex3_benchmark).
+        :return: a GraphSnapshot pinned to get_mc()
+        """
+        with self.__lock:
+            snapshot = self.__snapshot() if self.__snapshot is not None else None
+            if snapshot is None:
+                self.__snapshot = None
+                self.__collapse()
+                snapshot = GraphSnapshot(self.nodes, self.__mc, self.__num_of_edges)
+                self.__snapshot = weakref.ref(snapshot)
+                self.__copied = set()
+            return snapshot
+
+    def __write(self, node_ids=()) -> None:
+        """
+        Called with the lock held before every change: if the nodes are shared with a snapshot,
+        put a new layer over the dictionary of the nodes (once after each snapshot, see LayeredDict)
+        and copy the nodes that are about to change, if the snapshots were all dropped, collapse the layers instead
+        (see __collapse).
+        :param node_ids: the nodes whose edges are about to change (an iterable, read only if needed)
+        """
+        if self.__copied is None:
+            return
+        snapshot = self.__snapshot() if self.__snapshot is not None else None
+        self.__snapshot = None
+        if snapshot is not None:
+            self.nodes = LayeredDict.on_top(self.nodes)
+            self.__readers[id(snapshot)] = snapshot
+        elif self.__collapse():
+            return
+        nodes, copied = self.nodes, self.__copied
+        for node_id in node_ids:
+            if node_id not in copied and node_id in nodes:
+                nodes[node_id] = nodes[node_id].copy()
+                copied.add(node_id)
+
+    def __collapse(self) -> bool:
+        """
+        Called with the lock held and no snapshot of the current version: if no older snapshot shares the nodes
+        any more (the last one was dropped), apply the layers to the dict at the bottom (see LayeredDict.collapse)
+        and stop copying on write.
+        :return: True if the nodes are not shared any more, False o.w.
+        """
+        if self.__copied is None or self.__readers:
+            return self.__copied is None
+        if isinstance(self.nodes, LayeredDict):
+            self.nodes = self.nodes.collapse()
+        self.__copied = None
         return True
 
+    def __check_weights(self, edges: list) -> None:
+        """
+        Raises an exception if add_edge would raise on one of the edges when they are added one by one
+        (see add_edges_from): a negative weight of an edge between two nodes that is not an edge yet.
+        :param edges: a list of (id1, id2, weight) triples
+        """
+        nodes, added = self.nodes, set()
+        for id1, id2, weight in edges:
+            src = nodes.get(id1)
+            if src is None or id2 not in nodes or id2 in src.get_connections_out() or (id1, id2) in added:
+                continue
+            if weight < 0:
+                raise Exception('Edge weight must be positive')
+            if id1 != id2:
+                added.add((id1, id2))
+
+    def __adds_edge(self, id1, id2) -> bool:
+        """
+        :return: True if add_edge would add the edge id1 -> id2 (both nodes exist, a new edge, id1 != id2)
+        """
+        src = self.nodes.get(id1)
+        return src is not None and id1 != id2 and id2 in self.nodes and id2 not in src.get_connections_out()
+
+    def __has_edge(self, id1, id2) -> bool:
+        """
+        :return: True if the edge id1 -> id2 exists (both nodes exist)
+        """
+        src = self.nodes.get(id1)
+        return src is not None and id2 in self.nodes and id2 in src.get_connections_out()
+
+    def add_listener(self, listener) -> None:
+        """
+        Register a listener that is called after every change in the graph as listener(change, items):
+        "add_nodes" / "remove_nodes" with a list of node_ids,
+        "add_edges" / "remove_edges" with a list of (src, dest) pairs.
+        A batch method calls the listener once for the whole batch.
+        :param listener: a function (str, list) -> None
+        """
+        self.__listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+        """
+        Unregister a listener that was registered by add_listener.
+        :param listener: the listener to remove
+        """
+        if listener in self.__listeners:
+            self.__listeners.remove(listener)
+
+    def __notify(self, change: str, items: list) -> None:
+        for listener in tuple(self.__listeners):
+            listener(change, items)
+
     def get_node(self, node_id: int) -> Node:
         """
         Return the node by his key (node_id).
@@ -155,6 +444,16 @@ class DiGraph(GraphInterface):
             raise Exception('Node {} is not exist in the graph'.format(node_id))
         return self.nodes[node_id]
 
+    def freeze(self):
+        """
+        Return a frozen copy of this graph stored in compressed sparse arrays (CompactDiGraph).
+        The frozen graph uses much less memory and GraphAlgo traverses it faster,
+        changes made to this graph after the call are not seen by the frozen graph.
+        :return: a CompactDiGraph with the same nodes and edges as this graph
+        """
+        from CompactDiGraph import CompactDiGraph
+        return CompactDiGraph.from_digraph(self)
+
     def as_dict(self):
         """
         Return the graph as dictionary {"Edges": ...., "Nodes": ....}
@@ -165,8 +464,7 @@ class DiGraph(GraphInterface):
         edge_list = []
         for k, v in self.nodes.items():
             node_list.append(v.as_dict_node())
-            for i in range(len(v.as_dict_edge())):
-                edge_list.append(v.as_dict_edge()[i])
+            edge_list.extend(v.as_dict_edge())
         m_dict["Edges"] = edge_list
         m_dict["Nodes"] = node_list
 
@@ -178,9 +476,27 @@ class DiGraph(GraphInterface):
             s += str(key) + ' : ' + str(value) + '\n'
         return s
 
+    def __getstate__(self) -> dict:
+        """
+        Return the state of the graph for pickle and copy: the nodes, the coordinates, the mc and the number of edges,
+        the lock, the listeners and the snapshot state belong to this graph only and are not copied.
+        """
+        return {"nodes": dict(self.nodes), "coordinates": self.__coordinates, "mc": self.__mc,
+                "num_of_edges": self.__num_of_edges}
+
+    def __setstate__(self, state: dict) -> None:
+        """
+        Restore a graph from the state of __getstate__, with a new lock and no listeners or snapshot.
+        """
+        self.__init__()
+        self.nodes = state["nodes"]
+        self.__coordinates = state["coordinates"]
+        self.__mc = state["mc"]
+        self.__num_of_edges = state["num_of_edges"]
+
     def __eq__(self, other):
         if self is other:
             return True
         if other is None or self.__class__ is not other.__class__:
             return False
-        return self.nodes.__eq__(other.nodes) and self.e_size() == other.e_size()
+        return self.nodes == other.nodes and self.e_size() == other.e_size()
@@ -0,0 +1,832 @@
+import argparse
+import asyncio
+import gc
+import glob
+import heapq
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from DiGraph import DiGraph
+from GraphAlgo import GraphAlgo
+from AlgoStats import StatsHook, ProfileHook
+from ResultCache import ResultCache
+from AsyncGraphAlgo import AsyncGraphAlgo
+from numpy import inf
+
+
+def random_pairs(ga: GraphAlgo, count: int, seed: int = 0) -> list:
+    """
+    Returns random (src, dest) pairs of nodes of the graph.
+    :param ga: a GraphAlgo that holds the graph
+    :param count: the number of pairs
+    :param seed: the seed of the random generator, the same seed gives the same pairs
+    :return: a list of (src, dest) pairs
+    """
+    rnd = random.Random(seed)
+    keys = sorted(ga.get_graph().get_all_v().keys())
+    return [(rnd.choice(keys), rnd.choice(keys)) for _ in range(count)]
+
+
+def timed(func, *args) -> float:
+    """
+    Returns the time (in seconds) a call to func(*args) takes.
+    """
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def percentile(values: list, p: float) -> float:
+    """
+    Returns the p percentile (0..100) of the values (nearest rank).
+    """
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def baseline_dijkstra(graph: DiGraph, src, dest) -> (float, list):
+    """
+    GraphAlgo.dijkstra as it was before the point to point fixes, kept here as the baseline of benchmark_dijkstra:
+    the destination check only leaves the neighbours loop (the search goes on over the whole graph),
+    stale queue entries are not skipped and the path is built by insert(0, ...).
+    """
+    distances = {node: inf for node in graph.nodes.keys()}
+    previous_nodes = {src: -1}
+    distances[src] = 0
+    queue = []
+    heapq.heappush(queue, (0, src))
+    while queue:
+        current_node = heapq.heappop(queue)[1]
+        if distances[current_node] == inf:
+            break
+        for neighbour, w in graph.nodes.get(current_node).get_connections_out().items():
+            alternative_route = distances[current_node] + w
+            if alternative_route < distances[neighbour]:
+                distances[neighbour] = alternative_route
+                previous_nodes[neighbour] = current_node
+                heapq.heappush(queue, (distances[neighbour], neighbour))
+            if current_node == dest:
+                break
+
+    path, current_node = [], dest
+    if distances[dest] == inf:
+        return inf, []
+    while current_node != -1:
+        path.insert(0, current_node)
+        current_node = previous_nodes[current_node]
+
+    return distances[dest], path
+
+
+def benchmark_dijkstra(file: str = '../data/G_10000_80000_0.json', count: int = 50, seed: int = 0):
+    """
+    Compare the point-to-point dijkstra (stops when the destination is reached, skips stale entries)
+    with the baseline dijkstra (see baseline_dijkstra) on random pairs, with the same dijkstra over the
+    frozen graph (CompactDiGraph), and with shortest_path (the lazy ShortestPathTree of the source, a new GraphAlgo for each query
+    so no tree or result is reused).
+    """
+    ga = GraphAlgo()
+    ga.load_from_json(file)
+    graph = ga.get_graph()
+    pairs = random_pairs(ga, count, seed)
+    for src, dest in pairs:
+        if baseline_dijkstra(graph, src, dest)[0] != ga.dijkstra(src, dest)[0]:
+            raise Exception('dijkstra and the baseline disagree on {} -> {}'.format(src, dest))
+
+    def baseline():
+        for src, dest in pairs:
+            baseline_dijkstra(graph, src, dest)
+
+    def point_to_point():
+        for src, dest in pairs:
+            ga.dijkstra(src, dest)
+
+    frozen = GraphAlgo(graph.freeze())
+
+    def compact():
+        for src, dest in pairs:
+            frozen.dijkstra(src, dest)
+
+    def tree():
+        for src, dest in pairs:
+            GraphAlgo(graph).shortest_path(src, dest)
+
+    old = timed(baseline)
+    print('dijkstra on {} ({} random pairs):'.format(file, count))
+    print('  baseline dijkstra : {:.2f} ms/query'.format(old * 1000 / count))
+    for name, run in (("point to point", point_to_point), ("compact", compact), ("shortest_path", tree)):
+        seconds = timed(run)
+        print('  {:<17} : {:.2f} ms/query ({:.1f}x)'.format(name, seconds * 1000 / count, old / seconds))
+
+
+def benchmark_bidirectional(file: str = '../data/G_10000_80000_0.json', count: int = 200, seed: int = 0):
+    """
+    Compare the latency (median and p99) of shortest_path with method="dijkstra" and method="bidirectional"
+    on random pairs, every query runs on a new GraphAlgo so no search is reused.
+    """
+    ga = GraphAlgo()
+    ga.load_from_json(file)
+    pairs = random_pairs(ga, count, seed)
+    print('shortest_path on {} ({} random pairs):'.format(file, count))
+    for method in ("dijkstra", "bidirectional"):
+        latencies = [timed(GraphAlgo(ga.get_graph()).shortest_path, src, dest, method) for src, dest in pairs]
+        print('  {:<14}: median {:.2f} ms, p99 {:.2f} ms'.format(method, percentile(latencies, 50) * 1000,
+                                                               percentile(latencies, 99) * 1000))
+
+
+def benchmark_astar(files: tuple = ('../data/A0', '../data/A1', '../data/A2', '../data/A3', '../data/A4',
+                                    '../data/A5')):
+    """
+    Compare dijkstra and a_star over all the pairs of nodes of the geometric graphs.
+    """
+    for file in files:
+        ga = GraphAlgo()
+        ga.load_from_json(file)
+        keys = list(ga.get_graph().get_all_v().keys())
+        pairs = [(src, dest) for src in keys for dest in keys if src != dest]
+        scale = ga.heuristic_scale()
+
+        def run(search):
+            for src, dest in pairs:
+                search(src, dest)
+
+        print('{} ({} pairs, heuristic scale {:.2f}): dijkstra {:.3f} ms/query, astar {:.3f} ms/query'.format(
+            file, len(pairs), scale, timed(run, ga.dijkstra) * 1000 / len(pairs),
+            timed(run, ga.a_star) * 1000 / len(pairs)))
+
+
+def measure_load(file: str) -> dict:
+    """
+    Load a graph file and return the load time, the peak of the memory allocated by python (tracemalloc)
+    and the peak resident set size (RSS) of the process before and after the load.
+    Should run in a new process (see benchmark_load), so the peaks belong to this load only.
+    """
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    tracemalloc.start()
+    start = time.perf_counter()
+    GraphAlgo().load_from_json(file)
+    seconds = time.perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # tracemalloc slows the load, so the time is measured again without it
+    seconds = min(seconds, timed(GraphAlgo().load_from_json, file))
+    return {"file": file, "seconds": seconds, "traced_peak": traced_peak, "rss_before": rss_before * 1024,
+            "rss_after": rss_after * 1024}
+
+
+def benchmark_load(files: list = None):
+    """
+    Measure load_from_json on every graph in data/, each file is loaded in a new process.
+    """
+    files = files or sorted(glob.glob('../data/G_*.json'), key=lambda file: (len(file), file))
+    context = multiprocessing.get_context("spawn")
+    print('load_from_json:')
+    for file in files:
+        with context.Pool(1) as pool:
+            result = pool.apply(measure_load, (file,))
+        print('  {:<32}: {:8.1f} ms, traced peak {:6.1f} MB, peak RSS {:6.1f} MB (+{:.1f} MB)'.format(
+            file, result["seconds"] * 1000, result["traced_peak"] / 2 ** 20, result["rss_after"] / 2 ** 20,
+            (result["rss_after"] - result["rss_before"]) / 2 ** 20))
+
+
+def retained_memory(file: str) -> int:
+    """
+    Returns the memory (in bytes, traced by tracemalloc) that a graph loaded by load_from_json holds.
+    """
+    tracemalloc.start()
+    ga = GraphAlgo()
+    ga.load_from_json(file)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size
+
+
+def benchmark_memory(file: str = '../data/G_10000_80000_0.json'):
+    """
+    Measure the memory of a loaded DiGraph in bytes for each node and for each edge:
+    the nodes are measured on a copy of the file without the edges, and the edges are the rest.
+    """
+    with open(file) as f:
+        graph = json.load(f)
+    v, e = len(graph["Nodes"]), len(graph["Edges"])
+    with tempfile.TemporaryDirectory() as tmp:
+        nodes_file = os.path.join(tmp, 'nodes.json')
+        with open(nodes_file, 'w') as f:
+            json.dump({"Edges": [], "Nodes": graph["Nodes"]}, f)
+        del graph
+        nodes = retained_memory(nodes_file)
+    total = retained_memory(file)
+    print('memory of {} (|V|={}, |E|={}): {:.1f} MB, {:.0f} bytes/node, {:.0f} bytes/edge'.format(
+        file, v, e, total / 2 ** 20, nodes / v, (total - nodes) / e))
+
+
+def benchmark_remove_node(degree: int = 20000):
+    """
+    Measure remove_node of a node with degree edges in and degree edges out.
+    """
+    gra = DiGraph()
+    gra.add_nodes_from(range(degree + 1))
+    gra.add_edges_from([(0, i, 1.0) for i in range(1, degree + 1)] + [(i, 0, 1.0) for i in range(1, degree + 1)])
+    print('remove_node with {} edges: {:.1f} ms'.format(2 * degree, timed(gra.remove_node, 0) * 1000))
+
+
+def benchmark_bulk(file: str = '../data/G_10000_80000_0.json', repeat: int = 5):
+    """
+    Compare building, transposing and clearing a graph one call at a time (add_node, add_edge, remove_edge)
+    with the batch methods (add_nodes_from, add_edges_from, remove_edges_from), the best of repeat runs.
+    """
+    with open(file) as f:
+        graph = json.load(f)
+    nodes = [node["id"] for node in graph["Nodes"]]
+    edges = [(edge["src"], edge["dest"], edge["w"]) for edge in graph["Edges"]]
+
+    def one_by_one():
+        gra = DiGraph()
+        for k in nodes:
+            gra.add_node(k)
+        for src, dest, w in edges:
+            gra.add_edge(src, dest, w)
+        return gra
+
+    def batch():
+        gra = DiGraph()
+        gra.add_nodes_from(nodes)
+        gra.add_edges_from(edges)
+        return gra
+
+    def transpose_one_by_one(gra):
+        transposed = DiGraph()
+        for k, v in gra.get_all_v().items():
+            transposed.add_node(k, v.get_location())
+        for k in transposed.get_all_v().keys():
+            for dest, w in gra.all_in_edges_of_node(k).items():
+                transposed.add_edge(k, dest, w)
+
+    def remove_one_by_one(gra):
+        for src, dest, _ in edges:
+            gra.remove_edge(src, dest)
+
+    def best(func, *args) -> float:
+        return min(timed(func, *args) for _ in range(repeat))
+
+    def best_remove(remove_edges) -> float:
+        return min(timed(remove_edges, batch()) for _ in range(repeat))
+
+    gra = batch()
+    print('bulk API on {} (|V|={}, |E|={}):'.format(file, len(nodes), len(edges)))
+    for name, (one, many) in (("build", (best(one_by_one), best(batch))),
+                              ("transpose", (best(transpose_one_by_one, gra), best(GraphAlgo(gra).transpose))),
+                              ("remove", (best_remove(remove_one_by_one),
+                                          best_remove(lambda g: g.remove_edges_from(edges))))):
+        print('  {:<9}: one by one {:7.1f} ms, batch {:7.1f} ms ({:.1f}x)'.format(name, one * 1000, many * 1000,
+                                                                                 one / many))
+
+
+def benchmark_snapshot(file: str = '../data/G_10000_80000_0.json', count: int = 2000, seed: int = 0):
+    """
+    Measure a snapshot for every request with a writer in between: count times snapshot() and one edge change,
+    with all the snapshots kept (layered) and with each snapshot dropped before the change (the layers are collapsed),
+    against a copy of the dictionary of the nodes for every snapshot (the O(|V|) copy on write it replaces),
+    and the lookups of all the nodes in the layered graph and in the graph once the snapshots are dropped,
+    against a plain dictionary.
+    """
+    ga = GraphAlgo()
+    ga.load_from_json(file)
+    graph = ga.get_graph()
+    keys = list(graph.get_all_v().keys())
+    rnd = random.Random(seed)
+    edges = [(rnd.choice(keys), rnd.choice(keys)) for _ in range(count)]
+
+    def change(src, dest):
+        if not graph.remove_edge(src, dest):
+            graph.add_edge(src, dest, 1)
+
+    def interleaved():
+        snapshots = []
+        for src, dest in edges:
+            snapshots.append(graph.snapshot())
+            change(src, dest)
+        return snapshots
+
+    def dropped():
+        for src, dest in edges:
+            graph.snapshot().get_mc()
+            change(src, dest)
+
+    def copy_per_snapshot(nodes):
+        for _ in edges:
+            dict(nodes)
+
+    def lookups(nodes):
+        for k in keys:
+            nodes[k]
+
+    snapshots = interleaved()
+    layered = timed(interleaved)
+    plain = dict(graph.get_all_v())
+    copied = timed(copy_per_snapshot, plain)
+    layered_lookup = timed(lookups, graph.get_all_v())
+    del snapshots
+    collapsed = timed(dropped)
+    print('snapshot + write ({}): layered {:.2f} us/request, dropped {:.2f} us/request, '
+          'a copy of the nodes {:.2f} us/request ({:.0f}x), lookups {:.2f} us/node layered, '
+          '{:.2f} us/node once dropped, {:.2f} us/node for a dict'.format(
+              file, layered * 1e6 / count, collapsed * 1e6 / count, copied * 1e6 / count, copied / layered,
+              layered_lookup * 1e6 / len(keys), timed(lookups, graph.get_all_v()) * 1e6 / len(keys),
+              timed(lookups, plain) * 1e6 / len(keys)))
+
+
+def benchmark_save(file: str = '../data/G_10000_80000_0.json', out: str = 'benchmark_save.json'):
+    """
+    Compare save_to_json (indented and compact) with dumping the whole graph dictionary
+    (json.dump of as_dict with indent=4, the previous way of saving).
+    """
+    ga = GraphAlgo()
+    ga.load_from_json(file)
+
+    def dump_as_dict():
+        with open(out, "w") as f:
+            json.dump(ga.get_graph(), default=lambda o: o.as_dict(), indent=4, fp=f)
+
+    print('save_to_json of {}:'.format(file))
+    for name, save in (("json.dump(as_dict)", dump_as_dict), ("save_to_json", lambda: ga.save_to_json(out)),
+                       ("save_to_json compact", lambda: ga.save_to_json(out, compact=True))):
+        seconds = timed(save)
+        print('  {:<21}: {:8.1f} ms, {:.1f} MB'.format(name, seconds * 1000, os.path.getsize(out) / 2 ** 20))
+    os.remove(out)
+
+
+def benchmark_scc(files: list = None, repeat: int = 3):
+    """
+    Compare SCC (Kosaraju, builds the transpose graph) with tarjan (one pass) on every graph in data/,
+    on the DiGraph and on its frozen copy. The best of repeat runs is taken.
+    """
+    files = files or sorted(glob.glob('../data/*'), key=lambda file: (len(file), file))
+    print('strongly connected components:')
+    for file in files:
+        ga = GraphAlgo()
+        ga.load_from_json(file)
+        frozen = GraphAlgo(ga.get_graph().freeze())
+        times = [min(timed(algorithm) for _ in range(repeat))
+                 for algorithm in (ga.SCC, ga.tarjan, frozen.SCC, frozen.tarjan)]
+        print('  {:<32}: kosaraju {:8.2f} ms, tarjan {:8.2f} ms ({:.1f}x) | frozen: kosaraju {:8.2f} ms, '
+              'tarjan {:8.2f} ms ({:.1f}x)'.format(file, times[0] * 1000, times[1] * 1000, times[0] / times[1],
+                                                    times[2] * 1000, times[3] * 1000, times[2] / times[3]))
+
+
+def benchmark_all_pairs(file: str = '../data/G_1000_8000_0.json', workers: tuple = None):
+    """
+    Measure all_pairs_shortest_paths with a growing number of worker processes,
+    and a full single source search (shortest_paths_from) from every node in this process.
+    """
+    ga = GraphAlgo()
+    ga.load_from_json(file)
+    cpus = os.cpu_count() or 1
+    workers = workers or tuple(sorted({1, max(1, cpus // 2), cpus}))
+
+    def tree_per_source():
+        for k in ga.get_graph().get_all_v():
+            GraphAlgo(ga.get_graph()).shortest_paths_from(k).distances()
+
+    base = timed(tree_per_source)
+    print('all pairs shortest paths of {} ({} CPUs):'.format(file, cpus))
+    print('  {:<21}: {:8.1f} ms'.format("shortest_paths_from", base * 1000))
+    for w in workers:
+        seconds = timed(ga.all_pairs_shortest_paths, w)
+        print('  {:<21}: {:8.1f} ms ({:.1f}x)'.format("{} workers".format(w), seconds * 1000, base / seconds))
+
+
+def benchmark_center(files: tuple = ('../data/G_1000_8000_0.json', '../data/G_1000_8000_1.json',
+                                     '../data/G_1000_8000_2.json')):
+    """
+    Compare center_point and diameter (pruned searches) with the brute force over the all pairs distance matrix.
+    """
+    print('center and diameter:')
+    for file in files:
+        ga = GraphAlgo()
+        ga.load_from_json(file)
+        brute = timed(lambda: ga.all_pairs_shortest_paths(workers=1).max(axis=1))
+        center, diameter = timed(ga.center_point), timed(ga.diameter)
+        print('  {:<32}: all pairs {:8.1f} ms, center_point {:6.1f} ms ({:.0f}x), diameter {:6.1f} ms ({:.0f}x)'.format(
+            file, brute * 1000, center * 1000, brute / center, diameter * 1000, brute / diameter))
+
+
+def grid_graph(side: int, seed: int = 0) -> DiGraph:
+    """
+    Returns a side x side grid (a road like graph): each node is connected to its 4 neighbours in both directions,
+    with random weights between 1 and 2.
+    """
+    rnd = random.Random(seed)
+    gra = DiGraph()
+    gra.add_nodes_from((i * side + j, (float(i), float(j), 0.0)) for i in range(side) for j in range(side))
+    gra.add_edges_from((i * side + j, a * side + b, 1 + rnd.random()) for i in range(side) for j in range(side)
+                       for a, b in ((i, j + 1), (i + 1, j), (i, j - 1), (i - 1, j)) if 0 <= a < side and 0 <= b < side)
+    return gra
+
+
+def benchmark_ch(files: tuple = ('../data/A5', '../data/G_1000_8000_0.json', '../data/G_10000_80000_0.json'),
+                 side: int = 50, count: int = 200, max_nodes: int = 20000):
+    """
+    Measure build_ch and compare the queries of the contraction hierarchy with bidirectional_dijkstra,
+    on a grid graph and on the given files. The two searches are timed without the cache of shortest_path,
+    the best of 3 runs, and a graph where the hierarchy is slower by more than 5% (the noise of the timing)
+    is marked with SLOWER. A graph with more than max_nodes nodes is skipped, so the build stays within seconds.
+    """
+    graphs = [('grid {}x{}'.format(side, side), grid_graph(side))]
+    for file in files:
+        ga = GraphAlgo()
+        ga.load_from_json(file)
+        graphs.append((file, ga.get_graph()))
+    print('contraction hierarchy:')
+    for name, gra in graphs:
+        if gra.v_size() > max_nodes:
+            print('  {:<32}: skipped ({} nodes, more than {})'.format(name, gra.v_size(), max_nodes))
+            continue
+        ga = GraphAlgo(gra)
+        pairs = random_pairs(ga, count)
+        build = timed(ga.build_ch)
+        hierarchy = ga.get_ch()
+        ch = min(timed(lambda: [hierarchy.shortest_path(src, dest) for src, dest in pairs]) for _ in range(3))
+        bidirectional = min(timed(lambda: [ga.bidirectional_dijkstra(src, dest) for src, dest in pairs])
+                            for _ in range(3))
+        core = sum(1 for r in hierarchy.rank if r == hierarchy.core_rank)
+        print('  {:<32}: build {:8.1f} ms ({} shortcuts, {} nodes in the core), ch {:.3f} ms/query, '
+              'bidirectional {:.3f} ms/query{}'.format(name, build * 1000, hierarchy.shortcuts_count(), core,
+                                                       ch * 1000 / count, bidirectional * 1000 / count,
+                                                       ' SLOWER' if ch > 1.05 * bidirectional else ''))
+
+
+def benchmark_alt(files: tuple = ('../data/A5', '../data/G_1000_8000_0.json', '../data/G_10000_80000_0.json'),
+                  count: int = 100, k: int = 16):
+    """
+    Measure build_landmarks and compare a_star guided by the landmarks with dijkstra, bidirectional_dijkstra
+    and a_star guided by the positions, and the time of estimate_distance.
+    """
+    print('landmarks (k={}):'.format(k))
+    for file in files:
+        ga = GraphAlgo()
+        ga.load_from_json(file)
+        pairs = random_pairs(ga, count)
+
+        def run(search):
+            for src, dest in pairs:
+                search(src, dest)
+
+        dijkstra, bidirectional, positions = timed(run, ga.dijkstra), timed(run, ga.bidirectional_dijkstra), \
+            timed(run, ga.a_star)
+        build = timed(ga.build_landmarks, k)
+        alt, estimate = timed(run, ga.a_star), timed(run, ga.estimate_distance)
+        print('  {:<32}: build {:7.1f} ms, dijkstra {:.3f}, bidirectional {:.3f}, astar (positions) {:.3f}, '
+              'astar (landmarks) {:.3f} ms/query, estimate {:.1f} us'.format(
+                file, build * 1000, dijkstra * 1000 / count, bidirectional * 1000 / count, positions * 1000 / count,
+                alt * 1000 / count, estimate * 10 ** 6 / count))
+
+
+def benchmark_plot(files: tuple = ('../data/A5', '../data/G_1000_8000_0.json', '../data/G_10000_80000_0.json')):
+    """
+    Measure plot_graph of each graph, rendered to a png file.
+    """
+    print('plot_graph (png):')
+    with tempfile.TemporaryDirectory() as tmp:
+        for file in files:
+            ga = GraphAlgo()
+            ga.load_from_json(file)
+            print('  {:<32}: {:.2f} s'.format(file, timed(ga.plot_graph, os.path.join(tmp, 'graph.png'))))
+
+
+def benchmark_stats(file: str = '../data/G_10000_80000_0.json', count: int = 100, repeat: int = 5):
+    """
+    Compare dijkstra and SCC without a hook, with a check and no hook (see GraphAlgo.set_check, as the queries
+    of AsyncGraphAlgo run), with a StatsHook and with a ProfileHook that profiles every call
+    (see GraphAlgo.set_hook). The best of repeat runs is taken.
+    """
+    ga = GraphAlgo()
+    ga.load_from_json(file)
+    pairs = random_pairs(ga, count)
+
+    def run():
+        for src, dest in pairs:
+            ga.dijkstra(src, dest)
+
+    print('instrumentation on {} ({} random pairs):'.format(file, count))
+    for name, hook, check in (("no hook", None, None), ("check", None, lambda: None),
+                              ("StatsHook", StatsHook(), None), ("ProfileHook", ProfileHook(), None)):
+        ga.set_hook(hook)
+        ga.set_check(check)
+        dijkstra = min(timed_runs(run, [()] * repeat))
+        scc = min(timed_runs(ga.SCC, [()] * repeat))
+        print('  {:<12}: dijkstra {:.2f} ms/query, SCC {:.1f} ms'.format(name, dijkstra * 1000 / count, scc * 1000))
+    totals = hook.totals["dijkstra"]
+    print('  dijkstra per query: settled {:.0f}, relaxed {:.0f}, pushes {:.0f}, stale pops {:.0f}'.format(
+        *(totals[key] / totals["calls"] for key in ("settled", "relaxed", "pushes", "stale_pops"))))
+
+
+def benchmark_cache(file: str = '../data/G_10000_80000_0.json', distinct: int = 200, count: int = 2000,
+                    seed: int = 0):
+    """
+    Compare shortest_path and connected_component with and without the result cache (ResultCache)
+    on a hot set of queries: count queries drawn from distinct pairs, the first pairs much more often (zipf like).
+    """
+    ga = GraphAlgo()
+    ga.load_from_json(file)
+    pairs = random_pairs(ga, distinct, seed)
+    rnd = random.Random(seed)
+    queries = rnd.choices(pairs, weights=[1 / (i + 1) for i in range(distinct)], k=count)
+    print('result cache on {} ({} queries of {} pairs):'.format(file, count, distinct))
+    for method in ("dijkstra", "bidirectional"):
+        for name, cache in (("no cache", ResultCache(capacity=0)), ("cache", ResultCache())):
+            ga = GraphAlgo(ga.get_graph())
+            ga.cache = cache
+
+            def run():
+                for src, dest in queries:
+                    ga.shortest_path(src, dest, method)
+                    ga.connected_component(src)
+
+            seconds = timed(run)
+            print('  {:<13} {:<8}: {:.3f} ms/query, {}'.format(method, name, seconds * 1000 / count,
+                                                              cache.get_stats()))
+
+
+def benchmark_async(file: str = '../data/G_10000_80000_0.json', count: int = 50, seed: int = 0):
+    """
+    Compare count shortest_path queries on an event loop: called on the loop (blocking) and awaited
+    from AsyncGraphAlgo (in a thread), by the total time and the median and longest stalls of a 1 ms ticker
+    on the loop, then count identical queries of a new pair at once (coalesced into one search).
+    """
+    ga = GraphAlgo()
+    ga.load_from_json(file)
+    pairs = random_pairs(ga, count, seed)
+    other = random_pairs(ga, 1, seed + 1)[0]
+
+    async def ticker(stalls: list):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - start - 0.001)
+
+    async def measure(queries):
+        stalls = []
+        tick = asyncio.ensure_future(ticker(stalls))
+        await asyncio.sleep(0.01)
+        start = time.perf_counter()
+        await queries()
+        seconds = time.perf_counter() - start
+        tick.cancel()
+        stalls.sort()
+        return seconds, stalls[len(stalls) // 2], stalls[-1]
+
+    async def blocking():
+        algo = GraphAlgo(ga.get_graph())
+        algo.cache = ResultCache(capacity=0)
+        for src, dest in pairs:
+            algo.shortest_path(src, dest)
+            await asyncio.sleep(0)
+
+    async def run():
+        print('asyncio front-end on {} ({} queries):'.format(file, count))
+        async with AsyncGraphAlgo(ga) as aga:
+            for name, queries in (("blocking", blocking),
+                                  ("async", lambda: asyncio.gather(*(aga.shortest_path(*p) for p in pairs))),
+                                  ("identical", lambda: asyncio.gather(*(aga.shortest_path(*other)
+                                                                         for _ in pairs)))):
+                seconds, median, longest = await measure(queries)
+                print('  {:<10}: {:.3f} s, loop stalls: median {:.1f} ms, longest {:.1f} ms'.format(
+                    name, seconds, median * 1000, longest * 1000))
+            print('  {}'.format(aga.get_stats()))
+
+    asyncio.run(run())
+
+
+def run_all():
+    """
+    Run all the benchmarks.
+    """
+    benchmark_dijkstra()
+    benchmark_bidirectional()
+    benchmark_astar()
+    benchmark_load()
+    benchmark_memory()
+    benchmark_remove_node()
+    benchmark_bulk()
+    benchmark_snapshot()
+    benchmark_save()
+    benchmark_scc()
+    benchmark_all_pairs()
+    benchmark_center()
+    benchmark_ch()
+    benchmark_alt()
+    benchmark_plot()
+    benchmark_stats()
+    benchmark_cache()
+    benchmark_async()
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+
+def traced_peak(func, *args) -> int:
+    """
+    Returns the peak of the memory (in bytes) allocated by python (tracemalloc) during a call to func(*args).
+    """
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def timed_runs(func, runs: list) -> list:
+    """
+    Returns the time (in seconds) of func(*args) for each args in runs.
+    Like timeit, the garbage collector is disabled while a call is timed (and runs between the calls),
+    so its pauses do not move the times between runs.
+    """
+    times = []
+    enabled = gc.isenabled()
+    try:
+        for args in runs:
+            gc.collect()
+            gc.disable()
+            times.append(timed(func, *args))
+            gc.enable()
+    finally:
+        if enabled:
+            gc.enable()
+        else:
+            gc.disable()
+    return times
+
+
+def calibrate(repeat: int = 5) -> float:
+    """
+    Returns the time (in seconds, the best of repeat runs) of a fixed pure python workload.
+    The speed of a shared machine changes from run to run, so compare divides the times of each run
+    by its calibration before it compares them.
+    """
+    def work():
+        counts = {}
+        for i in range(200000):
+            counts[i % 1000] = counts.get(i % 1000, 0) + i
+
+    return min(timed_runs(work, [()] * repeat))
+
+
+def summary(times: list, peak: int) -> dict:
+    """
+    Returns the statistics of the runs of one operation: median and p95 time (in seconds),
+    the number of runs and the peak memory (in bytes).
+    """
+    return {"median": percentile(times, 50), "p95": percentile(times, 95), "runs": len(times), "peak_memory": peak}
+
+
+def run_suite(files: list = None, count: int = 100, repeat: int = 5, seed: int = 0) -> dict:
+    """
+    Run the benchmark suite over every data/G_* graph: load_from_json, save_to_json, shortest_path on seeded
+    random pairs, connected_component on seeded random nodes and connected_components.
+    Every run is on a new GraphAlgo, so no search or component is reused between the runs.
+    The peak memory of each operation is measured by one more run under tracemalloc (it slows the run,
+    so it is not timed).
+    :param files: the graph files, all the data/G_* files by default
+    :param count: the number of random queries of shortest_path and connected_component
+    :param repeat: the number of runs of load_from_json, save_to_json and connected_components
+    :param seed: the seed of the random queries, the same seed gives the same queries
+    :return: the results as a dictionary {"meta": ..., "results": {file name: {operation: summary}}}
+    """
+    files = files or sorted(glob.glob(os.path.join(DATA_DIR, 'G_*.json')), key=lambda file: (len(file), file))
+    results, calibration = {}, {}
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, 'graph.json')
+        for file in files:
+            ga = GraphAlgo()
+            ga.load_from_json(file)
+            graph = ga.get_graph()
+            pairs = random_pairs(ga, count, seed)
+            nodes = [(src,) for src, dest in random_pairs(ga, count, seed + 1)]
+            calibration[os.path.basename(file)] = calibrate()
+            operations = {
+                "load_from_json": (lambda f: GraphAlgo().load_from_json(f), [(file,)] * repeat),
+                "save_to_json": (ga.save_to_json, [(out,)] * repeat),
+                "shortest_path": (lambda src, dest: GraphAlgo(graph).shortest_path(src, dest), pairs),
+                "connected_component": (lambda node: GraphAlgo(graph).connected_component(node), nodes),
+                "connected_components": (lambda: GraphAlgo(graph).connected_components(), [()] * repeat),
+            }
+            results[os.path.basename(file)] = {
+                name: summary(timed_runs(func, runs), traced_peak(func, *runs[0]))
+                for name, (func, runs) in operations.items() if runs}
+    meta = {"python": platform.python_version(), "platform": platform.platform(), "count": count,
+            "repeat": repeat, "seed": seed, "peak_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "date": time.strftime('%Y-%m-%dT%H:%M:%S'), "calibration": calibration}
+    return {"meta": meta, "results": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.5, floor: float = 0.0005) -> list:
+    """
+    Compare a run of the suite with a baseline run.
+    The baseline times are first scaled by the ratio of the median calibrations of the two runs (see calibrate),
+    so a slower machine does not look like a regression.
+    An operation regressed if its median time grew by more than tolerance (a fraction of the baseline)
+    and by more than floor seconds (the noise of the fastest operations), or if its peak memory grew by more
+    than tolerance. Operations that are only in one of the runs are ignored.
+    :param current: the results of run_suite
+    :param baseline: the results of a previous run_suite (see save_results)
+    :param tolerance: the allowed growth
+    :param floor: the smallest time difference (in seconds) that counts
+    :return: a list of messages, one for each regression (empty if nothing regressed)
+    """
+    calibrations = [list(run["meta"].get("calibration", {}).values()) for run in (current, baseline)]
+    scale = percentile(calibrations[0], 50) / percentile(calibrations[1], 50) if all(calibrations) else 1
+    regressions = []
+    for file, operations in current["results"].items():
+        for name, result in operations.items():
+            base = baseline["results"].get(file, {}).get(name)
+            if base is None:
+                continue
+            median = base["median"] * scale
+            if result["median"] > median * (1 + tolerance) and result["median"] - median > floor:
+                regressions.append('{} {}: median {:.3f} ms, baseline {:.3f} ms (x{:.2f} machine speed) '
+                                   '({:+.0%})'.format(file, name, result["median"] * 1000, base["median"] * 1000,
+                                                      scale, result["median"] / median - 1))
+            if result["peak_memory"] > base["peak_memory"] * (1 + tolerance):
+                regressions.append('{} {}: peak memory {:.1f} MB, baseline {:.1f} MB'.format(
+                    file, name, result["peak_memory"] / 2 ** 20, base["peak_memory"] / 2 ** 20))
+    return regressions
+
+
+def save_results(results: dict, file_name: str):
+    """
+    Write the results of run_suite to a json file.
+    """
+    with open(file_name, "w") as f:
+        json.dump(results, f, indent=4)
+
+
+def load_results(file_name: str) -> dict:
+    """
+    Read the results of run_suite from a json file.
+    """
+    with open(file_name) as f:
+        return json.load(f)
+
+
+def print_results(results: dict):
+    """
+    Print the results of run_suite as a table.
+    """
+    print('{:<22} {:<21} {:>11} {:>11} {:>5} {:>10}'.format('graph', 'operation', 'median(ms)', 'p95(ms)', 'runs',
+                                                             'peak(MB)'))
+    for file, operations in results["results"].items():
+        for name, result in operations.items():
+            print('{:<22} {:<21} {:>11.3f} {:>11.3f} {:>5} {:>10.2f}'.format(
+                file, name, result["median"] * 1000, result["p95"] * 1000, result["runs"],
+                result["peak_memory"] / 2 ** 20))
+    print('peak RSS {:.1f} MB'.format(results["meta"]["peak_rss"] / 2 ** 20))
+
+
+def main(argv: list = None) -> int:
+    """
+    The command line of the benchmarks:
+    python Ex3_benchmark.py - run all the benchmarks (benchmark_*) and print the comparisons.
+    python Ex3_benchmark.py suite [--out results.json] [--baseline baseline.json] - run the suite (run_suite),
+    write the results and fail (exit code 1) if an operation regressed against the baseline.
+    :return: the exit code
+    """
+    parser = argparse.ArgumentParser(description='Benchmarks of the graph algorithms over the data/ graphs.')
+    parser.add_argument('command', nargs='?', choices=('all', 'suite'), default='all')
+    parser.add_argument('--files', nargs='+', help='the graph files of the suite (default: data/G_*.json)')
+    parser.add_argument('--count', type=int, default=100, help='the number of random queries')
+    parser.add_argument('--repeat', type=int, default=5, help='the number of runs of the whole graph operations')
+    parser.add_argument('--seed', type=int, default=0, help='the seed of the random queries')
+    parser.add_argument('--out', help='write the results to this json file')
+    parser.add_argument('--baseline', help='compare the results with this json file (written by --out)')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='the allowed growth (default: 0.5)')
+    args = parser.parse_args(argv)
+    if args.command == 'all':
+        run_all()
+        return 0
+    results = run_suite(args.files, args.count, args.repeat, args.seed)
+    print_results(results)
+    if args.out:
+        save_results(results, args.out)
+    if args.baseline:
+        regressions = compare(results, load_results(args.baseline), args.tolerance)
+        for message in regressions:
+            print('REGRESSION ' + message, file=sys.stderr)
+        if regressions:
+            print('{} regressions against {}'.format(len(regressions), args.baseline), file=sys.stderr)
+            return 1
+        print('no regressions against {}'.format(args.baseline))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,28 @@
 import heapq
+import itertools
+import math
 import random
+import numpy as np
 from numpy import inf
 from GraphAlgoInterface import GraphAlgoInterface
 from DiGraph import DiGraph
+from Node import Node
+from CompactDiGraph import CompactDiGraph
+from JsonRecordReader import JsonRecordReader
+from ShortestPathTree import GraphEdges, ShortestPathTree
+from SCCIndex import SCCIndex
+from GraphPool import GraphPool, adjacency_of, distance_row, distance_rows
+from PathResult import PathResult
+from ContractionHierarchy import ContractionHierarchy
+from LandmarkIndex import LandmarkIndex
+from AlgoStats import StatsHook
+from SearchCheck import checked
+from ResultCache import ResultCache
+from collections import OrderedDict
 from typing import List
 import json
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 
 
 class GraphAlgo(GraphAlgoInterface):
@@ -17,6 +34,20 @@ class GraphAlgo(GraphAlgoInterface):
         :param digraph:
         """
         self.graph = digraph
+        self.trees_capacity = 32
+        self.tsp_exact_nodes = 12
+        self.tsp_beam_width = 256
+        self.__trees = OrderedDict()
+        self.__edges = None
+        self.__adjacency = None
+        self.__heuristic = None
+        self.__scc_index = None
+        self.__scc_algorithm = None
+        self.__ch = None
+        self.__landmarks = None
+        self.__hook = None
+        self.__check = None
+        self.cache = ResultCache()
 
     def get_graph(self) -> DiGraph:
         """
@@ -24,161 +55,1207 @@ class GraphAlgo(GraphAlgoInterface):
         """
         return self.graph
 
-    def load_from_json(self, file_name: str) -> bool:
+    def set_hook(self, hook: StatsHook = None) -> StatsHook:
+        """
+        Instrument shortest_path, dijkstra, dfs, SCC and load_from_json: each call runs through the hook
+        (see StatsHook), which records the nodes settled, the edges relaxed, the heap pushes, the stale pops
+        and the wall time of the call, and may run it under cProfile (see ProfileHook).
+        Without a hook (the default) the methods do not count anything.
+        @param hook: a StatsHook, or None to stop the instrumentation
+        @return: the hook
+        """
+        self.__hook = hook
+        return hook
+
+    def get_hook(self) -> StatsHook:
+        """
+        @return: the instrumentation hook (see set_hook), None if the methods are not instrumented.
+        """
+        return self.__hook
+
+    def set_check(self, check=None):
+        """
+        Make the searches stoppable: the searches of shortest_path (every method), dijkstra, tsp,
+        shortest_path_batch (in this process), SCC, tarjan, component_of and connected_component(s) call check()
+        every 64 steps of their loop,
+        and check raises an exception to stop the search (AsyncGraphAlgo checks the token of the query).
+        A heap search checks before it pops, so a stopped search leaves its ShortestPathTree consistent,
+        and a dfs checks before it expands a node.
+        The check is separate from the hook (see set_hook) and counts nothing,
+        without a check (the default) the searches call their steps directly.
+        @param check: a function () -> None, or None to stop checking
+        """
+        self.__check = check
+
+    def __checked(self, func):
+        """
+        Returns the step func of a search, with the check (see set_check) if there is one.
+        """
+        return func if self.__check is None else checked(func, self.__check)
+
+    def load_from_json(self, file_name: str, batch_size: int = 4096) -> bool:
         """
         Loads a graph from a json file.
+        The file is read incrementally (see JsonRecordReader), each node and edge record is decoded alone
+        and the records are inserted into the graph in batches (add_nodes_from, add_edges_from),
+        so the whole json tree is never held in memory.
+        Edges that appear before their nodes (the "Edges" array is first) are kept as (src, dest, w) tuples
+        until the nodes are added.
         @param file_name: The path to the json file
+        @param batch_size: The number of records in each batch
         @returns True if the loading was successful, False o.w.
         """
+        if self.__hook is not None:
+            return self.__hook.run("load_from_json", None, self.__load_from_json, file_name, batch_size)
+        return self.__load_from_json(file_name, batch_size)
+
+    def __load_from_json(self, file_name: str, batch_size: int = 4096, stats=None) -> bool:
+        """
+        Loads a graph from a json file (see load_from_json), and counts the nodes and edges read into stats.
+        """
         gra = DiGraph()
+        nodes = gra.get_all_v()
+        node_batch, edge_batch, pending_edges = [], [], []
         with open(file_name, "r") as f:
-            graph_dict = json.load(f)
-            for i in graph_dict.get("Nodes"):
-                if "pos" in i and len(i.get("pos")) > 0:
-                    pos = []
-                    pos_as_str = i.get("pos")
-                    arr = pos_as_str.split(',')
-                    for j in arr:
-                        pos.append(float(j))
-                    gra.add_node(int(i.get("id")), tuple(pos))
-                else:
-                    x = random.uniform(0, 100)
-                    y = random.uniform(0, 100)
-                    gra.add_node(int(i.get("id")), (x, y, 0))
-            for i in graph_dict.get("Edges"):
-                gra.add_edge(int(i.get("src")), int(i.get("dest")), float(i.get("w")))
+            for key, record in JsonRecordReader(f).records():
+                if key == "Nodes":
+                    node_batch.append((int(record["id"]), self.__position(record)))
+                    if len(node_batch) >= batch_size:
+                        gra.add_nodes_from(node_batch)
+                        node_batch = []
+                elif key == "Edges":
+                    edge = (int(record["src"]), int(record["dest"]), float(record["w"]))
+                    if edge[0] in nodes and edge[1] in nodes:
+                        edge_batch.append(edge)
+                        if len(edge_batch) >= batch_size:
+                            gra.add_edges_from(edge_batch)
+                            edge_batch = []
+                    else:
+                        pending_edges.append(edge)
+        gra.add_nodes_from(node_batch)
+        gra.add_edges_from(edge_batch)
+        gra.add_edges_from(pending_edges)
         self.graph = gra
+        if stats is not None:
+            stats.v_size, stats.e_size = gra.v_size(), gra.e_size()
+            stats.settled, stats.relaxed = stats.v_size, stats.e_size
         return True
 
-    def save_to_json(self, file_name: str) -> bool:
+    @staticmethod
+    def __position(record: dict) -> tuple:
+        """
+        Return the position of a node record ("pos": "x,y,z"),
+        a node without position is placed in a random location.
+        """
+        if "pos" in record and len(record.get("pos")) > 0:
+            return tuple(float(j) for j in record.get("pos").split(','))
+        return random.uniform(0, 100), random.uniform(0, 100), 0.0
+
+    def save_to_json(self, file_name: str, compact: bool = False) -> bool:
         """
         Saves the graph in JSON format to a file
+        The "Edges" and the "Nodes" records are encoded in batches and written straight to the file,
+        the whole graph is never built as one dictionary.
         @param file_name: The path to the out file
+        @param compact: False - indented output (4 spaces, as json.dump with indent=4),
+        True - no indentation and no spaces (the format of the files in data/)
         @return: True if the save was successful, False o.w.
         """
         try:
             with open(file_name, "w") as f:
-                json.dump(self.graph, default=lambda o: o.as_dict(), indent=4, fp=f)
+                f.write('{' if compact else '{\n')
+                self.__write_section(f, "Edges", self.__edge_records(), compact)
+                f.write(',' if compact else ',\n')
+                self.__write_section(f, "Nodes", self.__node_records(), compact)
+                f.write('}' if compact else '\n}')
         except IOError as e:
             print(e)
             return False
         return True
 
-    def shortest_path(self, id1: int, id2: int) -> (float, list):
+    @staticmethod
+    def __write_section(f, key: str, batches, compact: bool) -> None:
+        """
+        Write "key": [records] to a file, each batch of records is encoded by one json.dumps call.
+        In the indented format the records are nested two levels deep (8 spaces).
+        :param f: the out file
+        :param key: the name of the section
+        :param batches: an iterable of lists of records
+        :param compact: True for no indentation and no spaces
+        """
+        f.write('"{}":['.format(key) if compact else '    "{}": ['.format(key))
+        written = False
+        for batch in batches:
+            if not batch:
+                continue
+            if compact:
+                f.write(',' if written else '')
+                f.write(json.dumps(batch, separators=(',', ':'))[1:-1])
+            else:
+                f.write(',\n' if written else '\n')
+                f.write('    ' + json.dumps(batch, indent=4)[2:-2].replace('\n', '\n    '))
+            written = True
+        f.write(']' if compact or not written else '\n    ]')
+
+    def __edge_records(self, batch_size: int = 4096):
+        """
+        Returns a generator of batches of edge records {"src": node_id, "w": edge weight, "dest": node_id}.
+        """
+        batch = []
+        if self.is_compact(self.graph):
+            ids = self.graph.ids.tolist()
+            for i, k in enumerate(ids):
+                for j, w in zip(*self.graph.out_edges_at(i)):
+                    batch.append({"src": k, "w": w, "dest": ids[j]})
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        else:
+            for node in self.graph.get_all_v().values():
+                batch.extend(node.as_dict_edge())
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        yield batch
+
+    def __node_records(self, batch_size: int = 4096):
+        """
+        Returns a generator of batches of node records {"pos": "x, y, z", "id": node_id}.
+        """
+        if self.is_compact(self.graph):
+            location = self.locations()
+            nodes = (Node(k, location(k)) for k in self.graph.ids.tolist())
+        else:
+            nodes = iter(self.graph.get_all_v().values())
+        while True:
+            batch = [node.as_dict_node() for node in itertools.islice(nodes, batch_size)]
+            if not batch:
+                return
+            yield batch
+
+    def save_binary(self, file_name: str) -> bool:
+        """
+        Saves the graph in a binary format (see CompactDiGraph.save) to a file,
+        a graph that is not frozen is frozen first.
+        @param file_name: The path to the out file
+        @return: True if the save was successful, False o.w.
+        """
+        gra = self.graph if self.is_compact(self.graph) else self.graph.freeze()
+        try:
+            gra.save(file_name)
+        except IOError as e:
+            print(e)
+            return False
+        return True
+
+    def load_binary(self, file_name: str, frozen: bool = True) -> bool:
+        """
+        Loads a graph from a binary file that was written by save_binary.
+        The file is memory mapped, so even a large graph opens in milliseconds.
+        @param file_name: The path to the binary file
+        @param frozen: True - the graph is a CompactDiGraph backed by the file,
+        False - the graph is copied into a new (mutable) DiGraph
+        @returns True if the loading was successful, False o.w.
+        """
+        gra = CompactDiGraph.load(file_name)
+        self.graph = gra if frozen else gra.thaw()
+        return True
+
+    def shortest_path(self, id1: int, id2: int, method: str = "auto") -> (float, list):
         """
         Returns the shortest path from node id1 to node id2 using Dijkstra's Algorithm.
         @param id1: The start node id
         @param id2: The end node id
+        @param method: "auto" - the contraction hierarchy if one was built (or loaded) and the graph did not change
+        since (see build_ch), "dijkstra" o.w.,
+        "dijkstra" - search from id1 (the search is cached and reused for the next queries from id1),
+        "bidirectional" - search from id1 and backward from id2 at the same time (see bidirectional_dijkstra),
+        "astar" - A* search guided by the landmarks if they were built for the graph (see build_landmarks),
+        or by the nodes positions (see a_star),
+        "alt" - A* search guided by the landmarks, they are built if needed (see build_landmarks),
+        "ch" - upward search in the contraction hierarchy, it is built if needed (see build_ch)
+        The results are cached for the current version (mc) of the graph (see cache, ResultCache).
+        With a hook (see set_hook) every query that is not answered from the cache is recorded as "shortest_path",
+        with the counters of the search the method ran (for "dijkstra" only the part of the tree grown by the query).
         @return: The distance of the path, the path as a list
         """
-        if self.graph.nodes.get(id1) is None:
+        key, mc = ("shortest_path", id1, id2, method), self.graph.get_mc()
+        result = self.cache.get(self.graph, key)
+        if result is None:
+            if self.__hook is not None:
+                result = self.__hook.run("shortest_path", self.graph, self.__shortest_path, id1, id2, method)
+            else:
+                result = self.__shortest_path(id1, id2, method)
+            self.cache.put(self.graph, mc, key, result, len(result[1]))
+        return result[0], list(result[1])
+
+    def __shortest_path(self, id1: int, id2: int, method: str = "auto", stats=None) -> (float, list):
+        """
+        Returns the shortest path from node id1 to node id2 by the method (see shortest_path), not cached,
+        the counters of the search are added to stats.
+        """
+        if not self.has_node(id1):
             raise Exception('Node {} is not exist in the graph'.format(id1))
-        if self.graph.nodes.get(id2) is None:
+        if not self.has_node(id2):
             raise Exception('Node {} is not exist in the graph'.format(id2))
         if id1 == id2:
             return 0, [id1]
-        return self.dijkstra(id1, id2)
+        if method == "auto":
+            method = "dijkstra" if self.get_ch() is None else "ch"
+        if method == "dijkstra":
+            return self.__tree(id1).shortest_path(id2, stats, self.__check)
+        if method == "ch":
+            return (self.get_ch() or self.build_ch()).shortest_path(id1, id2, stats, self.__check)
+        if method == "bidirectional":
+            return self.__bidirectional_dijkstra(id1, id2, stats)
+        if method == "astar":
+            return self.__a_star(id1, id2, stats)
+        if method == "alt":
+            if self.get_landmarks() is None:
+                self.build_landmarks()
+            return self.__a_star(id1, id2, stats)
+        raise Exception('Unknown shortest path method {}'.format(method))
+
+    def build_ch(self, settle_limit: int = 64, core_growth: float = 1) -> ContractionHierarchy:
+        """
+        Build a contraction hierarchy of the graph (see ContractionHierarchy).
+        While the graph does not change, shortest_path (the default method "auto", and "ch") answers queries by an
+        upward bidirectional search in the hierarchy, and the hierarchy is dropped on the first query after the graph
+        changed (by its mc). method="dijkstra" still searches by the tree of the source.
+        The hierarchy pays on sparse, road like graphs (positions and short edges, as A0..A5),
+        on random graphs (G_*) most of the nodes stay in the core and a query costs about as bidirectional_dijkstra.
+        @param settle_limit: the maximum number of nodes each witness search settles
+        @param core_growth: the edges of the remaining graph, relative to the graph, at which the contraction stops
+        @return: the hierarchy
+        """
+        self.__ch = ContractionHierarchy.build(self.graph, settle_limit, core_growth)
+        return self.__ch
+
+    def get_ch(self):
+        """
+        Returns the contraction hierarchy of the graph, if one was built (or loaded) and the graph did not change.
+        @return: a ContractionHierarchy, or None
+        """
+        if self.__ch is not None and not self.__ch.is_valid(self.graph):
+            self.__ch = None
+        return self.__ch
+
+    def save_ch(self, file_name: str) -> bool:
+        """
+        Saves the contraction hierarchy of the graph to a file (usually next to the graph file, "<graph file>.ch"),
+        it is built if needed.
+        @param file_name: The path to the out file
+        @return: True if the save was successful, False o.w.
+        """
+        (self.get_ch() or self.build_ch()).save(file_name)
+        return True
+
+    def load_ch(self, file_name: str) -> bool:
+        """
+        Loads a contraction hierarchy that was saved by save_ch for this graph (the same nodes and edges).
+        @param file_name: The path to the file
+        @return: True if the loading was successful, raises an exception if the file is not a hierarchy of the graph
+        """
+        self.__ch = ContractionHierarchy.load(file_name, self.graph)
+        return True
+
+    def build_landmarks(self, k: int = 16, seed: int = 0) -> LandmarkIndex:
+        """
+        Build a landmark index of the graph (see LandmarkIndex): the distances from and to k landmarks.
+        While the graph does not change, a_star uses the landmarks lower bounds as its heuristic
+        and estimate_distance answers from the index, and the index is dropped on the first query
+        after the graph changed (by its mc).
+        @param k: the number of landmarks
+        @param seed: the seed of the first landmark choice
+        @return: the index
+        """
+        self.__landmarks = LandmarkIndex.build(self.graph, k, seed)
+        return self.__landmarks
+
+    def get_landmarks(self):
+        """
+        Returns the landmark index of the graph, if one was built and the graph did not change.
+        @return: a LandmarkIndex, or None
+        """
+        if self.__landmarks is not None and not self.__landmarks.is_valid(self.graph):
+            self.__landmarks = None
+        return self.__landmarks
+
+    def estimate_distance(self, id1: int, id2: int) -> float:
+        """
+        Returns a lower bound of the distance from node id1 to node id2 in O(k) from the landmark index,
+        without a search (the index is built if needed).
+        The bound is never above the distance, infinity only if there is no path.
+        @param id1: The start node id
+        @param id2: The end node id
+        @return: the estimate of the distance
+        """
+        landmarks = self.get_landmarks() or self.build_landmarks()
+        return landmarks.bounds(id1, id2)[0]
+
+    def shortest_path_batch(self, pairs: list, workers: int = 1, pool: GraphPool = None) -> List[PathResult]:
+        """
+        Returns the shortest paths of many (id1, id2) pairs.
+        The pairs are grouped by their source node, so each source is searched once, until all its destinations
+        are settled. With one worker the searches are the cached trees of shortest_path (see shortest_paths_from),
+        otherwise the groups run in parallel in a pool of worker processes (see GraphPool).
+        The paths are not built until they are read (see PathResult), so a caller that needs only
+        the distances does not pay for the paths.
+        @param pairs: a list of (id1, id2) pairs
+        @param workers: the number of worker processes, 1 runs in this process
+        @param pool: a GraphPool of this graph to run in (it is not closed), instead of starting a new one,
+        it must be built from this graph at its current version (see GraphPool.matches)
+        @return: a list of PathResult (distance, path) in the order of the pairs
+        """
+        if pool is not None and not pool.matches(self.graph):
+            raise Exception('The pool was not built from this graph at its current version')
+        pairs = list(pairs)
+        groups = OrderedDict()
+        for i, (id1, id2) in enumerate(pairs):
+            groups.setdefault(id1, []).append(i)
+        for k in set(groups).union(id2 for _, id2 in pairs):
+            if not self.has_node(k):
+                raise Exception('Node {} is not exist in the graph'.format(k))
+        results = [None] * len(pairs)
+        if pool is None and workers == 1:
+            for src, positions in groups.items():
+                tree = self.__tree(src)
+                for i in positions:
+                    dest = pairs[i][1]
+                    distance = tree.distance(dest, self.__check)
+                    results[i] = PathResult(distance, lambda tree=tree, dest=dest: tree.path(dest))
+            return results
+        own_pool = pool is None
+        pool = pool or GraphPool(self.graph, workers)
+        try:
+            gra = pool.get_graph()
+            index, ids = gra.index, gra.ids
+            trees = pool.partial_trees([(index[src], [index[pairs[i][1]] for i in positions])
+                                        for src, positions in groups.items()])
+        finally:
+            if own_pool:
+                pool.close()
+        for (src, positions), (distances, previous_nodes) in zip(groups.items(), trees):
+            for i, distance in zip(positions, distances):
+                results[i] = PathResult(distance, lambda previous_nodes=previous_nodes, t=index[pairs[i][1]],
+                                        distance=distance: self.__tree_path(ids, previous_nodes, t, distance))
+        return results
+
+    @staticmethod
+    def __tree_path(ids, previous_nodes, t: int, distance: float) -> list:
+        """
+        Build the path to the node in index t by walking the "fathers" back, and convert it to node_ids.
+        """
+        if distance == inf:
+            return []
+        path, current_node = [], t
+        while current_node != -1:
+            path.append(current_node)
+            current_node = int(previous_nodes[current_node])
+        path.reverse()
+        return ids[path].tolist()
+
+    def shortest_paths_from(self, src: int) -> ShortestPathTree:
+        """
+        Returns the shortest paths tree from node src to every node in the graph.
+        The tree holds the distance and the "father" of each node, so any path can be rebuilt from it
+        in O(path length), and it is reused by shortest_path as long as the graph does not change.
+        @param src: The source node id
+        @return: a ShortestPathTree
+        """
+        if not self.has_node(src):
+            raise Exception('Node {} is not exist in the graph'.format(src))
+        return self.__tree(src).complete()
+
+    def all_pairs_shortest_paths(self, workers: int = None, dtype=np.float64, file_name: str = None) -> np.ndarray:
+        """
+        Returns the distances of the shortest paths between every pair of nodes.
+        The sources are spread in chunks over a pool of worker processes that memory map one binary copy of
+        the graph (see GraphPool), and the rows are written to a preallocated matrix as the chunks finish.
+        The rows and columns are in the order of the nodes in get_all_v().
+        Complexity: O(|V|(|V|+|E|)log|V|) divided between the workers.
+        @param workers: the number of worker processes, the number of CPUs by default, 1 runs in this process
+        @param dtype: the type of the matrix, np.float32 takes half of the memory
+        @param file_name: if given the matrix is a memmap of this .npy file (np.load(file_name, mmap_mode='r')),
+        so a matrix larger than the memory can be built
+        @return: a |V|x|V| matrix, matrix[i][j] is the distance from node i to node j (infinity if there is no path)
+        """
+        gra = self.graph if self.is_compact(self.graph) else self.graph.freeze()
+        n = gra.v_size()
+        if file_name is not None:
+            matrix = np.lib.format.open_memmap(file_name, mode="w+", dtype=dtype, shape=(n, n))
+        else:
+            matrix = np.empty((n, n), dtype=dtype)
+        if workers == 1 or n < 2:
+            adjacency = adjacency_of(gra)
+            for i in range(n):
+                matrix[i] = distance_rows([i], dtype, adjacency)[0]
+        else:
+            with GraphPool(gra, workers) as pool:
+                pool.distance_rows(range(n), matrix)
+        if file_name is not None:
+            matrix.flush()
+        return matrix
+
+    def __tree(self, src: int) -> ShortestPathTree:
+        """
+        Return the cached shortest paths tree of src for the current version (mc) of the graph,
+        or a new one if there is no such tree.
+        The cache holds the last trees_capacity sources that were used, and the trees of a version share
+        its out edges (see GraphEdges), so a new tree costs only its search.
+        :param src: the source node_id
+        :return: a ShortestPathTree
+        """
+        tree = self.__trees.get(src)
+        if tree is not None and tree.get_graph() is self.graph and tree.get_mc() == self.graph.get_mc():
+            self.__trees.move_to_end(src)
+            return tree
+        if self.__edges is None or not self.__edges.is_valid(self.graph):
+            self.__edges = GraphEdges(self.graph)
+        tree = ShortestPathTree(self.graph, src, self.__edges)
+        self.__trees[src] = tree
+        self.__trees.move_to_end(src)
+        while len(self.__trees) > self.trees_capacity:
+            self.__trees.popitem(last=False)
+        return tree
 
     def connected_component(self, id1: int) -> list:
         """
         Finds the Strongly Connected Component(SCC) that node id1 is a part of.
+        If the components are already known (see connected_components) the component is taken from them,
+        otherwise only the component of id1 is computed (see component_of).
+        The results are cached for the current version (mc) of the graph (see cache, ResultCache).
         @param id1: The node id
         @return: The list of nodes in the SCC
         """
-        if id1 not in self.graph.get_all_v().keys():
-            raise Exception('Node {} is not exist in the graph'.format(id1))
-        return self.SCC(id1)
+        key, mc = ("connected_component", id1), self.graph.get_mc()
+        component = self.cache.get(self.graph, key)
+        if component is None:
+            if not self.has_node(id1):
+                raise Exception('Node {} is not exist in the graph'.format(id1))
+            index = self.__scc_index
+            if index is not None and index.update(self.graph):
+                component = index.component_of(id1)
+            else:
+                component = self.component_of(id1)
+            self.cache.put(self.graph, mc, key, component, len(component))
+        return list(component)
 
-    def connected_components(self) -> List[list]:
+    def connected_components(self, algorithm: str = "kosaraju") -> List[list]:
         """
         Finds all the Strongly Connected Component(SCC) in the graph.
+        The components are kept in an SCCIndex that follows the changes of the graph,
+        so after a few changes only the changed components are computed again (see SCCIndex.update).
+        @param algorithm: the algorithm that computes the components when the index is built:
+        "kosaraju" (see SCC) or "tarjan" (see tarjan, one pass and no transpose graph),
+        an index built by the other algorithm is built again
+        The results are cached for the current version (mc) of the graph (see cache, ResultCache).
         @return: a list all SCCs
         """
-        return self.SCC()
+        key, mc = ("connected_components", algorithm), self.graph.get_mc()
+        components = self.cache.get(self.graph, key)
+        if components is None:
+            components = self.__components(algorithm).components()
+            self.cache.put(self.graph, mc, key, components, sum(len(c) for c in components) + len(components))
+        return [list(c) for c in components]
+
+    def __components(self, algorithm: str = "kosaraju") -> SCCIndex:
+        """
+        Returns the SCCIndex of the graph, up to date with the graph,
+        the index is built again (by a full run of the algorithm) if it can not be updated
+        or it was built by another algorithm.
+        """
+        if algorithm == "kosaraju":
+            scc = GraphAlgo.SCC
+        elif algorithm == "tarjan":
+            scc = GraphAlgo.tarjan
+        else:
+            raise Exception('Unknown SCC algorithm {}'.format(algorithm))
+        index = self.__scc_index
+        if index is not None and self.__scc_algorithm == algorithm and index.update(self.graph):
+            return index
+        if index is not None:
+            index.close()
+        self.__scc_index = SCCIndex(self.graph, scc(self), lambda gra: scc(GraphAlgo(gra)))
+        self.__scc_algorithm = algorithm
+        return self.__scc_index
+
+    def tsp(self, node_list: list) -> (list, float):
+        """
+        Finds a cheap route that visits all the nodes of node_list (in any order, it does not return to the start).
+        Only the k x k distances between the k nodes are computed, each row by the (cached, lazy) shortest paths
+        tree of its node, so a tree stops growing when it reached the requested nodes.
+        The order of the nodes is chosen on that matrix: the best nearest neighbour route (from every start),
+        or if it gets stuck from every start (missing edges), the route of a Held-Karp search (see __route_search),
+        exact up to tsp_exact_nodes nodes and a beam of the tsp_beam_width cheapest states per layer above,
+        then improved by 2-opt (reverse the part of the route between two positions while it gets cheaper).
+        Last, the route is expanded to the full path of nodes, by the paths of the trees.
+        Complexity: k searches over the part of the graph near the nodes, and O(k^3) for each pass of 2-opt
+        (O(2^k * k^2) for the exact search, k <= tsp_exact_nodes, and O(tsp_beam_width * k^2) for the beam).
+        @param node_list: a list of node ids
+        @return: the path as a list of node ids and its distance, an empty list and infinity if there is no route
+        """
+        nodes = list(OrderedDict.fromkeys(node_list))
+        for k in nodes:
+            if not self.has_node(k):
+                raise Exception('Node {} is not exist in the graph'.format(k))
+        if len(nodes) < 2:
+            return nodes, 0
+        trees = [self.__tree(k) for k in nodes]
+        matrix = [[tree.distance(k, self.__check) for k in nodes] for tree in trees]
+        route = self.__nearest_neighbour(matrix)
+        if route is None:
+            width = None if len(nodes) <= self.tsp_exact_nodes else self.tsp_beam_width
+            route = self.__route_search(matrix, width)
+        if route is None:
+            return [], inf
+        route = self.__two_opt(matrix, route)
+        path = [nodes[route[0]]]
+        for i, j in zip(route, route[1:]):
+            path.extend(trees[i].path(nodes[j])[1:])
+        return path, sum(matrix[i][j] for i, j in zip(route, route[1:]))
+
+    @staticmethod
+    def __nearest_neighbour(matrix: list) -> list:
+        """
+        Build a route from every start by moving to the nearest node that was not visited yet,
+        and return the cheapest one.
+        :param matrix: the distances between the nodes (by position)
+        :return: the route as a list of positions, None if no route reaches all the nodes
+        """
+        k = len(matrix)
+        best, best_route = inf, None
+        for start in range(k):
+            route, cost, left = [start], 0, set(range(k)) - {start}
+            while left:
+                row = matrix[route[-1]]
+                j = min(left, key=lambda i: row[i])
+                if row[j] == inf or cost + row[j] >= best:
+                    break
+                cost += row[j]
+                route.append(j)
+                left.discard(j)
+            if not left:
+                best, best_route = cost, route
+        return best_route
+
+    @staticmethod
+    def __route_search(matrix: list, width: int = None) -> list:
+        """
+        Find a cheap route that reaches all the nodes by Held-Karp dynamic programming:
+        the layer i holds the cheapest cost of each (set of visited positions, last position) of the routes
+        with i edges. A state whose last position has no edge (all infinity) to a position not visited yet
+        cannot go on, so it is dropped (the case nearest neighbour fails on).
+        With width, only the width cheapest states of each layer are expanded (a beam search),
+        so the search is O(width * k^2) but it may miss the route; without width it is exact, O(2^k * k^2).
+        :param matrix: the distances between the nodes (by position)
+        :param width: the number of states kept in each layer, None to keep all of them
+        :return: the route as a list of positions, None if no route reaches all the nodes
+        """
+        k = len(matrix)
+        layer = {(1 << j, j): (0, None) for j in range(k)}
+        layers = [layer]
+        for step in range(k - 1):
+            next_layer = {}
+            for (visited, j), (cost, _) in layer.items():
+                row = matrix[j]
+                for i in range(k):
+                    if not visited >> i & 1 and row[i] < inf:
+                        state = (visited | 1 << i, i)
+                        if state not in next_layer or cost + row[i] < next_layer[state][0]:
+                            next_layer[state] = (cost + row[i], j)
+            if step < k - 2:
+                next_layer = {(visited, j): entry for (visited, j), entry in next_layer.items()
+                              if any(not visited >> i & 1 and w < inf for i, w in enumerate(matrix[j]))}
+            if width is not None and len(next_layer) > width:
+                next_layer = dict(heapq.nsmallest(width, next_layer.items(), key=lambda item: item[1][0]))
+            layer = next_layer
+            layers.append(layer)
+        if not layer:
+            return None
+        route, state = [], min(layer, key=lambda key: layer[key][0])
+        for layer in reversed(layers):
+            route.append(state[1])
+            state = (state[0] ^ 1 << state[1], layer[state][1])
+        route.reverse()
+        return route
+
+    @staticmethod
+    def __two_opt(matrix: list, route: list) -> list:
+        """
+        Improve a route by 2-opt moves: reverse the part route[i..j] if the route gets cheaper.
+        The distances are not symmetric, so the edges inside the reversed part change too,
+        their cost is read from prefix sums of the route edges in both directions (O(1) for each move).
+        A missing edge (infinity) is not added to the prefix sums (inf - inf is not a number), it is counted
+        in a prefix count instead, and a part with a missing edge costs infinity.
+        :param matrix: the distances between the nodes (by position)
+        :param route: a route that reaches all the nodes
+        :return: the improved route
+        """
+        k = len(route)
+        improved = True
+        while improved:
+            improved = False
+            forward, backward = [0] * k, [0] * k
+            forward_missing, backward_missing = [0] * k, [0] * k
+            for t in range(1, k):
+                w_forward, w_backward = matrix[route[t - 1]][route[t]], matrix[route[t]][route[t - 1]]
+                forward[t] = forward[t - 1] + (w_forward if w_forward < inf else 0)
+                forward_missing[t] = forward_missing[t - 1] + (w_forward == inf)
+                backward[t] = backward[t - 1] + (w_backward if w_backward < inf else 0)
+                backward_missing[t] = backward_missing[t - 1] + (w_backward == inf)
+            for i in range(k - 1):
+                for j in range(i + 1, k):
+                    old = forward[j] - forward[i] if forward_missing[j] == forward_missing[i] else inf
+                    new = backward[j] - backward[i] if backward_missing[j] == backward_missing[i] else inf
+                    if new == inf:
+                        continue
+                    if i > 0:
+                        old += matrix[route[i - 1]][route[i]]
+                        new += matrix[route[i - 1]][route[j]]
+                    if j < k - 1:
+                        old += matrix[route[j]][route[j + 1]]
+                        new += matrix[route[i]][route[j + 1]]
+                    if new < old - 1e-12:
+                        route[i:j + 1] = reversed(route[i:j + 1])
+                        improved = True
+                        break
+                if improved:
+                    break
+        return route
+
+    def eccentricity(self, node_id: int) -> float:
+        """
+        Returns the eccentricity of a node: the maximum distance from the node to the other nodes.
+        @param node_id: The node id
+        @return: the eccentricity, infinity if some node is not reachable from node_id
+        """
+        if not self.has_node(node_id):
+            raise Exception('Node {} is not exist in the graph'.format(node_id))
+        distances = self.shortest_paths_from(node_id).distances()
+        return max(distances.values()) if len(distances) == self.graph.v_size() else inf
+
+    def center_point(self) -> (int, float):
+        """
+        Finds the center of the graph: the node with the minimum eccentricity.
+        Only the nodes of the single component that no other component reaches (in the SCC graph)
+        can reach every node, so only they are candidates.
+        The candidates are searched in order of a lower bound of their eccentricity:
+        a full search from u gives, for every v, ecc(v) >= ecc(u) - dist(u, v) (triangle inequality).
+        In addition the farthest node f a search reached is far from most nodes, so a search to f
+        (over the in edges) gives ecc(v) >= dist(v, f) for every v.
+        A search (see distance_row) stops as soon as it settles a node farther than the best eccentricity found so far,
+        and the method ends when the smallest lower bound is not better than the best eccentricity.
+        @return: the center node id and its eccentricity, (None, infinity) if no node reaches every node
+        """
+        gra = self.graph if self.is_compact(self.graph) else self.graph.freeze()
+        candidates = self.__source_component(gra)
+        if not candidates:
+            return None, inf
+        adjacency, reverse = adjacency_of(gra), adjacency_of(gra.transpose())
+        lower = {v: 0 for v in candidates}
+        queue = [(0, v) for v in candidates]
+        far_nodes = set()
+        best, center = inf, None
+
+        def raise_bounds(bounds):
+            for w, bound in lower.items():
+                if bounds[w] > bound:
+                    lower[w] = bounds[w]
+                    heapq.heappush(queue, (lower[w], w))
+
+        while queue:
+            bound, v = heapq.heappop(queue)
+            if v not in lower or bound != lower[v]:
+                continue
+            if bound >= best:
+                break
+            del lower[v]
+            distances = distance_row(adjacency, v, best)
+            ecc = max(distances)
+            if ecc <= best and ecc < inf:
+                raise_bounds([ecc - d for d in distances])
+            if ecc < best:
+                best, center = ecc, v
+            farthest = max((d, w) for w, d in enumerate(distances) if d < inf)[1]
+            if farthest not in far_nodes:
+                far_nodes.add(farthest)
+                raise_bounds(distance_row(reverse, farthest))
+        return (gra.ids[center].item(), best) if center is not None else (None, inf)
+
+    def diameter(self) -> float:
+        """
+        Returns the diameter of the graph: the maximum eccentricity of its nodes.
+        If the graph is not strongly connected (by tarjan on the frozen graph) some pair has no path
+        and the diameter is infinity.
+        Otherwise the nodes are searched in order of an upper bound of their eccentricity:
+        a search from u and a search to u (over the in edges) give, for every v, ecc(v) <= dist(v, u) + ecc(u).
+        The method ends when the largest upper bound is not larger than the largest eccentricity found.
+        @return: the diameter, 0 for a graph with less than 2 nodes
+        """
+        gra = self.graph if self.is_compact(self.graph) else self.graph.freeze()
+        n = gra.v_size()
+        if n < 2:
+            return 0
+        if len(GraphAlgo(gra).tarjan()) > 1:
+            return inf
+        adjacency, reverse = adjacency_of(gra), adjacency_of(gra.transpose())
+        upper = [inf] * n
+        done = bytearray(n)
+        queue = [(-inf, v) for v in range(n)]
+        diameter = 0
+        while queue:
+            bound, v = heapq.heappop(queue)
+            if done[v] or -bound != upper[v]:
+                continue
+            if upper[v] <= diameter:
+                break
+            done[v] = 1
+            ecc = max(distance_row(adjacency, v))
+            diameter = max(diameter, ecc)
+            for w, dist in enumerate(distance_row(reverse, v)):
+                if not done[w] and dist + ecc < upper[w]:
+                    upper[w] = dist + ecc
+                    heapq.heappush(queue, (-upper[w], w))
+        return diameter
 
-    def plot_graph(self) -> None:
+    def __source_component(self, gra) -> list:
+        """
+        Returns the node indices of the component that no other component has an edge to,
+        if there is exactly one such component (otherwise no node reaches every node, and the list is empty).
+        The components are computed on the frozen graph gra by tarjan, no SCCIndex is kept for the graph.
+        """
+        labels = np.empty(gra.v_size(), dtype=np.int64)
+        for label, component in enumerate(GraphAlgo(gra).tarjan()):
+            labels[[gra.index[k] for k in component]] = label
+        sources = np.repeat(labels, np.diff(gra.out_offsets))
+        targets = labels[gra.out_targets]
+        reached = np.zeros(labels.max() + 1 if len(labels) else 0, dtype=bool)
+        reached[targets[sources != targets]] = True
+        roots = np.flatnonzero(~reached)
+        if len(roots) != 1:
+            return []
+        return np.flatnonzero(labels == roots[0]).tolist()
+
+    def plot_graph(self, file_name: str = None, labels: bool = None, max_labels: int = 100,
+                   arrows: bool = None) -> None:
         """
         Plots the graph.
         If the nodes have a position, the nodes will be placed there.
-        Otherwise, they will be placed in a random but elegant manner.
-        """
-        for node in self.graph.get_all_v().values():
-            if node.get_location() is None:
-                loc_x = random.uniform(0, 100)
-                loc_y = random.uniform(0, 100)
-                location = (loc_x, loc_y, 0)
-                node.set_location(location)
-            x, y, z = node.get_location()
-            plt.plot(x, y, markersize=30, marker='.', color='red')
-            plt.text(x, y, str(node.get_key()), color='black', fontsize=10)
-            for dest_id, w in self.graph.all_out_edges_of_node(node.get_key()).items():
-                dest = self.graph.get_node(dest_id)
-                if dest.get_location() is None:
-                    loc_x2 = random.uniform(0, 100)
-                    loc_y2 = random.uniform(0, 100)
-                    location = (loc_x2, loc_y2, 0)
-                    dest.set_location(location)
-                x2, y2, z2 = dest.get_location()
-                plt.annotate("", xy=(x, y), xytext=(x2, y2), arrowprops=dict(arrowstyle="<-"))
-                # mid_x = (x+x2)/2
-                # mid_y = (y+y2)/2
-                # plt.text(mid_x, mid_y, str(w)[0:4], color='black', fontsize=10)
-        plt.show()
+        Otherwise, they will be placed in a random but elegant manner (for this plot only, the graph is not changed).
+        The positions are taken as NumPy arrays (from the frozen graph), all the nodes are drawn by one scatter
+        and all the edges by one LineCollection (or one quiver with arrows), so a graph of 10000 nodes and
+        80000 edges is drawn in seconds.
+        @param file_name: save the plot to this file (any format of savefig, works on a headless backend)
+        instead of showing it
+        @param labels: True - the ids of all the nodes, False - no ids, None - the ids of the nodes in view
+        when there are at most max_labels of them (updated when the view is zoomed)
+        @param max_labels: the largest number of ids shown by labels=None
+        @param arrows: draw the edges as arrows, by default only for graphs with at most 5000 edges
+        @return: None
+        """
+        gra = self.graph if self.is_compact(self.graph) else self.graph.freeze()
+        n = gra.v_size()
+        pos = gra.pos[:, :2].copy()
+        missing = np.isnan(pos).any(axis=1)
+        pos[missing] = np.random.uniform(0, 100, (int(missing.sum()), 2))
+        sources = np.repeat(np.arange(n), np.diff(gra.out_offsets))
+        starts, ends = pos[sources], pos[gra.out_targets]
+        fig, ax = plt.subplots()
+        draw_arrows = arrows if arrows is not None else gra.e_size() <= 5000
+        if draw_arrows:
+            ax.quiver(starts[:, 0], starts[:, 1], ends[:, 0] - starts[:, 0], ends[:, 1] - starts[:, 1],
+                      angles='xy', scale_units='xy', scale=1, width=0.002, headwidth=6, headlength=8, color='black')
+        else:
+            ax.add_collection(LineCollection(np.stack((starts, ends), axis=1), colors='black', linewidths=0.2,
+                                             alpha=0.3))
+        ax.scatter(pos[:, 0], pos[:, 1], s=max(1.0, min(100.0, 20000 / max(n, 1))), color='red', zorder=2)
+        ax.autoscale_view()
+        ids = gra.ids.tolist()
+        texts = []
+
+        def show_labels(axes):
+            for text in texts:
+                text.remove()
+            texts.clear()
+            if labels is False:
+                return
+            (x0, x1), (y0, y1) = sorted(axes.get_xlim()), sorted(axes.get_ylim())
+            in_view = np.flatnonzero((pos[:, 0] >= x0) & (pos[:, 0] <= x1) & (pos[:, 1] >= y0) & (pos[:, 1] <= y1))
+            if labels or len(in_view) <= max_labels:
+                texts.extend(axes.text(pos[i, 0], pos[i, 1], str(ids[i]), color='black', fontsize=10)
+                             for i in in_view.tolist())
+
+        show_labels(ax)
+        if labels is None:
+            ax.callbacks.connect('xlim_changed', show_labels)
+            ax.callbacks.connect('ylim_changed', show_labels)
+        if file_name is not None:
+            fig.savefig(file_name)
+            plt.close(fig)
+        else:
+            plt.show()
 
     def dijkstra(self, src, dest) -> (float, list):
         """
         This method based on Dijkstra's algorithm.
         Dijkstra's algorithm is an algorithm for finding the shortest paths between nodes in a graph.
         In other words it finds the shortest paths between the source node and the destination node.
-        The method stored a distance dictionary represent each node weight, in the beginning initialized to infinity.
+        The method stored a distance dictionary represent each node weight, a node that is not in it weights infinity.
         In each step the method update his current distance from the source node.
         In addition it stored a dictionary represent each node "father", meaning the node through which we
         discovered this node.
         Update the source node weight to be 0 and push him into a queue.
         Pop the node with the minimum weight from the queue.
-        Visit each one of this nodes neighbors:
+        If the node was pushed again with a smaller weight after this entry, the entry is old (stale) - skip it.
+        If the current node that pop out from the queue is the destination node we finish,
+        his weight can not get smaller anymore.
+        Otherwise visit each one of this nodes neighbors:
         Check if his current weight is more then the distance between the node and the source node,
         if so, update his weight and updates his "father" to be the node's id from which he came to.
-        After going through all the neighbors of the node,
-        If the current node that pop out from the queue is the destination node we finish.
-        Otherwise repeat these steps until the queue is empty.
-        If the dest node weight is infinity it means there is no path between src node and dest node,
+        Repeat these steps until the queue is empty.
+        If the dest node was not reached it means there is no path between src node and dest node,
         return infinity and empty list.
         Otherwise returns the weight of the dest node that represent the distance between the two nodes,
-        return the path between them and the distance.
+        and the path between them, built by walking the "fathers" back from dest and reversing.
+        The dictionaries only hold the nodes that were discovered, so a query between close nodes
+        does not pay for the size of the graph.
+        shortest_path does not call this method, it answers from the ShortestPathTree of the source,
+        which runs the same search and keeps it for the next queries from that source.
         Complexity: O((|V|+|E|)log|V|), |V|=number of nodes, |E|=number of edges.
         :param: src  - the source node_info
         :param: dest - the destination node_info
         :return: the shortest path between the two nodes and the path between them,
         and infinity if there is no path like this.
         """
-        distances = {node: inf for node in self.graph.nodes.keys()}
-        previous_nodes = {src: -1}
-        distances[src] = 0
-        queue = []
-        heapq.heappush(queue, (0, src))
+        search = self.__dijkstra_compact if self.is_compact(self.graph) else self.__dijkstra
+        if self.__hook is not None:
+            return self.__hook.run("dijkstra", self.graph, search, src, dest)
+        return search(src, dest)
+
+    def __dijkstra(self, src, dest, stats=None) -> (float, list):
+        """
+        Dijkstra's algorithm over a DiGraph (see dijkstra).
+        With stats the pushes are counted as they happen, and the other counters are found from the state
+        at the end of the search: the settled nodes are the discovered nodes without a live (not stale) entry
+        in the queue, and every entry that was popped and is not a settled node is a stale pop.
+        """
+        nodes = self.graph.get_all_v()
+        distances = {src: 0}
+        previous_nodes = {src: None}
+        queue = [(0, src)]
+        push = heapq.heappush if stats is None else stats.counting(heapq.heappush)
+        pop = self.__checked(heapq.heappop)
         while queue:
-            current_node = heapq.heappop(queue)[1]
-            if distances[current_node] == inf:
+            dist, current_node = pop(queue)
+            if dist > distances[current_node]:
+                continue
+            if current_node == dest:
                 break
-            for neighbour, w in self.graph.nodes.get(current_node).get_connections_out().items():
-                alternative_route = distances[current_node] + w
-                if alternative_route < distances[neighbour]:
+            for neighbour, w in nodes[current_node].get_connections_out().items():
+                alternative_route = dist + w
+                if alternative_route < distances.get(neighbour, inf):
                     distances[neighbour] = alternative_route
                     previous_nodes[neighbour] = current_node
-                    heapq.heappush(queue, (distances[neighbour], neighbour))
-                if current_node == dest:
-                    break
+                    push(queue, (alternative_route, neighbour))
 
-        path, current_node = [], dest
-        if distances[dest] == inf:
+        if stats is not None:
+            live = {v for d, v in queue if d == distances[v]}
+            settled = [v for v in distances if v not in live]
+            stats.pushes += 1
+            stats.add_search(stats.pushes - len(queue), len(settled),
+                         (len(nodes[v].get_connections_out()) for v in settled if v != dest))
+        if dest not in distances:
             return inf, []
-        while current_node != -1:
-            path.insert(0, current_node)
+        path, current_node = [], dest
+        while current_node is not None:
+            path.append(current_node)
             current_node = previous_nodes[current_node]
+        path.reverse()
+        return distances[dest], path
 
+    def bidirectional_dijkstra(self, src, dest) -> (float, list):
+        """
+        This method based on bidirectional Dijkstra's algorithm.
+        Two searches run at the same time: a forward search from the source node over the out edges,
+        and a backward search from the destination node over the in edges (get_connections_in).
+        In each step the search with the smaller queue top settles one node.
+        Every time an edge reaches a node that the other search already discovered,
+        the length of the path through this edge is checked against the best path found so far (mu).
+        The method stops when the sum of the two queue tops is not smaller than mu,
+        no shorter path can be found anymore, so the two searches settle only the nodes around
+        the source and the destination instead of a whole ball around the source.
+        The path is built from the forward "fathers" of the meeting node and the backward "fathers" of it.
+        Complexity: O((|V|+|E|)log|V|), |V|=number of nodes, |E|=number of edges.
+        :param: src  - the source node_id
+        :param: dest - the destination node_id
+        :return: the shortest path between the two nodes and the path between them,
+        and infinity if there is no path like this.
+        """
+        return self.__bidirectional_dijkstra(src, dest)
+
+    def __bidirectional_dijkstra(self, src, dest, stats=None) -> (float, list):
+        """
+        Bidirectional Dijkstra's algorithm (see bidirectional_dijkstra), the counters of the two searches
+        are added to stats as in __dijkstra.
+        """
+        if src == dest:
+            return 0, [src]
+        push = heapq.heappush if stats is None else stats.counting(heapq.heappush)
+        pop = self.__checked(heapq.heappop)
+        pushed = stats.pushes if stats is not None else 0
+        edges = (self.neighbours(), self.neighbours(reverse=True))
+        distances = ({src: 0}, {dest: 0})
+        previous_nodes = ({src: None}, {dest: None})
+        queues = ([(0, src)], [(0, dest)])
+        mu, meeting_node = inf, None
+        while queues[0] and queues[1]:
+            if queues[0][0][0] + queues[1][0][0] >= mu:
+                break
+            side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+            dist, current_node = pop(queues[side])
+            if dist > distances[side][current_node]:
+                continue
+            other_distances = distances[1 - side]
+            for neighbour, w in edges[side](current_node).items():
+                alternative_route = dist + w
+                if alternative_route < distances[side].get(neighbour, inf):
+                    distances[side][neighbour] = alternative_route
+                    previous_nodes[side][neighbour] = current_node
+                    push(queues[side], (alternative_route, neighbour))
+                if neighbour in other_distances:
+                    route = distances[side][neighbour] + other_distances[neighbour]
+                    if route < mu:
+                        mu, meeting_node = route, neighbour
+
+        if stats is not None:
+            stats.pushes += 2
+            live = [{v for d, v in queues[side] if d == distances[side][v]} for side in (0, 1)]
+            settled = [[v for v in distances[side] if v not in live[side]] for side in (0, 1)]
+            stats.add_search(stats.pushes - pushed - len(queues[0]) - len(queues[1]),
+                             len(settled[0]) + len(settled[1]),
+                             (len(edges[side](v)) for side in (0, 1) for v in settled[side]))
+        if meeting_node is None:
+            return inf, []
+        path, current_node = [], meeting_node
+        while current_node is not None:
+            path.append(current_node)
+            current_node = previous_nodes[0][current_node]
+        path.reverse()
+        current_node = previous_nodes[1][meeting_node]
+        while current_node is not None:
+            path.append(current_node)
+            current_node = previous_nodes[1][current_node]
+        return mu, path
+
+    def a_star(self, src, dest) -> (float, list):
+        """
+        This method based on A* algorithm.
+        A* is Dijkstra's algorithm where the queue is ordered by the distance from the source node plus
+        a lower bound of the distance to the destination node (the heuristic),
+        so the search goes toward the destination instead of around the source.
+        If a landmark index was built for the graph (see build_landmarks), the heuristic is the landmarks
+        triangle inequality lower bound, and a node that can not reach the destination is not pushed at all.
+        Otherwise the heuristic is the Euclidean distance between the nodes positions multiplied by
+        heuristic_scale(), which makes it a lower bound of the real distance, so the returned path is still
+        the shortest.
+        If the positions can not give such a lower bound (see heuristic_scale) the method uses dijkstra.
+        Complexity: O((|V|+|E|)log|V|), |V|=number of nodes, |E|=number of edges.
+        :param: src  - the source node_id
+        :param: dest - the destination node_id
+        :return: the shortest path between the two nodes and the path between them,
+        and infinity if there is no path like this.
+        """
+        return self.__a_star(src, dest)
+
+    def __a_star(self, src, dest, stats=None) -> (float, list):
+        """
+        A* algorithm (see a_star), the counters of the search are added to stats as in __dijkstra,
+        the nodes that can not reach the destination are discovered but never settled.
+        """
+        if src == dest:
+            return 0, [src]
+        estimate = self.__estimate_to(dest)
+        if estimate is None:
+            if stats is None:
+                return self.dijkstra(src, dest)
+            return (self.__dijkstra_compact if self.is_compact(self.graph) else self.__dijkstra)(src, dest, stats)
+        push = heapq.heappush if stats is None else stats.counting(heapq.heappush)
+        pop = self.__checked(heapq.heappop)
+        pushed = stats.pushes if stats is not None else 0
+        heuristic = {}
+        edges = self.neighbours()
+        distances = {src: 0}
+        previous_nodes = {src: None}
+        queue = [(0, 0, src)]
+        while queue:
+            f, dist, current_node = pop(queue)
+            if dist > distances[current_node]:
+                continue
+            if current_node == dest:
+                break
+            for neighbour, w in edges(current_node).items():
+                alternative_route = dist + w
+                if alternative_route < distances.get(neighbour, inf):
+                    distances[neighbour] = alternative_route
+                    previous_nodes[neighbour] = current_node
+                    if neighbour not in heuristic:
+                        heuristic[neighbour] = estimate(neighbour)
+                    if heuristic[neighbour] == inf:
+                        continue
+                    push(queue, (alternative_route + heuristic[neighbour], alternative_route, neighbour))
+
+        if stats is not None:
+            live = {v for f, d, v in queue if d == distances[v]}
+            settled = [v for v in distances if v not in live and heuristic.get(v) != inf]
+            stats.pushes += 1
+            stats.add_search(stats.pushes - pushed - len(queue), len(settled),
+                             (len(edges(v)) for v in settled if v != dest))
+        if dest not in distances:
+            return inf, []
+        path, current_node = [], dest
+        while current_node is not None:
+            path.append(current_node)
+            current_node = previous_nodes[current_node]
+        path.reverse()
         return distances[dest], path
 
+    def __estimate_to(self, dest: int):
+        """
+        Returns the A* heuristic toward dest: the landmarks lower bounds if there is a landmark index,
+        otherwise the scaled Euclidean distance, or None if the positions can not give a lower bound.
+        :return: a function node_id -> float, or None
+        """
+        landmarks = self.get_landmarks()
+        if landmarks is not None:
+            return landmarks.estimate_to(dest)
+        scale = self.heuristic_scale()
+        if scale <= 0:
+            return None
+        location = self.locations()
+        target = location(dest)
+        return lambda k: scale * math.dist(location(k), target)
+
+    def heuristic_scale(self) -> float:
+        """
+        Returns the largest factor c such that every edge weight is at least c times the Euclidean distance
+        between the positions of its nodes.
+        By the triangle inequality, c times the Euclidean distance between two nodes is then a lower bound of
+        the distance between them (an admissible and consistent heuristic for a_star).
+        The result is computed once for each version (mc) of the graph and of its positions
+        (see DiGraph.get_positions_version, a position is not a change of the mc).
+        Complexity: O(|V|+|E|).
+        :return: the factor, or 0 if some node has no position or no factor is valid
+        """
+        version = (self.graph.get_mc(), self.graph.get_positions_version()
+                   if hasattr(self.graph, "get_positions_version") else 0)
+        if self.__heuristic is not None and self.__heuristic[0] is self.graph and self.__heuristic[1] == version:
+            return self.__heuristic[2]
+        location = self.locations()
+        edges = self.neighbours()
+        keys = self.graph.ids.tolist() if self.is_compact(self.graph) else self.graph.get_all_v().keys()
+        scale = inf
+        for k in keys:
+            loc = location(k)
+            if loc is None:
+                scale = 0
+                break
+            for neighbour, w in edges(k).items():
+                length = math.dist(loc, location(neighbour)) if location(neighbour) is not None else 0
+                if length > 0:
+                    scale = min(scale, w / length)
+        # keep the bound below the weights even after floating point rounding
+        scale = 0 if scale == inf else scale * (1 - 1e-9)
+        self.__heuristic = (self.graph, version, scale)
+        return scale
+
+    def locations(self):
+        """
+        Returns a function that gives the position (x, y, z) of a node, or None if it has no position.
+        :return: a function node_id -> tuple
+        """
+        if self.is_compact(self.graph):
+            index, pos = self.graph.index, self.graph.pos.tolist()
+            return lambda k: None if any(math.isnan(c) for c in pos[index[k]]) else tuple(pos[index[k]])
+        nodes = self.graph.get_all_v()
+        return lambda k: nodes[k].get_location()
+
+    def neighbours(self, reverse: bool = False):
+        """
+        Returns a function that gives the edges of a node as a dictionary (node_id, edge weight),
+        without checking that the node exists.
+        :param reverse: False for the edges that connected from the node, True for the edges connected to it.
+        :return: a function node_id -> dict
+        """
+        if self.is_compact(self.graph):
+            return self.graph.all_in_edges_of_node if reverse else self.graph.all_out_edges_of_node
+        nodes = self.graph.get_all_v()
+        if reverse:
+            return lambda k: nodes[k].get_connections_in()
+        return lambda k: nodes[k].get_connections_out()
+
+    def __compact_adjacency(self) -> list:
+        """
+        Returns the out edges of the CompactDiGraph as lists of (dest index, weight) by node index
+        (see GraphPool.adjacency_of), converted once for the graph (O(|V|+|E|)) and kept while it is the graph
+        of this GraphAlgo, a CompactDiGraph never changes.
+        :return: a list (by node index) of lists of (dest index, weight)
+        """
+        if self.__adjacency is None or self.__adjacency[0] is not self.graph:
+            self.__adjacency = (self.graph, adjacency_of(self.graph))
+        return self.__adjacency[1]
+
+    def __dijkstra_compact(self, src, dest, stats=None) -> (float, list):
+        """
+        Dijkstra's algorithm over a CompactDiGraph, the distances and the "fathers" are stored in lists
+        indexed by the node index instead of dictionaries, the counters of stats are found as in __dijkstra.
+        The out edges are read from the lists of the graph (see __compact_adjacency), not sliced from the arrays
+        for every node that pops out from the queue.
+        The search stops as soon as the destination node pops out from the queue,
+        and queue entries that are older than the node current distance are skipped.
+        :param: src  - the source node_id
+        :param: dest - the destination node_id
+        :return: the shortest path between the two nodes and the path between them,
+        and infinity if there is no path like this.
+        """
+        gra = self.graph
+        adjacency = self.__compact_adjacency()
+        s, t = gra.index[src], gra.index[dest]
+        distances = [inf] * gra.v_size()
+        previous_nodes = [-1] * gra.v_size()
+        distances[s] = 0
+        queue = [(0, s)]
+        push = heapq.heappush if stats is None else stats.counting(heapq.heappush)
+        pop = self.__checked(heapq.heappop)
+        while queue:
+            dist, current_node = pop(queue)
+            if current_node == t:
+                break
+            if dist > distances[current_node]:
+                continue
+            for neighbour, w in adjacency[current_node]:
+                alternative_route = dist + w
+                if alternative_route < distances[neighbour]:
+                    distances[neighbour] = alternative_route
+                    previous_nodes[neighbour] = current_node
+                    push(queue, (alternative_route, neighbour))
+
+        if stats is not None:
+            live = {v for d, v in queue if d == distances[v]}
+            settled = [v for v, d in enumerate(distances) if d < inf and v not in live]
+            offsets = gra.out_offsets
+            stats.pushes += 1
+            stats.add_search(stats.pushes - len(queue), len(settled),
+                         (offsets[v + 1] - offsets[v] for v in settled if v != t))
+        if distances[t] == inf:
+            return inf, []
+        path, current_node = [], t
+        while current_node != -1:
+            path.append(current_node)
+            current_node = previous_nodes[current_node]
+        path.reverse()
+        return distances[t], gra.ids[path].tolist()
+
     def dfs(self, gra: DiGraph, n: int, visited: dict, stack: list):
         """
         This method based on DFS algorithm.
@@ -192,12 +1269,27 @@ class GraphAlgo(GraphAlgoInterface):
         If his status is 1 or 2, pop this node from the local stack and update his status to 2,
         and insert this node to the stack.
         At the end, the stack contain all the nodes discover from the "root" node (n).
+        If gra is a CompactDiGraph the nodes are represented by their index instead of their node_id
+        (n, visited and stack), and visited may be a list.
         :param gra: a DiGraph
         :param n: the node_id from which the method begins the search
         :param visited: a dictionary represent the node status, 0, 1 or 2.
         :param stack: a list that will be updated during the method.
         """
+        if self.__hook is not None:
+            return self.__hook.run("dfs", gra, self.__dfs, gra, n, visited, stack)
+        return self.__dfs(gra, n, visited, stack)
+
+    def __dfs(self, gra: DiGraph, n: int, visited: dict, stack: list, stats=None):
+        """
+        The DFS algorithm (see dfs), with stats the pushes into the local stack are counted as they happen,
+        the nodes added to the stack are the settled nodes and all the other pops are stale.
+        """
+        compact = self.is_compact(gra)
+        edges_of = self.__checked(gra.out_edges_at if compact else gra.all_out_edges_of_node)
         local_stack = [n]
+        push = local_stack.append if stats is None else stats.counting(local_stack.append)
+        pushed, finished = stats.pushes if stats is not None else 0, len(stack)
         while local_stack:
             v = local_stack[-1]
             if visited[v]:
@@ -207,22 +1299,34 @@ class GraphAlgo(GraphAlgoInterface):
                     stack.append(v)
             else:
                 visited[v] = 1
-                for k in gra.all_out_edges_of_node(v).keys():
+                neighbours = edges_of(v)[0] if compact else edges_of(v).keys()
+                for k in neighbours:
                     if not visited[k]:
-                        local_stack.append(k)
+                        push(k)
+        if stats is not None:
+            stats.pushes += 1
+            settled = stack[finished:]
+            if compact:
+                offsets = gra.out_offsets
+                degrees = (offsets[v + 1] - offsets[v] for v in settled)
+            else:
+                degrees = (len(gra.all_out_edges_of_node(v)) for v in settled)
+            stats.add_search(stats.pushes - pushed, len(settled), degrees)
 
     def transpose(self):
         """
         Return transpose graph.
         Meaning each edge in the original graph transpose (src-->dest)-->(src<--dest).
+        If the graph is a CompactDiGraph the transpose graph shares its arrays.
+        Otherwise the nodes and the edges are added in one batch each (add_nodes_from, add_edges_from).
         :return:
         """
+        if self.is_compact(self.graph):
+            return self.graph.transpose()
         gra = DiGraph()
-        for k, v in self.graph.get_all_v().items():
-            gra.add_node(k, v.get_location())
-        for k, v in gra.get_all_v().items():
-            for dest, w in self.graph.all_in_edges_of_node(k).items():
-                gra.add_edge(k, dest, w)
+        nodes = self.graph.get_all_v()
+        gra.add_nodes_from((k, v.get_location()) for k, v in nodes.items())
+        gra.add_edges_from([(k, dest, w) for k, v in nodes.items() for dest, w in v.get_connections_in().items()])
         return gra
 
     def SCC(self, key=None):
@@ -233,6 +1337,18 @@ class GraphAlgo(GraphAlgoInterface):
         Last, call dfs on the transpose graph, but in the main loop, consider nodes in order of decreasing
         finishing time(as computed in the first dfs).
         In the last call for the dfs it return a list of scc.
+        If the graph is a CompactDiGraph the search runs over the node indices and the transpose graph
+        shares the arrays of the graph.
+        :return: a List of lists represents all the strongly connected component in the graph.
+        """
+        scc = self.__scc_compact if self.is_compact(self.graph) else self.__scc
+        if self.__hook is not None:
+            return self.__hook.run("SCC", self.graph, scc, key)
+        return scc(key)
+
+    def __scc(self, key=None, stats=None):
+        """
+        Kosaraju's algorithm over a DiGraph (see SCC), the counters of the dfs runs are added to stats.
         :return: a List of lists represents all the strongly connected component in the graph.
         """
         stack = []
@@ -241,7 +1357,7 @@ class GraphAlgo(GraphAlgoInterface):
             visited[k] = 0
         for i in visited:
             if not visited.get(i):
-                self.dfs(self.graph, i, visited, stack)
+                self.__dfs(self.graph, i, visited, stack, stats)
 
         g_transpose = self.transpose()
 
@@ -254,12 +1370,165 @@ class GraphAlgo(GraphAlgoInterface):
             scc_list = []
             n = stack.pop()
             if not visited.get(n):
-                self.dfs(g_transpose, n, visited, scc_list)
+                self.__dfs(g_transpose, n, visited, scc_list, stats)
                 the_list.append(scc_list)
                 if key is not None and key in scc_list:
                     return scc_list
         return the_list
 
+    def tarjan(self) -> List[list]:
+        """
+        This method based on Tarjan's algorithm in iterative way.
+        Each node gets an index (the order it was discovered by the dfs) and a lowlink (the smallest index
+        reachable from it through the nodes that are still on the stack), both stored in lists by the node position.
+        The dfs is done with an explicit call stack of (node, neighbors iterator) pairs, so deep graphs do not reach
+        the recursion limit.
+        When the dfs finish a node whose lowlink equals its index, the node is the root of a component:
+        the nodes above it on the stack are popped out as one scc.
+        Unlike SCC (Kosaraju) it needs one pass and does not build the transpose graph.
+        The components are found in reverse topological order (a component is found before the components
+        that reach it).
+        Complexity: O(|V|+|E|).
+        :return: a List of lists represents all the strongly connected component in the graph.
+        """
+        if self.is_compact(self.graph):
+            gra = self.graph
+            ids = gra.ids.tolist()
+            neighbours = lambda i: gra.out_edges_at(i)[0]
+        else:
+            nodes = self.graph.get_all_v()
+            ids = list(nodes.keys())
+            position = {k: i for i, k in enumerate(ids)}
+            connections = [node.get_connections_out() for node in nodes.values()]
+            neighbours = lambda i: [position[k] for k in connections[i]]
+        neighbours = self.__checked(neighbours)
+        index = [-1] * len(ids)
+        lowlink = [0] * len(ids)
+        on_stack = bytearray(len(ids))
+        stack = []
+        counter = 0
+        the_list = []
+        for root in range(len(ids)):
+            if index[root] != -1:
+                continue
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            call_stack = [(root, iter(neighbours(root)))]
+            while call_stack:
+                v, neighbours_iter = call_stack[-1]
+                for w in neighbours_iter:
+                    if index[w] == -1:
+                        index[w] = lowlink[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = 1
+                        call_stack.append((w, iter(neighbours(w))))
+                        break
+                    if on_stack[w] and index[w] < lowlink[v]:
+                        lowlink[v] = index[w]
+                else:
+                    call_stack.pop()
+                    if call_stack:
+                        u = call_stack[-1][0]
+                        if lowlink[v] < lowlink[u]:
+                            lowlink[u] = lowlink[v]
+                    if lowlink[v] == index[v]:
+                        scc_list = []
+                        while True:
+                            w = stack.pop()
+                            on_stack[w] = 0
+                            scc_list.append(ids[w])
+                            if w == v:
+                                break
+                        the_list.append(scc_list)
+        return the_list
+
+    def __scc_compact(self, key=None, stats=None):
+        """
+        Kosaraju's algorithm over a CompactDiGraph (see SCC), the nodes are represented by their index
+        and converted back to node_ids at the end, the counters of the dfs runs are added to stats.
+        :return: a List of lists represents all the strongly connected component in the graph.
+        """
+        gra = self.graph
+        ids = gra.ids.tolist()
+        stack = []
+        visited = [0] * gra.v_size()
+        for i in range(gra.v_size()):
+            if not visited[i]:
+                self.__dfs(gra, i, visited, stack, stats)
+
+        g_transpose = gra.transpose()
+        visited = [0] * gra.v_size()
+        key_index = gra.index.get(key)
+
+        the_list = []
+        while stack:
+            scc_list = []
+            n = stack.pop()
+            if not visited[n]:
+                self.__dfs(g_transpose, n, visited, scc_list, stats)
+                if key_index is not None and key_index in scc_list:
+                    return [ids[i] for i in scc_list]
+                the_list.append([ids[i] for i in scc_list])
+        return the_list
+
+    def component_of(self, id1: int) -> list:
+        """
+        Finds the Strongly Connected Component(SCC) of node id1 without computing the other components:
+        the SCC is the intersection of the nodes reachable from id1 (over the out edges)
+        and the nodes id1 is reachable from (over the in edges), so no transpose graph is built.
+        The two searches run together, one node at a time, until one of them ends,
+        then the other search is done again using only the nodes the finished search reached.
+        Complexity: O(the smaller reachable region), |V|+|E| at most.
+        :param id1: the node_id
+        :return: The list of nodes in the SCC
+        """
+        if self.is_compact(self.graph):
+            gra = self.graph
+            s = gra.index[id1]
+            edges = (lambda i: gra.out_edges_at(i)[0], lambda i: gra.in_edges_at(i)[0])
+        else:
+            s = id1
+            edges = (self.neighbours(), self.neighbours(reverse=True))
+        edges = (self.__checked(edges[0]), self.__checked(edges[1]))
+        stacks, visited = ([s], [s]), ({s}, {s})
+        while stacks[0] and stacks[1]:
+            for d in (0, 1):
+                for k in edges[d](stacks[d].pop()):
+                    if k not in visited[d]:
+                        visited[d].add(k)
+                        stacks[d].append(k)
+        done = 0 if not stacks[0] else 1
+        component = [s]
+        inside, reached, edges_of = visited[done], {s}, edges[1 - done]
+        for v in component:
+            for k in edges_of(v):
+                if k not in reached and k in inside:
+                    reached.add(k)
+                    component.append(k)
+        return self.graph.ids[component].tolist() if self.is_compact(self.graph) else component
+
+    def has_node(self, node_id: int) -> bool:
+        """
+        Check if a node is in the graph without building the nodes of a CompactDiGraph.
+        :param node_id: the node_id
+        :return: True if the node is in the graph, False o.w.
+        """
+        if self.is_compact(self.graph):
+            return node_id in self.graph.index
+        return node_id in self.graph.get_all_v()
+
+    @staticmethod
+    def is_compact(gra) -> bool:
+        """
+        Check if a graph is a frozen CompactDiGraph (see DiGraph.freeze).
+        :param gra: a graph
+        :return: True if the graph is stored in compressed sparse arrays, False o.w.
+        """
+        return getattr(gra, "is_compact", False)
+
     def __eq__(self, other):
         if self is other:
             return True
@@ -67,11 +67,12 @@ class GraphAlgoInterface:
         """
         raise NotImplementedError
 
-    def plot_graph(self) -> None:
+    def plot_graph(self, file_name: str = None) -> None:
         """
         Plots the graph.
         If the nodes have a position, the nodes will be placed there.
         Otherwise, they will be placed in a random but elegant manner.
+        @param file_name: save the plot to this file instead of showing it
         @return: None
         """
         raise NotImplementedError
@@ -0,0 +1,328 @@
+import heapq
+import itertools
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from numpy import inf
+from CompactDiGraph import CompactDiGraph
+
+# the graph of a worker process, memory mapped from a file of the pool (see load_graph),
+# and the cancel flags of the pool, in memory shared with the workers (see flag_is_set)
+worker_graph = None
+worker_file = None
+worker_adjacency = None
+worker_flags = None
+
+
+def load_graph(file_name: str) -> None:
+    """
+    Runs in a worker process: open a binary graph file of the pool.
+    The arrays are memory mapped, so all the workers share the pages of one file instead of a pickled copy each.
+    """
+    global worker_graph, worker_file, worker_adjacency
+    worker_graph = CompactDiGraph.load(file_name)
+    worker_file = file_name
+    worker_adjacency = None
+
+
+def init_worker(flags) -> None:
+    """
+    Runs once in each worker process: keep the cancel flags of the pool.
+    The graph file is opened by the first task (see run_on), so a worker started later opens the current version.
+    """
+    global worker_flags
+    worker_flags = flags
+
+
+def run_on(file_name: str, func, args: tuple):
+    """
+    Runs in a worker process: func(*args) on the graph of file_name, that is opened first if the worker
+    has another version of the graph (see GraphPool.load).
+    """
+    if worker_file != file_name:
+        load_graph(file_name)
+    return func(*args)
+
+
+def flag_is_set(flag: int) -> bool:
+    """
+    Runs in a worker process: check the cancel flag of a task (see GraphPool.submit_cancellable).
+    :param flag: the index of the flag, None for a task without a flag
+    :return: True if the task was cancelled, False o.w.
+    """
+    return flag is not None and worker_flags[flag] != 0
+
+
+def adjacency_of(graph) -> list:
+    """
+    Returns the out edges of every node of a CompactDiGraph as lists of (dest index, weight) pairs,
+    so the searches do not slice the arrays again for every node they visit.
+    :param graph: a CompactDiGraph
+    :return: a list (by node index) of lists of (dest index, weight)
+    """
+    targets, weights, offsets = graph.out_targets.tolist(), graph.out_weights.tolist(), graph.out_offsets.tolist()
+    return [list(zip(targets[offsets[i]:offsets[i + 1]], weights[offsets[i]:offsets[i + 1]]))
+            for i in range(len(offsets) - 1)]
+
+
+def distance_row(adjacency: list, s: int, bound: float = inf) -> list:
+    """
+    Dijkstra's algorithm from the node in index s over all the graph,
+    or until it settles a node farther than bound.
+    :param adjacency: the out edges of every node (see adjacency_of)
+    :param s: the source node index
+    :param bound: the search stops when it settles a node farther than bound, then the distances larger
+    than bound are not final (so max of the row is larger than bound if and only if the search stopped early
+    or some node is not reachable)
+    :return: the distance of every node from s by node index, infinity if there is no path
+    """
+    distances = [inf] * len(adjacency)
+    distances[s] = 0
+    queue = [(0, s)]
+    while queue:
+        dist, current_node = heapq.heappop(queue)
+        if dist > distances[current_node]:
+            continue
+        if dist > bound:
+            break
+        for neighbour, w in adjacency[current_node]:
+            alternative_route = dist + w
+            if alternative_route < distances[neighbour]:
+                distances[neighbour] = alternative_route
+                heapq.heappush(queue, (alternative_route, neighbour))
+    return distances
+
+
+def partial_tree(adjacency: list, s: int, targets: list) -> (list, list):
+    """
+    Dijkstra's algorithm from the node in index s that stops when all the targets are settled.
+    :param adjacency: the out edges of every node (see adjacency_of)
+    :param s: the source node index
+    :param targets: the node indices the search has to settle
+    :return: the distances and the "fathers" (-1 for the source or a node that was not reached) by node index,
+    final for the targets and the nodes on their paths
+    """
+    distances = [inf] * len(adjacency)
+    previous_nodes = [-1] * len(adjacency)
+    settled = bytearray(len(adjacency))
+    left = set(targets)
+    left.discard(s)
+    distances[s] = 0
+    queue = [(0, s)]
+    while queue and left:
+        dist, current_node = heapq.heappop(queue)
+        if settled[current_node]:
+            continue
+        settled[current_node] = 1
+        left.discard(current_node)
+        for neighbour, w in adjacency[current_node]:
+            alternative_route = dist + w
+            if alternative_route < distances[neighbour]:
+                distances[neighbour] = alternative_route
+                previous_nodes[neighbour] = current_node
+                heapq.heappush(queue, (alternative_route, neighbour))
+    return distances, previous_nodes
+
+
+def worker_adjacency_of() -> list:
+    """
+    Returns the out edges of every node of the graph of this worker process, built on the first call.
+    """
+    global worker_adjacency
+    if worker_adjacency is None:
+        worker_adjacency = adjacency_of(worker_graph)
+    return worker_adjacency
+
+
+def partial_trees(groups: list) -> list:
+    """
+    Runs partial_tree for each (source, targets) group over the graph of this worker process.
+    Only the distances of the targets and the "fathers" array are sent back.
+    :param groups: a list of (source index, list of target indices)
+    :return: a list of (distances of the targets, "fathers" as an int32 array)
+    """
+    adjacency = worker_adjacency_of()
+    results = []
+    for s, targets in groups:
+        distances, previous_nodes = partial_tree(adjacency, s, targets)
+        results.append(([distances[t] for t in targets], np.array(previous_nodes, dtype=np.int32)))
+    return results
+
+
+def distance_rows(sources: list, dtype=np.float64, adjacency: list = None) -> np.ndarray:
+    """
+    Returns the rows of the distance matrix of the sources.
+    Without adjacency the graph of the worker process is used (see load_graph).
+    :param sources: the source node indices
+    :param dtype: the type of the matrix
+    :param adjacency: the out edges of every node (see adjacency_of)
+    :return: a len(sources) x |V| matrix
+    """
+    if adjacency is None:
+        adjacency = worker_adjacency_of()
+    return np.array([distance_row(adjacency, s) for s in sources], dtype=dtype)
+
+
+class GraphPool:
+    """
+    This class represent a pool of worker processes that share one read only graph.
+    The graph is written once to a binary file (see CompactDiGraph.save) that every worker memory maps,
+    so the tasks send only node indices and get back results, the graph is never pickled.
+    A new version of the graph is written to another file (see load) and the same workers open it
+    on their next task, so a changed graph does not start new processes.
+    """
+
+    def __init__(self, graph, workers: int = None, flags: int = 256):
+        """
+        Each pool holds the frozen graph, a temporary directory with its binary files and the executor,
+        the graph it was built from with its mode counter (mc), see matches,
+        and the cancel flags of the tasks, shared with the workers (see submit_cancellable).
+        :param graph: a DiGraph or a CompactDiGraph (a DiGraph is frozen first)
+        :param workers: the number of worker processes, the number of CPUs by default
+        :param flags: the number of cancel flags, the tasks that run together with a flag
+        """
+        self.__workers = workers or os.cpu_count() or 1
+        self.__dir = tempfile.mkdtemp(prefix="graph_pool_")
+        self.__lock = threading.Lock()
+        self.__versions = itertools.count()
+        self.__flags = multiprocessing.RawArray('b', flags)
+        self.__free_flags = list(range(flags))
+        self.load(graph)
+        self.__executor = ProcessPoolExecutor(self.__workers, initializer=init_worker, initargs=(self.__flags,))
+
+    def load(self, graph) -> str:
+        """
+        Write a new version of the graph to the pool, the next tasks run on it.
+        The workers open it on their first task that uses it, the tasks that run on an older version
+        are not changed (see submit_to).
+        :param graph: a DiGraph or a CompactDiGraph (a DiGraph is frozen first)
+        :return: the file name of the version
+        """
+        frozen = graph if getattr(graph, "is_compact", False) else graph.freeze()
+        file_name = os.path.join(self.__dir, "graph_{}.bin".format(next(self.__versions)))
+        frozen.save(file_name)
+        with self.__lock:
+            self.__source, self.__mc, self.__graph, self.__file = graph, graph.get_mc(), frozen, file_name
+        return file_name
+
+    def remove(self, file_name: str) -> None:
+        """
+        Remove the file of an old version of the graph (see load) whose tasks are done.
+        The workers that opened it keep their mapping until they open another version.
+        """
+        if file_name != self.__file:
+            try:
+                os.remove(file_name)
+            except OSError:
+                pass
+
+    def get_graph(self) -> CompactDiGraph:
+        """
+        :return: the (frozen) graph of the pool, node indices refer to it.
+        """
+        return self.__graph
+
+    def get_file(self) -> str:
+        """
+        :return: the file name of the last version of the graph (see load).
+        """
+        return self.__file
+
+    def matches(self, graph) -> bool:
+        """
+        :return: True if the last version of the pool (see load) is graph and graph did not change since (same mc),
+        False o.w.
+        """
+        return graph is self.__source and graph.get_mc() == self.__mc
+
+    def get_workers(self) -> int:
+        """
+        :return: the number of worker processes.
+        """
+        return self.__workers
+
+    def submit(self, func, *args):
+        """
+        Run func(*args) in a worker process, func is a module level function that may use the graph of the worker.
+        :return: a Future of the result
+        """
+        return self.submit_to(self.__file, func, *args)
+
+    def submit_to(self, file_name: str, func, *args):
+        """
+        Run func(*args) in a worker process on a version of the graph (see load), as submit.
+        :return: a Future of the result
+        """
+        return self.__executor.submit(run_on, file_name, func, args)
+
+    def submit_cancellable(self, file_name: str, func, *args):
+        """
+        Run func(*args, flag) in a worker process on a version of the graph (see submit_to), with a cancel flag
+        in the memory shared with the workers: func checks it by flag_is_set(flag).
+        The flag is free again when the task is done (if all the flags are in use flag is None, never set).
+        :return: a Future of the result, and a function () -> None that sets the flag
+        """
+        with self.__lock:
+            flag = self.__free_flags.pop() if self.__free_flags else None
+        if flag is not None:
+            self.__flags[flag] = 0
+        future = self.submit_to(file_name, func, *args, flag)
+
+        def cancel():
+            with self.__lock:
+                if flag is not None and not future.done():
+                    self.__flags[flag] = 1
+
+        def free(_):
+            if flag is not None:
+                with self.__lock:
+                    self.__free_flags.append(flag)
+        future.add_done_callback(free)
+        return future, cancel
+
+    def distance_rows(self, sources: list, out: np.ndarray, chunk_size: int = None) -> np.ndarray:
+        """
+        Compute the distance rows of the sources in the workers, each chunk of sources is one task,
+        and write each row to out as soon as its chunk is done (out[i] is the row of sources[i]).
+        :param sources: the source node indices
+        :param out: a preallocated len(sources) x |V| matrix (an array or a memmap)
+        :param chunk_size: the number of sources in each task, about 8 tasks for each worker by default
+        :return: out
+        """
+        sources = list(sources)
+        chunk_size = chunk_size or max(1, len(sources) // (self.__workers * 8))
+        futures = {self.submit(distance_rows, sources[i:i + chunk_size], out.dtype): i
+                   for i in range(0, len(sources), chunk_size)}
+        for future in as_completed(futures):
+            rows = future.result()
+            out[futures[future]:futures[future] + len(rows)] = rows
+        return out
+
+    def partial_trees(self, groups: list, chunk_size: int = None) -> list:
+        """
+        Run the searches of the (source, targets) groups in the workers (see partial_trees),
+        each chunk of groups is one task.
+        :param groups: a list of (source index, list of target indices)
+        :param chunk_size: the number of groups in each task, about 4 tasks for each worker by default
+        :return: the results in the order of the groups
+        """
+        chunk_size = chunk_size or max(1, len(groups) // (self.__workers * 4))
+        futures = [self.submit(partial_trees, groups[i:i + chunk_size]) for i in range(0, len(groups), chunk_size)]
+        return [result for future in futures for result in future.result()]
+
+    def close(self) -> None:
+        """
+        Stop the worker processes and remove the binary file of the graph.
+        """
+        self.__executor.shutdown()
+        shutil.rmtree(self.__dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
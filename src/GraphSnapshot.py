@@ -0,0 +1,177 @@
+from GraphInterface import GraphInterface
+from Node import Node
+
+
+class GraphSnapshot(GraphInterface):
+    """
+    This class represent a read only view of a DiGraph at one version (mc), taken by DiGraph.snapshot().
+    The snapshot shares the dictionary of the nodes (a dict or a LayeredDict) and the nodes of the graph,
+    and the graph writes its changes to a new layer and copies the nodes before it changes them (copy on write),
+    so a snapshot never changes and GraphAlgo can run on it
+    while another thread keeps changing the graph.
+    It implement GraphInterface abstract class, so it can be used everywhere a DiGraph is used for reading.
+    """
+
+    def __init__(self, nodes: dict, mc: int, num_of_edges: int):
+        """
+        Each snapshot holds the dictionary of the nodes of the graph, the number of edges and the mode counter (mc)
+        of the graph when it was taken.
+        Note: the dictionaries returned by the snapshot are shared, they must not be changed.
+        """
+        self.nodes = nodes
+        self.__mc = mc
+        self.__num_of_edges = num_of_edges
+
+    def v_size(self) -> int:
+        """
+        Returns the number of vertices in this graph
+        :return: The number of vertices in this graph
+        """
+        return len(self.nodes)
+
+    def e_size(self) -> int:
+        """
+        Returns the number of edges in this graph
+        :return: The number of edges in this graph
+        """
+        return self.__num_of_edges
+
+    def get_all_v(self) -> dict:
+        """
+        Return a dictionary of all the nodes in the Graph,
+        each node is represented using a pair (node_id, Node).
+        :return: dictionary of all the nodes in the Graph
+        """
+        return self.nodes
+
+    def all_in_edges_of_node(self, id1: int) -> dict:
+        """
+        Return a dictionary of all the nodes connected to (into) node_id ,
+        each node is represented using a pair (key, edge weight)
+        :return: return a dictionary of all the nodes connected to (into) node_id
+        """
+        if id1 not in self.nodes:
+            raise Exception('Node {} is not exist in the graph'.format(id1))
+        return self.nodes[id1].get_connections_in()
+
+    def all_out_edges_of_node(self, id1: int) -> dict:
+        """
+        Return a dictionary of all the nodes connected from node_id ,
+        each node is represented using a pair (key, edge weight)
+        :return: return a dictionary of all the nodes connected from node_id
+        """
+        if id1 not in self.nodes:
+            raise Exception('Node {} is not exist in the graph'.format(id1))
+        return self.nodes[id1].get_connections_out()
+
+    def get_mc(self) -> int:
+        """
+        Returns the version of the graph this snapshot was taken from.
+        :return: The version of this graph.
+        """
+        return self.__mc
+
+    def add_edge(self, id1: int, id2: int, weight: float) -> bool:
+        """
+        A snapshot can not be changed, the method simply does nothing.
+        :return: False
+        """
+        return False
+
+    def add_node(self, node_id: int, pos: tuple = None) -> bool:
+        """
+        A snapshot can not be changed, the method simply does nothing.
+        :return: False
+        """
+        return False
+
+    def remove_node(self, node_id: int) -> bool:
+        """
+        A snapshot can not be changed, the method simply does nothing.
+        :return: False
+        """
+        return False
+
+    def remove_edge(self, node_id1: int, node_id2: int) -> bool:
+        """
+        A snapshot can not be changed, the method simply does nothing.
+        :return: False
+        """
+        return False
+
+    def add_nodes_from(self, nodes) -> int:
+        """
+        A snapshot can not be changed, the method simply does nothing.
+        :return: 0
+        """
+        return 0
+
+    def add_edges_from(self, edges) -> int:
+        """
+        A snapshot can not be changed, the method simply does nothing.
+        :return: 0
+        """
+        return 0
+
+    def remove_edges_from(self, edges) -> int:
+        """
+        A snapshot can not be changed, the method simply does nothing.
+        :return: 0
+        """
+        return 0
+
+    def get_node(self, node_id: int) -> Node:
+        """
+        Return the node by his key (node_id).
+        Note: the node is shared with the graph, it must not be changed.
+        :param node_id: this node key
+        :return: the node by his key.
+        """
+        if node_id not in self.nodes:
+            raise Exception('Node {} is not exist in the graph'.format(node_id))
+        return self.nodes[node_id]
+
+    def freeze(self):
+        """
+        Return a frozen copy of this snapshot stored in compressed sparse arrays (CompactDiGraph).
+        :return: a CompactDiGraph with the same nodes and edges as this snapshot
+        """
+        from CompactDiGraph import CompactDiGraph
+        return CompactDiGraph.from_digraph(self)
+
+    def thaw(self):
+        """
+        Return a new (mutable) DiGraph with the same nodes and edges as this snapshot.
+        :return: a new DiGraph
+        """
+        from DiGraph import DiGraph
+        gra = DiGraph()
+        gra.add_nodes_from((k, v.get_location()) for k, v in self.nodes.items())
+        gra.add_edges_from([(k, dest, w) for k, v in self.nodes.items()
+                            for dest, w in v.get_connections_out().items()])
+        return gra
+
+    def as_dict(self):
+        """
+        Return the graph as dictionary {"Edges": ...., "Nodes": ....}
+        :return: the graph as dictionary
+        """
+        node_list = []
+        edge_list = []
+        for v in self.nodes.values():
+            node_list.append(v.as_dict_node())
+            edge_list.extend(v.as_dict_edge())
+        return {"Edges": edge_list, "Nodes": node_list}
+
+    def __str__(self) -> str:
+        s = ''
+        for key, value in self.nodes.items():
+            s += str(key) + ' : ' + str(value) + '\n'
+        return s
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if other is None or self.__class__ is not other.__class__:
+            return False
+        return self.nodes == other.nodes and self.e_size() == other.e_size()
@@ -0,0 +1,129 @@
+import json
+import re
+
+WHITESPACE = re.compile(r'\s*')
+
+
+class JsonRecordReader:
+    """
+    This class reads a JSON object of the form {"key": [record, record, ...], ...} from a file incrementally.
+    Each record of each top level array is decoded and returned alone, so the whole file is never held in memory.
+    """
+
+    def __init__(self, f, chunk_size: int = 1 << 16):
+        """
+        Each reader holds the file, a buffer of the text that was read but not decoded yet,
+        and the position of the next character to decode in the buffer.
+        :param f: a file opened for reading (text mode)
+        :param chunk_size: the number of characters read from the file each time the buffer runs out
+        """
+        self.__file = f
+        self.__chunk_size = chunk_size
+        self.__decoder = json.JSONDecoder()
+        self.__buffer = ''
+        self.__pos = 0
+        self.__eof = False
+
+    def records(self):
+        """
+        Returns a generator of (key, record) pairs, one pair for each item of each top level array,
+        in the order of the file. A top level value that is not an array is returned as a single record.
+        :return: a generator of (key, record)
+        """
+        self.__expect('{')
+        while True:
+            c = self.__peek()
+            if c == '}':
+                return
+            if c == ',':
+                self.__pos += 1
+                continue
+            key = self.__decode()
+            self.__expect(':')
+            if self.__peek() != '[':
+                yield key, self.__decode()
+                continue
+            self.__pos += 1
+            if self.__peek() == ']':
+                self.__pos += 1
+                continue
+            yield from self.__array(key)
+
+    def __array(self, key: str):
+        """
+        Returns a generator of the (key, record) pairs of the array that starts at the current position,
+        and consumes the closing bracket.
+        The records that are complete in the buffer are decoded together by a single json.loads call
+        (up to the last '}' before the first ']'), the text is valid JSON only if the cut is between two records.
+        Otherwise (a record that is cut by the end of the buffer, or records that are not objects)
+        the next record is decoded alone.
+        """
+        while True:
+            c = self.__peek()
+            if c == ']':
+                self.__pos += 1
+                return
+            if c == ',':
+                self.__pos += 1
+                continue
+            buffer, pos = self.__buffer, self.__pos
+            limit = buffer.find(']', pos)
+            cut = buffer.rfind('}', pos, limit if limit >= 0 else len(buffer))
+            records = None
+            if cut > pos:
+                try:
+                    records = json.loads('[' + buffer[pos:cut + 1] + ']')
+                except json.JSONDecodeError:
+                    records = None
+            if records is None:
+                yield key, self.__decode()
+                continue
+            self.__pos = cut + 1
+            for record in records:
+                yield key, record
+
+    def __fill(self) -> bool:
+        """
+        Read the next chunk of the file into the buffer (dropping the decoded text).
+        :return: False if the file ended, True o.w.
+        """
+        chunk = self.__file.read(self.__chunk_size)
+        self.__buffer = self.__buffer[self.__pos:] + chunk
+        self.__pos = 0
+        self.__eof = not chunk
+        return not self.__eof
+
+    def __peek(self) -> str:
+        """
+        Skip white spaces and return the next character (without consuming it).
+        """
+        while True:
+            self.__pos = WHITESPACE.match(self.__buffer, self.__pos).end()
+            if self.__pos < len(self.__buffer):
+                return self.__buffer[self.__pos]
+            if not self.__fill():
+                raise ValueError('Unexpected end of JSON file')
+
+    def __expect(self, c: str) -> None:
+        if self.__peek() != c:
+            raise ValueError('Expected {} at {!r}'.format(c, self.__buffer[self.__pos:self.__pos + 20]))
+        self.__pos += 1
+
+    def __decode(self):
+        """
+        Decode the next JSON value, reading more of the file while the value is not complete.
+        A value may be cut by the end of the buffer and still look valid (a number: "2." of "2.5"),
+        so the value is taken only when a delimiter (, ] } :) follows it in the buffer, or the file ended.
+        """
+        self.__peek()
+        while True:
+            try:
+                value, end = self.__decoder.raw_decode(self.__buffer, self.__pos)
+                following = WHITESPACE.match(self.__buffer, end).end()
+                if self.__eof or (following < len(self.__buffer) and self.__buffer[following] in ',]}:'):
+                    self.__pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.__eof:
+                    raise
+            self.__fill()
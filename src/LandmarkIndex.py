@@ -0,0 +1,176 @@
+import operator
+import random
+import numpy as np
+from numpy import inf
+from GraphPool import adjacency_of, distance_row
+
+# the distance of a node that a landmark does not reach (or that does not reach it) in the rows of estimate_to,
+# a finite number so the differences of two of them are 0 and not nan
+UNREACHED = 1e300
+# about how many times a bound computed in Python costs more than a bound computed with numpy (see estimate_to)
+LAZY_RATIO = 64
+
+
+class LandmarkIndex:
+    """
+    This class represent a landmark (ALT) index of a directed weighted graph: the distances from and to
+    a few chosen nodes (the landmarks).
+    By the triangle inequality, for every landmark L and nodes u, v:
+    dist(u, v) >= dist(L, v) - dist(L, u) and dist(u, v) >= dist(u, L) - dist(v, L),
+    so the index gives a lower bound of any distance in O(k) (k = number of landmarks),
+    a heuristic for A* that does not need the nodes positions.
+    """
+
+    def __init__(self, ids: list, landmarks: list, forward: np.ndarray, backward: np.ndarray, graph=None,
+                 mc: int = None):
+        """
+        Each index holds:
+        ids: the node_id of each index (0..|V|-1).
+        landmarks: the node indices of the landmarks.
+        forward: a k x |V| matrix, forward[i][v] is the distance from landmark i to node v.
+        backward: a k x |V| matrix, backward[i][v] is the distance from node v to landmark i.
+        In addition it holds the graph and the mode counter (mc) it was built on,
+        and the rows of the nodes as lists (by node index), converted on the first estimate_to.
+        """
+        self.ids = ids
+        self.index = {k: i for i, k in enumerate(ids)}
+        self.landmarks = landmarks
+        self.forward = forward
+        self.backward = backward
+        self.__graph = graph
+        self.__mc = mc if mc is not None else (graph.get_mc() if graph is not None else None)
+        self.__rows = None
+
+    @classmethod
+    def build(cls, graph, k: int = 16, seed: int = 0):
+        """
+        Build the index of a graph, the landmarks are chosen by farthest point selection:
+        the first landmark is a random node, and each next landmark is the node farthest from the landmarks
+        chosen so far (by the distance to a landmark and back), a node that no landmark reaches first.
+        Each landmark costs two Dijkstra searches over all the graph (from it, and to it over the in edges).
+        Complexity: O(k(|V|+|E|)log|V|), |V|=number of nodes, |E|=number of edges.
+        :param graph: a DiGraph or a CompactDiGraph
+        :param k: the number of landmarks (at most |V|)
+        :param seed: the seed of the first landmark choice
+        :return: a new LandmarkIndex
+        """
+        gra = graph if getattr(graph, "is_compact", False) else graph.freeze()
+        n = gra.v_size()
+        k = min(k, n)
+        adjacency, reverse = adjacency_of(gra), adjacency_of(gra.transpose())
+        forward = np.empty((k, n), dtype=np.float64)
+        backward = np.empty((k, n), dtype=np.float64)
+        landmarks = []
+        spread = np.full(n, inf)
+        v = random.Random(seed).randrange(n) if n else None
+        for i in range(k):
+            landmarks.append(v)
+            forward[i] = distance_row(adjacency, v)
+            backward[i] = distance_row(reverse, v)
+            spread = np.minimum(spread, forward[i] + backward[i])
+            spread[landmarks] = -1
+            v = int(np.argmax(spread))
+        return cls(gra.ids.tolist(), landmarks, forward, backward, graph)
+
+    def get_graph(self):
+        """
+        :return: the graph this index belongs to.
+        """
+        return self.__graph
+
+    def get_mc(self) -> int:
+        """
+        :return: the mode counter of the graph when this index was built.
+        """
+        return self.__mc
+
+    def is_valid(self, graph) -> bool:
+        """
+        Check that this index can answer queries on the graph: the same graph, not changed since.
+        :param graph: a graph
+        :return: True if the index is up to date with the graph, False o.w.
+        """
+        return graph is self.__graph and graph.get_mc() == self.__mc
+
+    def get_landmarks(self) -> list:
+        """
+        :return: the node_ids of the landmarks.
+        """
+        return [self.ids[v] for v in self.landmarks]
+
+    def bounds(self, src: int, dest: int) -> (float, float):
+        """
+        Returns a lower and an upper bound of the distance from src to dest in O(k):
+        the largest triangle inequality bound, and the shortest route through a landmark.
+        A lower bound of infinity means there is no path: a landmark reaches src and not dest,
+        or dest reaches a landmark that src does not reach.
+        :param src: the source node_id
+        :param dest: the destination node_id
+        :return: (lower, upper)
+        """
+        if src not in self.index:
+            raise Exception('Node {} is not exist in the graph'.format(src))
+        if dest not in self.index:
+            raise Exception('Node {} is not exist in the graph'.format(dest))
+        u, v = self.index[src], self.index[dest]
+        if u == v:
+            return 0, 0
+        with np.errstate(invalid="ignore"):
+            lower = np.fmax(self.forward[:, v] - self.forward[:, u], self.backward[:, u] - self.backward[:, v])
+        lower = np.fmax.reduce(lower) if len(lower) else 0
+        upper = np.min(self.backward[:, u] + self.forward[:, v]) if len(self.landmarks) else inf
+        return (0 if np.isnan(lower) else max(0.0, float(lower))), float(upper)
+
+    def estimate_to(self, dest: int):
+        """
+        Returns the A* heuristic toward dest: a function that gives the lower bound of the distance from a node
+        to dest, computed in O(k) the first time the search asks for the node and kept in a memo,
+        so a local query costs only for the nodes it reaches.
+        The row of each node is its distances from the landmarks followed by its distances to them negated
+        (UNREACHED for infinity), so both bounds of all the landmarks are max(row(dest) - row(u)).
+        A bound in Python costs about LAZY_RATIO times a bound computed with numpy for all the nodes at once,
+        so once the memo holds |V| / LAZY_RATIO nodes the rest are computed at once: a query costs at most about
+        twice the cheaper of the two ways.
+        :param dest: the destination node_id
+        :return: a function node_id -> float
+        """
+        if self.__rows is None:
+            rows = np.concatenate((self.forward, -self.backward)).T
+            rows = np.clip(rows, -UNREACHED, UNREACHED)
+            self.__rows = (rows, rows.tolist())
+        rows, row_lists = self.__rows
+        index, v = self.index, self.index[dest]
+        to_dest = row_lists[v]
+        memo = {dest: 0}
+        limit = len(self.ids) // LAZY_RATIO
+        bounds = None
+        sub = operator.sub
+
+        def estimate(k):
+            nonlocal bounds
+            if bounds is not None:
+                return bounds[index[k]]
+            bound = memo.get(k)
+            if bound is None:
+                if len(memo) >= limit:
+                    bounds = self.__bounds_to(rows, v)
+                    return bounds[index[k]]
+                bound = max(map(sub, to_dest, row_lists[index[k]]), default=0)
+                if bound < 0:
+                    bound = 0
+                elif bound >= UNREACHED / 2:
+                    bound = inf
+                memo[k] = bound
+            return bound
+        return estimate
+
+    @staticmethod
+    def __bounds_to(rows: np.ndarray, v: int) -> list:
+        """
+        Returns the lower bound of the distance from every node to the node of index v (see estimate_to).
+        """
+        bounds = (rows[v] - rows).max(axis=1) if rows.shape[1] else np.zeros(len(rows))
+        bounds[bounds < 0] = 0
+        bounds[bounds >= UNREACHED / 2] = inf
+        bounds[v] = 0
+        return bounds.tolist()
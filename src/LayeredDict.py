@@ -0,0 +1,137 @@
+from collections.abc import MutableMapping
+
+# the value of a key that was removed in a layer (see LayeredDict)
+REMOVED = object()
+# a layer is merged into the layer below it when it has at least 1 / MERGE_RATIO of its entries (see on_top)
+MERGE_RATIO = 8
+
+
+class LayeredDict(MutableMapping):
+    """
+    This class represent a dictionary made of a read only parent (a dict or another LayeredDict)
+    and a layer of the entries that were changed on top of it (a removed key holds REMOVED),
+    so a change copies only the changed entries and the parent is never changed.
+    DiGraph uses it for its nodes while a snapshot holds the parent (see DiGraph.snapshot).
+    Each layer has less than 1 / MERGE_RATIO of the entries of the layer below it (see on_top),
+    so a lookup walks O(log |V|) layers (4 on a graph of 10000 nodes).
+    """
+
+    __slots__ = ("parent", "changes", "__size")
+
+    def __init__(self, parent, changes: dict = None, size: int = None):
+        """
+        Each LayeredDict holds its parent, the changed entries and its number of keys.
+        :param parent: a dict or a LayeredDict, it must not change while this one uses it
+        :param changes: the changed entries, key --> value or REMOVED
+        :param size: the number of keys, the size of the parent by default (no changes)
+        """
+        self.parent = parent
+        self.changes = changes if changes is not None else {}
+        self.__size = size if size is not None else len(parent)
+
+    @staticmethod
+    def on_top(nodes):
+        """
+        Returns a new (empty) LayeredDict over nodes, that is read only from now on.
+        The top layers are merged first while a layer has at least 1 / MERGE_RATIO of the entries of the layer
+        below it (a layer over a dict is merged into a new dict), the merged layers are new objects so the readers
+        of nodes see no change. Each entry is copied O(MERGE_RATIO * log |V|) times over all the merges,
+        not the whole dictionary for each layer.
+        :param nodes: a dict or a LayeredDict
+        :return: a LayeredDict over nodes (or over the merged layers)
+        """
+        while isinstance(nodes, LayeredDict):
+            parent = nodes.parent
+            if not nodes.changes:
+                nodes = parent
+            elif not isinstance(parent, LayeredDict):
+                if MERGE_RATIO * len(nodes.changes) < len(parent):
+                    break
+                nodes = nodes.flatten()
+            elif MERGE_RATIO * len(nodes.changes) >= len(parent.changes):
+                nodes = LayeredDict(parent.parent, {**parent.changes, **nodes.changes}, len(nodes))
+            else:
+                break
+        return LayeredDict(nodes)
+
+    def flatten(self) -> dict:
+        """
+        Returns a new dict with the entries of all the layers: a copy of the dict at the bottom,
+        with the changes of the layers applied from the bottom up, O(|V|).
+        """
+        parent = self.parent
+        result = parent.flatten() if type(parent) is LayeredDict else dict(parent)
+        for key, value in self.changes.items():
+            if value is REMOVED:
+                result.pop(key, None)
+            else:
+                result[key] = value
+        return result
+
+    def collapse(self) -> dict:
+        """
+        Applies the changes of all the layers to the dict at the bottom, from the bottom up, and returns it,
+        O(changes) instead of the O(|V|) copy of flatten.
+        The dict is changed in place, so it may be called only when nothing else reads the layers below this one
+        (DiGraph collapses its nodes once no snapshot holds them).
+        """
+        layers, nodes = [], self
+        while type(nodes) is LayeredDict:
+            layers.append(nodes.changes)
+            nodes = nodes.parent
+        for changes in reversed(layers):
+            for key, value in changes.items():
+                if value is REMOVED:
+                    nodes.pop(key, None)
+                else:
+                    nodes[key] = value
+        return nodes
+
+    def get(self, key, default=None):
+        layer = self
+        while type(layer) is LayeredDict:
+            value = layer.changes.get(key, layer)
+            if value is not layer:
+                return default if value is REMOVED else value
+            layer = layer.parent
+        return layer.get(key, default)
+
+    def __getitem__(self, key):
+        layer = self
+        while type(layer) is LayeredDict:
+            value = layer.changes.get(key, layer)
+            if value is not layer:
+                if value is REMOVED:
+                    raise KeyError(key)
+                return value
+            layer = layer.parent
+        return layer[key]
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, REMOVED) is not REMOVED
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.__size += 1
+        self.changes[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.changes[key] = REMOVED
+        self.__size -= 1
+
+    def __iter__(self):
+        changes = self.changes
+        for key in self.parent:
+            if key not in changes:
+                yield key
+        for key, value in changes.items():
+            if value is not REMOVED:
+                yield key
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def __repr__(self) -> str:
+        return repr(self.flatten())
@@ -1,22 +1,77 @@
+from array import array
+
+# the value of the slots of a node that has no position (a removed position)
+NO_POSITION = array('d', (float("nan"),) * 3)
+
+
+class Coordinates:
+    """
+    This class represent the positions of the nodes of a graph: one array('d') with 3 slots (x, y, z) for each
+    node that has a position, and the offsets of the slots that were released (by removed nodes),
+    a released slot is given to the next node that needs one, so the array does not grow with the changes.
+    The version counts the writes of positions (positions do not change the mc of the graph), so a result that was
+    computed from the positions (see GraphAlgo.heuristic_scale) knows when it is old.
+    """
+
+    __slots__ = ("values", "free", "version")
+
+    def __init__(self):
+        self.values = array('d')
+        self.free = []
+        self.version = 0
+
+    def allocate(self, position: array) -> int:
+        """
+        Store a position (x, y, z) in a free slot, or at the end of the array if no slot is free.
+        :return: the offset of the slot
+        """
+        self.version += 1
+        if self.free:
+            offset = self.free.pop()
+            self.values[offset:offset + 3] = position
+            return offset
+        self.values.extend(position)
+        return len(self.values) - 3
+
+    def release(self, offset: int) -> None:
+        """
+        Give back the slot at offset, it is used again by allocate.
+        """
+        self.values[offset:offset + 3] = NO_POSITION
+        self.free.append(offset)
+        self.version += 1
+
+
 class Node:
     """
     This class represent a node (vertex).
+    The fields are slots (no __dict__ for each node), and the position is kept in the coordinates of the graph
+    (see Coordinates) that all the nodes of a graph share, instead of a tuple of 3 float objects for each node.
     """
 
-    def __init__(self, k: int = None, loc: tuple = None, **kwargs):
+    __slots__ = ("__key", "__coordinates", "__offset", "__location", "__ni_out", "__ni_in")
+
+    def __init__(self, k: int = None, loc: tuple = None, coordinates: Coordinates = None, **kwargs):
         """
         Each node contain dew fields:
         key: node_id.
-        location: node's position represent as 3DPoint.
+        offset: the offset of the node's slots (x, y, z) in the coordinates, -1 if it has none yet.
+        The node keeps its slots once it has them, a removed position is marked in them (see NO_POSITION).
+        location: a position that is not 3 numbers, kept as it was given (None if the position is in the slots).
         ni_out: a dictionary that holds all the "edges" that connected from this node,
         each edge is represented using a pair (key, edge weight).
         ni_in: a dictionary that holds all the "edges" that connected to this node,
         each edge is represented using a pair (key, edge weight)
+        :param coordinates: the Coordinates of the graph, new coordinates for this node by default
         """
         self.__key = k
-        self.__location = loc
+        self.__coordinates = coordinates if coordinates is not None else Coordinates()
+        self.__offset = -1
+        self.__location = None
         self.__ni_out = {}
         self.__ni_in = {}
+        if loc is not None:
+            self.set_location(loc)
 
     def add_neighbor_out(self, neighbor_id: int, weight: float) -> None:
         """
@@ -50,6 +105,37 @@ class Node:
         """
         return self.__ni_in
 
+    def copy(self):
+        """
+        Return a copy of this node with dictionaries of its own,
+        used by DiGraph to change a node that a snapshot still holds (see DiGraph.snapshot).
+        The copy takes the slots of the position, and this node keeps its position as a tuple of its own,
+        so the changes of the copy (edges or position) are never seen through this node.
+        :return: a new node
+        """
+        n = Node.__new__(Node)
+        n.__key = self.__key
+        n.__coordinates = self.__coordinates
+        n.__offset = self.__offset
+        n.__location = self.__location
+        n.__ni_out = dict(self.__ni_out)
+        n.__ni_in = dict(self.__ni_in)
+        if self.__offset >= 0:
+            self.__location = self.get_location()
+            self.__offset = -1
+        return n
+
+    def release(self) -> None:
+        """
+        Give back the slots of this node to the coordinates of the graph, used by DiGraph when the node is removed.
+        The node keeps its position as a tuple of its own, so a snapshot (or a caller) that still holds the node
+        sees the same position.
+        """
+        if self.__offset >= 0:
+            self.__location = self.get_location()
+            offset, self.__offset = self.__offset, -1
+            self.__coordinates.release(offset)
+
     def get_key(self) -> int:
         """
         Return this node key.
@@ -60,17 +146,40 @@ class Node:
     def get_location(self) -> tuple:
         """
         Return this node location as a 3DPoint (x, y, z).
-        :return: this node location
-        """
-        return self.__location
+        :return: this node location, None if it has no position
+        """
+        if self.__location is not None or self.__offset < 0:
+            return self.__location
+        values = self.__coordinates.values
+        x = values[self.__offset]
+        if x != x:
+            return None
+        return x, values[self.__offset + 1], values[self.__offset + 2]
 
     def set_location(self, location: tuple) -> None:
         """
         Allows to add location to this node.
         This method used for load and plot graphs that their nodes have no position.
-        :param location: the new position of this node
-        """
-        self.__location = location
+        A position of 3 numbers is written to the slots of the node (the first position takes free slots,
+        see Coordinates), any other position (or None) is kept as it is given.
+        Note: to change a node of a DiGraph use DiGraph.set_location, so the snapshots of the graph do not see it.
+        :param location: the new position of this node (x, y, z), or None
+        """
+        try:
+            position = array('d', location) if location is not None else None
+        except TypeError:
+            position = None
+        self.__coordinates.version += 1
+        if position is None or len(position) != 3:
+            self.__location = location
+            if self.__offset >= 0:
+                self.__coordinates.values[self.__offset:self.__offset + 3] = NO_POSITION
+            return
+        self.__location = None
+        if self.__offset < 0:
+            self.__offset = self.__coordinates.allocate(position)
+        else:
+            self.__coordinates.values[self.__offset:self.__offset + 3] = position
 
     def as_dict_node(self):
         """
@@ -104,5 +213,5 @@ class Node:
         if o is None or self.__class__ is not o.__class__:
             return False
         other = o
-        return self.__key == other.__key and self.__location.__eq__(other.__location) and self.__ni_in.__eq__(
+        return self.__key == other.__key and self.get_location() == other.get_location() and self.__ni_in.__eq__(
             other.__ni_in) and self.__ni_out.__eq__(other.__ni_out)
\ No newline at end of file
@@ -0,0 +1,50 @@
+class PathResult:
+    """
+    This class represent the result of one shortest path query of a batch (see GraphAlgo.shortest_path_batch):
+    the distance is known, and the path is built only when it is read for the first time.
+    It can be unpacked like the result of GraphAlgo.shortest_path: dist, path = result
+    """
+
+    def __init__(self, distance: float, build_path):
+        """
+        :param distance: the distance of the shortest path (infinity if there is no path)
+        :param build_path: a function () -> list that builds the path
+        """
+        self.distance = distance
+        self.__build_path = build_path
+        self.__path = None
+
+    @property
+    def path(self) -> list:
+        """
+        :return: the path as a list of node_ids, an empty list if there is no path.
+        """
+        if self.__path is None:
+            self.__path = self.__build_path()
+            self.__build_path = None
+        return self.__path
+
+    def is_built(self) -> bool:
+        """
+        :return: True if the path was already built, False o.w.
+        """
+        return self.__path is not None
+
+    def as_tuple(self) -> (float, list):
+        """
+        :return: (distance, path) as returned by GraphAlgo.shortest_path
+        """
+        return self.distance, self.path
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __eq__(self, other):
+        if isinstance(other, PathResult):
+            return self.as_tuple() == other.as_tuple()
+        if isinstance(other, tuple):
+            return self.as_tuple() == other
+        return False
+
+    def __repr__(self) -> str:
+        return str(self.as_tuple())
@@ -0,0 +1,111 @@
+import threading
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    This class represent a bounded LRU cache of query results of one graph at one version (mode counter, mc),
+    used by GraphAlgo for shortest_path, connected_component and connected_components.
+    Every lookup checks the graph and its mc, and the whole cache is dropped when the graph changed
+    (or another graph is used), so a result is never older than the graph.
+    The cache holds at most capacity results, and at most max_bytes by the estimated size of the results
+    (see size_of), the least recently used results are evicted first.
+    The results are kept as they were computed, GraphAlgo returns copies of them.
+    """
+
+    def __init__(self, capacity: int = 1024, max_bytes: int = 16 * 2 ** 20):
+        """
+        :param capacity: the largest number of results (0 - nothing is cached)
+        :param max_bytes: the largest estimated size of all the results
+        """
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.__results = OrderedDict()
+        self.__bytes = 0
+        self.__graph = None
+        self.__mc = None
+        self.__lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def size_of(node_ids: int) -> int:
+        """
+        Returns the estimated size (in bytes) of a result that holds node_ids node ids:
+        a reference for each id (the small ints are shared) and the list and entry overhead.
+        """
+        return 128 + 8 * node_ids
+
+    def get(self, graph, key):
+        """
+        Returns the result of key for the current version of graph, None if it is not cached.
+        """
+        with self.__lock:
+            self.__check(graph)
+            entry = self.__results.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.__results.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, graph, mc: int, key, result, node_ids: int):
+        """
+        Cache the result of key for the current version of graph,
+        then evict the least recently used results until the cache fits in capacity and max_bytes.
+        A result larger than max_bytes is not cached, and neither is a result of an older version
+        (the graph changed while it was computed).
+        :param graph: the graph the result was computed on
+        :param mc: the version of the graph the result was computed on
+        :param key: the query (a hashable tuple)
+        :param result: the result
+        :param node_ids: the number of node ids in the result (see size_of)
+        """
+        size = self.size_of(node_ids)
+        with self.__lock:
+            self.__check(graph)
+            if mc != self.__mc or size > self.max_bytes or self.capacity <= 0:
+                return
+            old = self.__results.pop(key, None)
+            if old is not None:
+                self.__bytes -= old[1]
+            self.__results[key] = (result, size)
+            self.__bytes += size
+            while len(self.__results) > self.capacity or self.__bytes > self.max_bytes:
+                self.__bytes -= self.__results.popitem(last=False)[1][1]
+                self.evictions += 1
+
+    def __check(self, graph):
+        """
+        Drop all the results if graph is not the graph (and version) they were computed on.
+        """
+        mc = graph.get_mc()
+        if graph is not self.__graph or mc != self.__mc:
+            if self.__results:
+                self.invalidations += 1
+            self.__results.clear()
+            self.__bytes = 0
+            self.__graph, self.__mc = graph, mc
+
+    def clear(self):
+        """
+        Drop all the results (the counters are kept).
+        """
+        with self.__lock:
+            self.__results.clear()
+            self.__bytes = 0
+            self.__graph = self.__mc = None
+
+    def get_stats(self) -> dict:
+        """
+        :return: the counters of the cache: hits, misses, evictions (by capacity or max_bytes),
+        invalidations (the graph changed), and the current number of results and their estimated size.
+        """
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                "invalidations": self.invalidations, "size": len(self.__results), "bytes": self.__bytes}
+
+    def __len__(self) -> int:
+        return len(self.__results)
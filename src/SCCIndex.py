@@ -0,0 +1,287 @@
+import weakref
+from DiGraph import DiGraph
+
+
+class SCCIndex:
+    """
+    This class represent a labelling of the Strongly Connected Components (SCC) of a graph that is kept up to date
+    while the graph changes, instead of running the SCC algorithm again after every change.
+    The changes are collected by a listener (see DiGraph.add_listener) and applied lazily by update:
+    an added edge can only merge components (the nodes on the new cycles), a removed edge or node can only split
+    the component it was inside of, so only that component is computed again.
+    The components are kept in a topological order (of the condensation, by their position) so an added edge
+    searches only the components between its two ends (Pearce and Kelly).
+    """
+
+    def __init__(self, graph, components: list, scc, max_pending: int = 1024):
+        """
+        Each index holds the label (component number) of each node, the members of each label,
+        the position of each label (a tuple, a component is before every component it has an edge to), the changes that were not applied yet and the mode counter (mc) of the graph it is up to date with.
+        :param graph: a DiGraph or a CompactDiGraph (a frozen graph never changes)
+        :param components: the components of the graph, as returned by GraphAlgo.SCC
+        :param scc: a function that returns the components of a (small) DiGraph, used for a split component
+        :param max_pending: the number of changed nodes and edges after which update gives up,
+        and the components should be computed from scratch
+        """
+        self.__graph = graph
+        self.__scc = scc
+        self.__max_pending = max_pending
+        self.__labels = {}
+        self.__members = {}
+        self.__order = {}
+        self.__unordered = set()
+        self.__next_label = 0
+        for component in components:
+            self.__new_label(list(component))
+        self.__place(list(self.__members), ())
+        self.__next_position = len(self.__members)
+        self.__mc = graph.get_mc()
+        self.__pending = []
+        self.__pending_size = 0
+        self.__overflow = False
+        self.__listener = None
+        if hasattr(graph, "add_listener"):
+            self.__listener = self.__listener_of(weakref.ref(self), graph)
+            graph.add_listener(self.__listener)
+
+    @staticmethod
+    def __listener_of(ref, graph):
+        """
+        The listener holds the index by a weak reference, so an index that is not used anymore
+        does not stay registered in the graph (the listener removes itself on the next change).
+        """
+        def listener(change: str, items: list):
+            index = ref()
+            if index is None:
+                graph.remove_listener(listener)
+            else:
+                index.__on_change(change, items)
+        return listener
+
+    def __on_change(self, change: str, items: list) -> None:
+        self.__mc = self.__graph.get_mc()
+        if self.__overflow:
+            return
+        self.__pending_size += len(items)
+        if self.__pending_size > self.__max_pending:
+            self.__overflow = True
+            self.__pending = []
+            return
+        self.__pending.append((change, items))
+
+    def get_graph(self):
+        """
+        :return: the graph this index was built on.
+        """
+        return self.__graph
+
+    def update(self, graph=None) -> bool:
+        """
+        Apply the changes that were made in the graph since the last update.
+        Node changes and removed edges are applied first: a removed node gets no label, a component that lost
+        a node, or an inner edge src-->dest without another path from src to dest, is marked,
+        and the components of each marked component are computed again (on the sub graph of its remaining nodes).
+        Then, for each added edge (u-->v) between two components: the nodes reachable from v that reach u
+        are exactly the component of u in the changed graph, so all their components are merged.
+        Complexity: O(size of the split components + the components between the ends of each added edge
+        in the order, that are reachable from v or reach u), an added edge that agrees with the order costs O(1).
+        :param graph: the graph the caller works on, the update fails if it is not the graph of this index
+        :return: True if the index is up to date, False if it has to be built again
+        (another graph, too many changes, or the graph was changed without telling the listeners)
+        """
+        if graph is not None and graph is not self.__graph:
+            return False
+        if self.__overflow or self.__mc != self.__graph.get_mc():
+            return False
+        if not self.__pending:
+            return True
+        pending, self.__pending, self.__pending_size = self.__pending, [], 0
+        labels, dirty, removed_edges, added_edges = self.__labels, set(), {}, []
+        for change, items in pending:
+            if change == "add_nodes":
+                for node_id in items:
+                    self.__order[self.__new_label([node_id])] = (self.__next_position,)
+                    self.__next_position += 1
+            elif change == "remove_nodes":
+                for node_id in items:
+                    label = labels.pop(node_id, None)
+                    if label is not None:
+                        dirty.add(label)
+            elif change == "remove_edges":
+                for src, dest in items:
+                    label = labels.get(src)
+                    if label is not None and label == labels.get(dest):
+                        removed_edges.setdefault(label, []).append((src, dest))
+            else:
+                added_edges.extend(items)
+        # the added edges are not in the components and the order yet, the searches skip them until each one
+        # is merged
+        self.__unordered = set(added_edges)
+        for label, edges in removed_edges.items():
+            if label not in dirty and not all(self.__has_path(src, dest, label) for src, dest in edges):
+                dirty.add(label)
+        for label in dirty:
+            self.__split(label)
+        for src, dest in added_edges:
+            self.__unordered.discard((src, dest))
+            if labels.get(src) != labels.get(dest) and self.__has_edge(src, dest):
+                self.__merge(src, dest)
+        return True
+
+    def component_of(self, node_id: int) -> list:
+        """
+        Returns the component that node_id is a part of.
+        :param node_id: the node_id
+        :return: the list of nodes in the component
+        """
+        if node_id not in self.__labels:
+            raise Exception('Node {} is not exist in the graph'.format(node_id))
+        return list(self.__members[self.__labels[node_id]])
+
+    def components(self) -> list:
+        """
+        Returns all the components of the graph.
+        The components that were not changed keep the order (and inner order) of the full SCC run,
+        new components are at the end.
+        :return: a list of the components, each one is a list of node_ids
+        """
+        return [list(members) for members in self.__members.values()]
+
+    def close(self) -> None:
+        """
+        Stop listening to the changes of the graph.
+        """
+        if self.__listener is not None:
+            self.__graph.remove_listener(self.__listener)
+            self.__listener = None
+        self.__overflow = True
+
+    def __new_label(self, members: list) -> int:
+        label = self.__next_label
+        self.__next_label += 1
+        self.__members[label] = members
+        for node_id in members:
+            self.__labels[node_id] = label
+        return label
+
+    def __has_node(self, node_id: int) -> bool:
+        return node_id in self.__graph.get_all_v()
+
+    def __has_edge(self, src: int, dest: int) -> bool:
+        return self.__has_node(src) and self.__has_node(dest) and dest in self.__graph.all_out_edges_of_node(src)
+
+    def __has_path(self, src: int, dest: int, label: int) -> bool:
+        """
+        Check if there is still a path from src to dest inside the component label (BFS that stops at dest).
+        If every removed inner edge has such a path, every path that used a removed edge can go around it,
+        so the component is not split.
+        """
+        if not self.__has_node(src) or not self.__has_node(dest):
+            return False
+        labels, unordered = self.__labels, self.__unordered
+        visited = {src}
+        queue = [src]
+        for v in queue:
+            for k in self.__graph.all_out_edges_of_node(v):
+                if (v, k) in unordered:
+                    continue
+                if k == dest:
+                    return True
+                if k not in visited and labels.get(k) == label:
+                    visited.add(k)
+                    queue.append(k)
+        return False
+
+    def __split(self, label: int) -> None:
+        """
+        Compute again the components of the nodes that are still labeled by label,
+        using only the edges between them.
+        """
+        members = [node_id for node_id in self.__members.pop(label) if self.__labels.get(node_id) == label]
+        position = self.__order.pop(label)
+        if len(members) == 1:
+            self.__members[label] = members
+            self.__order[label] = position
+            return
+        sub = DiGraph()
+        sub.add_nodes_from(members)
+        sub.add_edges_from((src, dest, w) for src in members
+                           for dest, w in self.__graph.all_out_edges_of_node(src).items()
+                           if self.__labels.get(dest) == label and (src, dest) not in self.__unordered)
+        # the parts of the component take its place in the order
+        self.__place([self.__new_label(list(component)) for component in self.__scc(sub)], position)
+
+    def __place(self, new_labels: list, prefix: tuple) -> None:
+        """
+        Give the labels the positions prefix + (i,) in a topological order of their components
+        (Kahn's algorithm over the edges between their members, without the added edges that were not merged yet).
+        """
+        labels, unordered = self.__labels, self.__unordered
+        targets = {label: set() for label in new_labels}
+        in_degree = dict.fromkeys(new_labels, 0)
+        for label in new_labels:
+            for node_id in self.__members[label]:
+                for k in self.__graph.all_out_edges_of_node(node_id):
+                    other = labels.get(k)
+                    if other != label and other in targets and other not in targets[label] \
+                            and (node_id, k) not in unordered:
+                        targets[label].add(other)
+                        in_degree[other] += 1
+        ready = [label for label in new_labels if in_degree[label] == 0]
+        for i, label in enumerate(ready):
+            self.__order[label] = prefix + (i,)
+            for other in targets[label]:
+                in_degree[other] -= 1
+                if in_degree[other] == 0:
+                    ready.append(other)
+
+    def __merge(self, src: int, dest: int) -> None:
+        """
+        Add the edge src-->dest between two components to the order.
+        If the component of src is before the component of dest the order still holds and nothing changes.
+        Otherwise every changed component is between them: the forward search from dest goes only over the
+        components that are not after the component of src, the backward search from src only over the components
+        that are not before the component of dest.
+        The components reached by both are on the cycles closed by the edge and are merged, then the positions
+        of all the reached components are given again: first the backward ones, then the merged one,
+        then the forward ones (each part keeps its order).
+        """
+        labels, order, unordered = self.__labels, self.__order, self.__unordered
+        lower, upper = order[labels[dest]], order[labels[src]]
+        if upper < lower:
+            return
+        forward = self.__reach(dest, self.__graph.all_out_edges_of_node,
+                               lambda v, k: order[labels[k]] <= upper and (v, k) not in unordered)
+        backward = self.__reach(src, self.__graph.all_in_edges_of_node,
+                                lambda v, k: order[labels[k]] >= lower and (k, v) not in unordered)
+        forward_labels = {labels[node_id] for node_id in forward}
+        backward_labels = {labels[node_id] for node_id in backward}
+        cycle = forward_labels & backward_labels
+        before = sorted(backward_labels - cycle, key=order.get)
+        after = sorted(forward_labels - cycle, key=order.get)
+        positions = sorted(order.pop(label) for label in forward_labels | backward_labels)
+        for label, position in zip(before, positions):
+            order[label] = position
+        for label, position in zip(after, positions[len(positions) - len(after):]):
+            order[label] = position
+        if cycle:
+            for label in cycle:
+                del self.__members[label]
+            order[self.__new_label([node_id for node_id in backward if node_id in forward])] = positions[len(before)]
+
+    @staticmethod
+    def __reach(start: int, edges_of, allowed) -> dict:
+        """
+        Returns the nodes reachable from start (including it) by an iterative DFS over edges_of,
+        using only the edges v-->k that allowed(v, k) accepts.
+        :return: a dictionary of the reached nodes, in the order they were reached
+        """
+        visited = {start: True}
+        stack = [start]
+        while stack:
+            v = stack.pop()
+            for k in edges_of(v):
+                if k not in visited and allowed(v, k):
+                    visited[k] = True
+                    stack.append(k)
+        return visited
@@ -0,0 +1,21 @@
+def checked(func, check, every: int = 64):
+    """
+    Return func wrapped so check() is called before its first call and then before every every-th call.
+    The searches of GraphAlgo wrap one step of their loop with it (a heap pop, or the edges of an expanded node)
+    when a check was set (see GraphAlgo.set_check), check raises an exception to stop the search.
+    Nothing is counted, so it costs one function call for each step (stats are collected by a StatsHook).
+    :param func: the step of the search
+    :param check: a function () -> None
+    :param every: the number of calls between two checks
+    :return: the wrapped func
+    """
+    count = every - 1
+
+    def step(*args):
+        nonlocal count
+        count += 1
+        if count == every:
+            count = 0
+            check()
+        return func(*args)
+    return step
@@ -0,0 +1,195 @@
+import heapq
+import itertools
+from numpy import inf
+from SearchCheck import checked
+
+
+class GraphEdges:
+    """
+    This class represent the out edges of a graph at one version (mc) by node_id, for the ShortestPathTrees
+    of that version (GraphAlgo shares one between them).
+    A DiGraph is read as it is (the dictionaries of its nodes), a CompactDiGraph has its targets converted to
+    node_ids once (O(|E|) in numpy), so a search never maps node_ids to indices and back for every edge.
+    """
+
+    def __init__(self, graph):
+        """
+        Each GraphEdges holds the graph and its mode counter (mc), and three functions of a node_id:
+        out_edges: its out edges as (dest node_id, weight) pairs, degree: its number of out edges,
+        has_node: True if it is a node of the graph.
+        :param graph: a DiGraph or a CompactDiGraph
+        """
+        self.graph = graph
+        self.mc = graph.get_mc()
+        if getattr(graph, "is_compact", False):
+            index, offsets = graph.index, graph.out_offsets.tolist()
+            targets, weights = graph.ids[graph.out_targets].tolist(), graph.out_weights.tolist()
+
+            def out_edges(k):
+                i = index[k]
+                return zip(targets[offsets[i]:offsets[i + 1]], weights[offsets[i]:offsets[i + 1]])
+            self.out_edges = out_edges
+            self.degree = lambda k: offsets[index[k] + 1] - offsets[index[k]]
+            self.has_node = index.__contains__
+        else:
+            nodes = graph.get_all_v()
+            self.out_edges = lambda k: nodes[k].get_connections_out().items()
+            self.degree = lambda k: len(nodes[k].get_connections_out())
+            self.has_node = nodes.__contains__
+
+    def is_valid(self, graph) -> bool:
+        """
+        :return: True if this is the graph and it did not change since (same mc), False o.w.
+        """
+        return graph is self.graph and graph.get_mc() == self.mc
+
+
+class ShortestPathTree:
+    """
+    This class represent the shortest paths tree from a single source node.
+    The tree is built lazily by Dijkstra's algorithm: a query settles only the nodes that are closer than the
+    queried node, and the search is resumed by the next query that needs more of the tree.
+    """
+
+    def __init__(self, graph, src: int, edges: GraphEdges = None):
+        """
+        Each tree holds dictionaries keyed by node_id, of the nodes the search reached so far:
+        distances: the distance of each discovered node from the source node.
+        previous_nodes: each node "father" in the tree (None for the source node).
+        settled: the nodes whose distance is final, in the order they were settled.
+        In addition it holds the queue of the search, so the search can be resumed,
+        the out edges of the graph (see GraphEdges) and the mode counter (mc) of the graph it was built on.
+        A new tree costs O(1): nothing is allocated for the nodes the search does not reach.
+        :param graph: a DiGraph or a CompactDiGraph
+        :param src: the source node_id
+        :param edges: the GraphEdges of graph at its current version, a new one by default
+        """
+        self.__graph = graph
+        self.__src = src
+        self.__mc = graph.get_mc()
+        self.__edges = edges if edges is not None else GraphEdges(graph)
+        if not self.__edges.has_node(src):
+            raise Exception('Node {} is not exist in the graph'.format(src))
+        self.__distances = {src: 0}
+        self.__previous_nodes = {src: None}
+        self.__settled = {}
+        self.__queue = [(0, src)]
+
+    def get_src(self) -> int:
+        """
+        :return: the source node_id of this tree.
+        """
+        return self.__src
+
+    def get_graph(self):
+        """
+        :return: the graph this tree was built on.
+        """
+        return self.__graph
+
+    def get_mc(self) -> int:
+        """
+        :return: the mode counter of the graph when this tree was built.
+        """
+        return self.__mc
+
+    def is_complete(self) -> bool:
+        """
+        :return: True if every node reachable from the source node is settled, False o.w.
+        """
+        return not self.__queue
+
+    def complete(self):
+        """
+        Settle every node reachable from the source node.
+        :return: this tree
+        """
+        self.__grow()
+        return self
+
+    def distance(self, dest: int, check=None) -> float:
+        """
+        Returns the distance of the shortest path from the source node to dest.
+        :param dest: the destination node_id
+        :param check: a function () -> None called every 64 pops of the search (see path)
+        :return: the distance, infinity if there is no path
+        """
+        return self.__distances.get(self.__grow(self.__node(dest), None, check), inf)
+
+    def path(self, dest: int, stats=None, check=None) -> list:
+        """
+        Returns the shortest path from the source node to dest, in O(path length) once dest is settled.
+        :param dest: the destination node_id
+        :param stats: a CallStats the search is counted into (see AlgoStats), None to count nothing
+        :param check: a function () -> None called every 64 pops of the search (see GraphAlgo.set_check),
+        an exception it raises stops the search and the tree can be grown again by the next query
+        :return: the path as a list of node_ids, an empty list if there is no path
+        """
+        t = self.__grow(self.__node(dest), stats, check)
+        if t not in self.__distances:
+            return []
+        path, current_node = [], t
+        while current_node is not None:
+            path.append(current_node)
+            current_node = self.__previous_nodes[current_node]
+        path.reverse()
+        return path
+
+    def shortest_path(self, dest: int, stats=None, check=None) -> (float, list):
+        """
+        Returns the shortest path from the source node to dest (same format as GraphAlgo.shortest_path).
+        :param dest: the destination node_id
+        :param stats: a CallStats the search is counted into (see AlgoStats), None to count nothing
+        :param check: a function () -> None called every 64 pops of the search (see path)
+        :return: The distance of the path, the path as a list
+        """
+        path = self.path(dest, stats, check)
+        return (self.__distances[dest], path) if path else (inf, [])
+
+    def distances(self) -> dict:
+        """
+        Returns the distance of every reachable node from the source node.
+        :return: a dictionary (node_id, distance)
+        """
+        self.complete()
+        return dict(self.__distances)
+
+    def __node(self, node_id: int) -> int:
+        if not self.__edges.has_node(node_id):
+            raise Exception('Node {} is not exist in the graph'.format(node_id))
+        return node_id
+
+    def __grow(self, t=None, stats=None, check=None):
+        """
+        Resume Dijkstra's algorithm until the node t is settled (or the queue is empty).
+        Queue entries that are older than the node current distance are skipped (lazy deletion).
+        With stats the pushes are counted as they happen, and the nodes settled by this call are the last ones
+        in settled (it keeps the order they were settled), so only the part of the tree grown now is counted.
+        :param t: the node_id to settle, None to settle all the reachable nodes
+        :param stats: a CallStats the search is counted into (see AlgoStats), None to count nothing
+        :param check: a function () -> None called before every 64th pop (see SearchCheck.checked)
+        :return: t
+        """
+        distances, previous_nodes, settled, queue = self.__distances, self.__previous_nodes, self.__settled, \
+            self.__queue
+        out_edges = self.__edges.out_edges
+        push = heapq.heappush if stats is None else stats.counting(heapq.heappush)
+        pop = heapq.heappop if check is None else checked(heapq.heappop, check)
+        if stats is not None:
+            pushed, queued, before = stats.pushes, len(queue), len(settled)
+        while queue and t not in settled:
+            dist, current_node = pop(queue)
+            if current_node in settled or dist > distances[current_node]:
+                continue
+            settled[current_node] = None
+            for neighbour, w in out_edges(current_node):
+                alternative_route = dist + w
+                if alternative_route < distances.get(neighbour, inf):
+                    distances[neighbour] = alternative_route
+                    previous_nodes[neighbour] = current_node
+                    push(queue, (alternative_route, neighbour))
+        if stats is not None:
+            grown = list(itertools.islice(settled, before, None))
+            stats.add_search(stats.pushes - pushed + queued - len(queue), len(grown),
+                             (self.__edges.degree(k) for k in grown))
+        return t
@@ -0,0 +1,157 @@
+import asyncio
+import time
+from unittest import TestCase
+
+from src.GraphAlgo import GraphAlgo
+from src.AsyncGraphAlgo import AsyncGraphAlgo, QueryToken
+from src.AlgoStats import StatsHook
+from concurrent.futures import CancelledError
+
+
+def full_pushes(ga: GraphAlgo) -> int:
+    """
+    Returns the pushes of a full run of SCC on the graph of ga.
+    """
+    hook = StatsHook()
+    algo = GraphAlgo(ga.get_graph())
+    algo.set_hook(hook)
+    algo.SCC()
+    return hook.calls[0].pushes
+
+
+class TestAsyncGraphAlgo(TestCase):
+
+    def setUp(self):
+        self.ga = GraphAlgo()
+        self.ga.load_from_json("../data/G_1000_8000_0.json")
+
+    def test_shortest_path(self):
+        async def queries():
+            async with AsyncGraphAlgo(self.ga) as aga:
+                paths = await asyncio.gather(*(aga.shortest_path(i, 999 - i) for i in range(20)))
+                for method in ("bidirectional", "astar"):
+                    self.assertEqual(self.ga.shortest_path(3, 700, method), await aga.shortest_path(3, 700, method))
+                with self.assertRaises(Exception):
+                    await aga.shortest_path(0, 5000)
+                return paths
+        paths = asyncio.run(queries())
+        for i, path in enumerate(paths):
+            self.assertEqual(self.ga.shortest_path(i, 999 - i), path)
+
+    def test_coalescing_and_cache(self):
+        async def queries():
+            async with AsyncGraphAlgo(self.ga) as aga:
+                first = await asyncio.gather(*(aga.shortest_path(0, 500) for _ in range(10)))
+                stats = aga.get_stats()
+                self.assertEqual(1, stats["computations"])
+                self.assertEqual(9, stats["coalesced"])
+                first[0][1].append(-1)
+                self.assertEqual(first[1], await aga.shortest_path(0, 500))
+                self.assertEqual(1, aga.get_stats()["cache_hits"])
+                components = await asyncio.gather(aga.connected_components(), aga.connected_components())
+                self.assertEqual(sorted(map(sorted, self.ga.connected_components())), sorted(map(sorted, components[1])))
+                self.assertEqual(sorted(self.ga.connected_component(7)), sorted(await aga.connected_component(7)))
+                # a change of the graph is a new version: the query runs again on a new snapshot
+                graph = aga.get_graph()
+                graph.add_edge(0, 500, 0.001)
+                self.assertEqual((0.001, [0, 500]), await aga.shortest_path(0, 500))
+                graph.remove_edge(0, 500)
+                self.assertEqual(first[1], await aga.shortest_path(0, 500))
+                self.assertEqual(0, aga.get_stats()["in_flight"])
+        asyncio.run(queries())
+
+    def test_timeout(self):
+        ga = GraphAlgo()
+        ga.load_from_json("../data/G_10000_80000_0.json")
+
+        async def queries():
+            async with AsyncGraphAlgo(ga, timeout=0.002, hook=StatsHook()) as aga:
+                start = time.perf_counter()
+                with self.assertRaises(asyncio.TimeoutError):
+                    await aga.connected_components()
+                await asyncio.sleep(0.5)
+                self.assertEqual(0, aga.get_stats()["in_flight"])
+                self.assertEqual(1, aga.get_stats()["timeouts"])
+                # the search stopped early: far fewer pushes than a full run over the graph
+                calls = aga.get_hook().calls
+                self.assertEqual(1, len(calls))
+                self.assertLess(calls[0].pushes, full_pushes(ga) / 2)
+                self.assertLess(time.perf_counter() - start, 5)
+                self.assertEqual(ga.shortest_path(0, 9999), await aga.shortest_path(0, 9999, timeout=60))
+        asyncio.run(queries())
+
+    def test_cancel(self):
+        ga = GraphAlgo()
+        ga.load_from_json("../data/G_10000_80000_0.json")
+
+        async def queries():
+            async with AsyncGraphAlgo(ga, hook=StatsHook()) as aga:
+                first = asyncio.ensure_future(aga.connected_components())
+                second = asyncio.ensure_future(aga.connected_components())
+                await asyncio.sleep(0.001)
+                first.cancel()
+                await asyncio.sleep(0.001)
+                # the query goes on while another caller waits for it
+                self.assertEqual(1, aga.get_stats()["in_flight"])
+                second.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await second
+                self.assertEqual(0, aga.get_stats()["in_flight"])
+                self.assertEqual(2, aga.get_stats()["cancelled"])
+                await asyncio.sleep(0.5)
+                self.assertLess(aga.get_hook().calls[-1].pushes, full_pushes(ga) / 2)
+            # without a hook the searches still stop: the next query does not wait for a full run
+            async with AsyncGraphAlgo(ga) as aga:
+                self.assertIsNone(aga.get_hook())
+                with self.assertRaises(asyncio.TimeoutError):
+                    await aga.connected_components(timeout=0.002)
+                start = time.perf_counter()
+                self.assertEqual(ga.shortest_path(0, 1), await aga.shortest_path(0, 1))
+                self.assertLess(time.perf_counter() - start, 0.1)
+
+        asyncio.run(queries())
+        token = QueryToken(time.time() + 60)
+        token.check()
+        token.cancel()
+        self.assertRaises(CancelledError, token.check)
+        token = QueryToken(time.time() - 1)
+        self.assertRaises(TimeoutError, token.check)
+        token.extend(None)
+        token.check()
+
+    def test_process_executor(self):
+        async def queries():
+            async with AsyncGraphAlgo(self.ga, executor="process", workers=2) as aga:
+                paths = await asyncio.gather(*(aga.shortest_path(i, 999 - i) for i in range(4)),
+                                             aga.shortest_path(0, 999))
+                self.assertEqual(1, aga.get_stats()["coalesced"])
+                self.assertEqual(sorted(self.ga.connected_component(3)), sorted(await aga.connected_component(3)))
+                aga.get_graph().add_node(1000)
+                aga.get_graph().add_edge(0, 1000, 0.5)
+                self.assertEqual((0.5, [0, 1000]), await aga.shortest_path(0, 1000))
+                return paths
+        paths = asyncio.run(queries())
+        for i, path in enumerate(paths[:4]):
+            self.assertEqual(self.ga.shortest_path(i, 999 - i), path)
+
+    def test_process_cancel(self):
+        ga = GraphAlgo()
+        ga.load_from_json("../data/G_10000_80000_0.json")
+
+        async def queries():
+            async with AsyncGraphAlgo(ga, executor="process", workers=1) as aga:
+                await aga.shortest_path(0, 1)
+                # the worker stops the cancelled search, so the next query does not wait for a full run
+                query = asyncio.ensure_future(aga.connected_components())
+                await asyncio.sleep(0.05)
+                query.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await query
+                start = time.perf_counter()
+                self.assertEqual(ga.shortest_path(0, 9999), await aga.shortest_path(0, 9999))
+                self.assertLess(time.perf_counter() - start, 1)
+                # a new version of the graph runs on the same workers
+                aga.get_graph().add_node(10000)
+                aga.get_graph().add_edge(0, 10000, 0.5)
+                self.assertEqual((0.5, [0, 10000]), await aga.shortest_path(0, 10000))
+        asyncio.run(queries())
@@ -0,0 +1,68 @@
+from unittest import TestCase
+from src.DiGraph import DiGraph
+from src.GraphAlgo import GraphAlgo
+from numpy import inf
+
+
+class TestCompactDiGraph(TestCase):
+
+    def setUp(self):
+        # graph creator, |V|=7, |E|=19
+        self.graph = DiGraph()
+        for i in range(7):
+            self.graph.add_node(i, (i * 1.0, i * 2.0, 0.0))
+        for src, dest, w in ((0, 1, 1), (0, 2, 1), (0, 3, 1), (0, 4, 1), (0, 5, 1), (0, 6, 1), (1, 0, 8),
+                             (1, 2, 1), (1, 6, 9), (2, 1, 1), (2, 4, 1), (3, 4, 1), (3, 5, 1), (4, 1, 1),
+                             (4, 2, 1), (4, 3, 1), (5, 0, 1), (5, 2, 1), (5, 4, 1)):
+            self.graph.add_edge(src, dest, w)
+        self.compact = self.graph.freeze()
+
+    def test_sizes(self):
+        self.assertEqual(7, self.compact.v_size())
+        self.assertEqual(19, self.compact.e_size())
+        self.assertEqual(self.graph.get_mc(), self.compact.get_mc())
+
+    def test_edges_of_node(self):
+        for k in range(7):
+            self.assertEqual(self.graph.all_out_edges_of_node(k), self.compact.all_out_edges_of_node(k))
+            self.assertEqual(self.graph.all_in_edges_of_node(k), self.compact.all_in_edges_of_node(k))
+        self.assertRaises(Exception, self.compact.all_out_edges_of_node, 10)
+        self.assertRaises(Exception, self.compact.all_in_edges_of_node, 10)
+
+    def test_get_node(self):
+        self.assertEqual(self.graph.get_node(3), self.compact.get_node(3))
+        self.assertRaises(Exception, self.compact.get_node, 10)
+
+    def test_frozen(self):
+        self.assertFalse(self.compact.add_node(7))
+        self.assertFalse(self.compact.add_edge(6, 5, 1))
+        self.assertFalse(self.compact.remove_edge(0, 1))
+        self.assertFalse(self.compact.remove_node(0))
+        self.assertEqual(7, self.compact.v_size())
+        self.assertEqual(19, self.compact.e_size())
+        # changes in the original graph are not seen by the frozen graph
+        self.graph.remove_node(0)
+        self.assertEqual(7, self.compact.v_size())
+
+    def test_thaw(self):
+        self.assertEqual(self.graph.as_dict(), self.compact.thaw().as_dict())
+
+    def test_graph_algo(self):
+        ga = GraphAlgo(self.graph)
+        ga_compact = GraphAlgo(self.compact)
+        for i in range(7):
+            for j in range(7):
+                self.assertEqual(ga.shortest_path(i, j), ga_compact.shortest_path(i, j))
+            self.assertEqual(sorted(ga.connected_component(i)), sorted(ga_compact.connected_component(i)))
+        self.assertEqual((inf, []), ga_compact.shortest_path(6, 1))
+        self.assertRaises(Exception, ga_compact.shortest_path, 1, 10)
+        self.assertEqual(ga.connected_components(), ga_compact.connected_components())
+
+    def test_load_1000(self):
+        ga = GraphAlgo()
+        ga.load_from_json("../data/G_1000_8000_0.json")
+        ga_compact = GraphAlgo(ga.get_graph().freeze())
+        self.assertEqual(ga.get_graph(), ga_compact.get_graph().thaw())
+        self.assertEqual(ga.connected_components(), ga_compact.connected_components())
+        for i, j in ((0, 999), (17, 400), (512, 3)):
+            self.assertAlmostEqual(ga.shortest_path(i, j)[0], ga_compact.shortest_path(i, j)[0])
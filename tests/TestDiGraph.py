@@ -1,6 +1,10 @@
+import copy
+import gc
+import pickle
+import random
 from unittest import TestCase
 from src.DiGraph import DiGraph
-from src.Node import Node
+from src.Node import Coordinates, Node
 
 
 class Test(TestCase):
@@ -98,6 +102,51 @@ class Test(TestCase):
         self.assertEqual(8, self.graph.v_size())
         self.assertEqual(26, self.graph.get_mc())
 
+    def test_add_nodes_from(self):
+        self.assertEqual(2, self.graph.add_nodes_from([7, (8, (1, 2, 0)), 0]))
+        self.assertEqual(9, self.graph.v_size())
+        self.assertEqual((1, 2, 0), self.graph.get_node(8).get_location())
+        # the mc is increased once for the whole batch
+        self.assertEqual(26, self.graph.get_mc())
+        self.assertEqual(0, self.graph.add_nodes_from(range(3)))
+        self.assertEqual(26, self.graph.get_mc())
+
+    def test_add_edges_from(self):
+        # new edge, existing edge, missing node, self loop, new edge
+        self.assertEqual(2, self.graph.add_edges_from([(6, 5, 1), (0, 1, 1), (0, 10, 1), (2, 2, 1), (6, 0, 2.5)]))
+        self.assertEqual(20, self.graph.e_size())
+        self.assertEqual(26, self.graph.get_mc())
+        self.assertEqual({5: 1, 0: 2.5}, self.graph.all_out_edges_of_node(6))
+        self.assertEqual(2.5, self.graph.all_in_edges_of_node(0)[6])
+        # a negative weight changes nothing
+        self.assertRaises(Exception, self.graph.add_edges_from, [(6, 1, 1), (6, 2, -1)])
+        self.assertEqual(20, self.graph.e_size())
+        self.assertEqual(26, self.graph.get_mc())
+        # the edges are checked in the order of add_edge: a missing node or an existing edge is skipped
+        # whatever its weight (also an edge added earlier in the batch), a negative self loop raises
+        self.assertFalse(self.graph.add_edge(6, 10, -1))
+        self.assertFalse(self.graph.add_edge(0, 1, -1))
+        self.assertEqual(1, self.graph.add_edges_from([(6, 1, 1), (6, 10, -1), (0, 1, -1), (6, 1, -1)]))
+        self.assertEqual(1, self.graph.all_out_edges_of_node(6)[1])
+        self.assertRaises(Exception, self.graph.add_edge, 3, 3, -1)
+        self.assertRaises(Exception, self.graph.add_edges_from, [(3, 3, -1)])
+        self.assertEqual(21, self.graph.e_size())
+
+    def test_listeners(self):
+        changes = []
+        listener = lambda change, items: changes.append((change, items))
+        self.graph.add_listener(listener)
+        self.graph.add_node(7)
+        self.graph.add_edge(7, 0, 1)
+        self.graph.add_edge(7, 0, 1)
+        self.graph.add_edges_from([(0, 7, 1), (7, 1, 1)])
+        self.graph.remove_node(7)
+        self.assertEqual([("add_nodes", [7]), ("add_edges", [(7, 0)]), ("add_edges", [(0, 7), (7, 1)]),
+                          ("remove_edges", [(7, 0), (7, 1), (0, 7)]), ("remove_nodes", [7])], changes)
+        self.graph.remove_listener(listener)
+        self.graph.add_node(8)
+        self.assertEqual(5, len(changes))
+
     def test_remove_node(self):
         self.assertEqual(7, self.graph.v_size())
         # remove node
@@ -108,6 +157,44 @@ class Test(TestCase):
         self.assertFalse(self.graph.remove_node(10))
         self.assertEqual(6, self.graph.v_size())
         self.assertEqual(27, self.graph.get_mc())
+        # the edges of the removed node are removed from its neighbours too
+        self.assertTrue(self.graph.remove_node(0))
+        self.assertEqual(10, self.graph.e_size())
+        self.assertEqual({2: 1}, self.graph.all_out_edges_of_node(1))
+        self.assertEqual({2: 1, 4: 1}, self.graph.all_in_edges_of_node(1))
+        self.assertTrue(all(0 not in node.get_connections_in() and 0 not in node.get_connections_out()
+                            for node in self.graph.get_all_v().values()))
+
+    def test_node_location(self):
+        self.assertTrue(self.graph.add_node(7, (1.5, 2, 0)))
+        self.assertTrue(self.graph.add_node(8, (3, 4, 5)))
+        node = self.graph.get_node(7)
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertEqual((1.5, 2, 0), node.get_location())
+        self.assertIsNone(self.graph.get_node(0).get_location())
+        node.set_location((0, 0, 1))
+        self.assertEqual((0, 0, 1), node.get_location())
+        self.assertEqual((3, 4, 5), self.graph.get_node(8).get_location())
+        self.assertEqual({"pos": "0.0, 0.0, 1.0", "id": 7}, node.as_dict_node())
+        # the positions that are not 3 numbers are kept as they are given
+        node.set_location((1, 2))
+        self.assertEqual((1, 2), node.get_location())
+        node.set_location("north")
+        self.assertEqual("north", node.get_location())
+        # a node keeps its slots, and the slots of a removed node are reused
+        coordinates = Coordinates()
+        node = Node(1, (1, 2, 3), coordinates)
+        for location in (None, (4, 5, 6), (1, 2), (7, 8, 9)):
+            node.set_location(location)
+            self.assertEqual(location, node.get_location())
+            self.assertEqual(3, len(coordinates.values))
+        node.release()
+        self.assertEqual((7, 8, 9), node.get_location())
+        other = Node(2, (0, 0, 0), coordinates)
+        self.assertEqual(3, len(coordinates.values))
+        self.assertEqual(((7, 8, 9), (0, 0, 0)), (node.get_location(), other.get_location()))
+        self.assertIsNone(Node(3, None, coordinates).get_location())
+        self.assertEqual(3, len(coordinates.values))
 
     def test_remove_edge(self):
         self.assertEqual(18, self.graph.e_size())
@@ -120,6 +207,126 @@ class Test(TestCase):
         self.assertEqual(17, self.graph.e_size())
         self.assertEqual(26, self.graph.get_mc())
 
+    def test_remove_edges_from(self):
+        # existing edge, missing edge, missing node, existing edge given as a triple
+        self.assertEqual(2, self.graph.remove_edges_from([(0, 1), (1, 6), (0, 10), (5, 4, 1)]))
+        self.assertEqual(16, self.graph.e_size())
+        # the mc is increased once for the whole batch
+        self.assertEqual(26, self.graph.get_mc())
+        self.assertNotIn(1, self.graph.all_out_edges_of_node(0))
+        self.assertNotIn(0, self.graph.all_in_edges_of_node(1))
+        self.assertEqual({0: 1, 2: 1}, self.graph.all_out_edges_of_node(5))
+        self.assertEqual(0, self.graph.remove_edges_from([(0, 1)]))
+        self.assertEqual(26, self.graph.get_mc())
+
+    def test_snapshot(self):
+        snapshot = self.graph.snapshot()
+        self.assertIs(snapshot, self.graph.snapshot())
+        as_dict = snapshot.as_dict()
+        self.assertEqual(self.graph.as_dict(), as_dict)
+        self.assertEqual((25, 7, 18), (snapshot.get_mc(), snapshot.v_size(), snapshot.e_size()))
+        # changes of the graph are not seen by the snapshot
+        self.graph.add_node(7)
+        self.graph.add_edge(7, 0, 1)
+        self.graph.remove_edge(0, 1)
+        self.graph.remove_node(6)
+        self.graph.add_edges_from([(1, 6, 1), (1, 3, 2)])
+        self.graph.remove_edges_from([(1, 2)])
+        self.assertEqual(as_dict, snapshot.as_dict())
+        self.assertEqual((25, 7, 18), (snapshot.get_mc(), snapshot.v_size(), snapshot.e_size()))
+        self.assertEqual({1: 1, 2: 1, 3: 1, 4: 1, 5: 1, 6: 1}, snapshot.all_out_edges_of_node(0))
+        self.assertEqual({0: 1, 3: 2}, self.graph.all_out_edges_of_node(1))
+        # a new snapshot sees the changes, and the graph is copied again before the next change
+        new_snapshot = self.graph.snapshot()
+        self.assertIsNot(snapshot, new_snapshot)
+        self.assertEqual(self.graph.as_dict(), new_snapshot.as_dict())
+        self.graph.remove_edge(1, 3)
+        self.assertEqual({0: 1, 3: 2}, new_snapshot.all_out_edges_of_node(1))
+        # a snapshot can not be changed
+        self.assertFalse(snapshot.add_node(8))
+        self.assertFalse(snapshot.remove_edge(0, 1))
+        self.assertEqual(0, snapshot.add_edges_from([(0, 1, 1)]))
+        self.assertEqual(as_dict, snapshot.thaw().as_dict())
+
+    def test_snapshot_layers(self):
+        # a snapshot for every change: each one keeps its version, and the graph writes only layers of changes
+        rnd = random.Random(0)
+        graph = DiGraph()
+        graph.add_nodes_from(range(200))
+        versions, max_depth = [], 0
+        for step in range(600):
+            versions.append((graph.snapshot(), copy.deepcopy(graph.as_dict())))
+            k = rnd.randrange(220)
+            if step % 3 == 0:
+                graph.remove_node(k) or graph.add_node(k)
+            else:
+                graph.remove_edge(k, k + 1) or graph.add_edge(k, k + 1, 1)
+            # the layers (see LayeredDict) over the dict at the bottom
+            nodes, depth = graph.get_all_v(), 0
+            while not isinstance(nodes, dict):
+                nodes, depth = nodes.parent, depth + 1
+            max_depth = max(max_depth, depth)
+        self.assertTrue(1 < max_depth <= 4)
+        for snapshot, as_dict in versions:
+            self.assertEqual(as_dict, snapshot.as_dict())
+            self.assertEqual(len(as_dict["Nodes"]), snapshot.v_size())
+        self.assertEqual(set(graph.get_all_v()), {node["id"] for node in graph.as_dict()["Nodes"]})
+        self.assertEqual(graph, pickle.loads(pickle.dumps(graph)))
+        self.assertIs(dict, type(pickle.loads(pickle.dumps(graph)).get_all_v()))
+        # once the snapshots are dropped, the next change applies the layers to the dict at the bottom
+        copied = copy.deepcopy(graph)
+        del versions, snapshot
+        gc.collect()
+        graph.add_node(1000)
+        self.assertIs(dict, type(graph.get_all_v()))
+        copied.add_node(1000)
+        self.assertEqual(copied, graph)
+
+    def test_snapshot_no_op_batch(self):
+        # a batch that changes nothing does not put a layer over the nodes, and keeps the snapshot
+        snapshot = self.graph.snapshot()
+        nodes = self.graph.get_all_v()
+        self.assertEqual(0, self.graph.add_nodes_from([0, (1, (1, 2, 3))]))
+        self.assertEqual(0, self.graph.add_edges_from([(0, 1, 5), (0, 100, 1), (2, 2, 1)]))
+        self.assertEqual(0, self.graph.remove_edges_from([(0, 100), (1, 5)]))
+        self.assertIs(nodes, self.graph.get_all_v())
+        self.assertIs(snapshot, self.graph.snapshot())
+        self.assertEqual(1, self.graph.add_edges_from([(0, 1, 5), (1, 5, 1)]))
+        self.assertIsNot(nodes, self.graph.get_all_v())
+        self.assertNotIn(5, snapshot.all_out_edges_of_node(1))
+
+    def test_snapshot_location(self):
+        self.graph.add_node(7, (1, 2, 3))
+        snapshot = self.graph.snapshot()
+        self.assertTrue(self.graph.set_location(7, (9, 9, 9)))
+        self.assertTrue(self.graph.set_location(0, (4, 5, 6)))
+        self.assertFalse(self.graph.set_location(10, (4, 5, 6)))
+        self.assertEqual(((1, 2, 3), None), (snapshot.get_node(7).get_location(), snapshot.get_node(0).get_location()))
+        self.assertEqual((9, 9, 9), self.graph.get_node(7).get_location())
+        self.assertEqual(snapshot.get_mc(), self.graph.get_mc())
+        # the node removed from the graph keeps its position in the snapshot, and its slots are reused
+        snapshot = self.graph.snapshot()
+        self.graph.remove_node(7)
+        self.graph.add_node(8, (0, 0, 0))
+        self.assertEqual((9, 9, 9), snapshot.get_node(7).get_location())
+
+    def test_pickle(self):
+        self.graph.add_node(7, (1, 2, 3))
+        listened = []
+        self.graph.add_listener(lambda change, items: listened.append(change))
+        snapshot = self.graph.snapshot()
+        for graph in (pickle.loads(pickle.dumps(self.graph)), copy.deepcopy(self.graph)):
+            self.assertEqual(self.graph, graph)
+            self.assertEqual((self.graph.get_mc(), self.graph.e_size()), (graph.get_mc(), graph.e_size()))
+            self.assertEqual((1, 2, 3), graph.get_node(7).get_location())
+            # the copy has no listeners and no snapshot, and changes on its own
+            self.assertIsNot(snapshot, graph.snapshot())
+            self.assertTrue(graph.add_node(8, (4, 5, 6)))
+            self.assertTrue(graph.set_location(7, (0, 0, 0)))
+        self.assertEqual([], listened)
+        self.assertEqual((1, 2, 3), self.graph.get_node(7).get_location())
+        self.assertNotIn(8, self.graph.get_all_v())
+
     def test_get_node(self):
         node_0 = self.graph.nodes.get(0)
         self.assertEqual(node_0, self.graph.get_node(0))
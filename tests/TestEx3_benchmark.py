@@ -0,0 +1,55 @@
+import copy
+import json
+import os
+import tempfile
+from unittest import TestCase
+from src.Ex3_benchmark import run_suite, compare, save_results, load_results, main
+
+
+class TestEx3Benchmark(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.results = run_suite(["../data/G_10_80_0.json", "../data/G_100_800_0.json"], count=10, repeat=3)
+
+    def test_run_suite(self):
+        self.assertEqual(["G_10_80_0.json", "G_100_800_0.json"], list(self.results["results"].keys()))
+        for operations in self.results["results"].values():
+            self.assertEqual(["load_from_json", "save_to_json", "shortest_path", "connected_component",
+                              "connected_components"], list(operations.keys()))
+            self.assertEqual([3, 3, 10, 10, 3], [result["runs"] for result in operations.values()])
+            for result in operations.values():
+                self.assertTrue(0 < result["median"] <= result["p95"])
+                self.assertTrue(result["peak_memory"] >= 0)
+        self.assertEqual(2, len(self.results["meta"]["calibration"]))
+
+    def test_compare(self):
+        self.assertEqual([], compare(self.results, self.results))
+        baseline = copy.deepcopy(self.results)
+        result = baseline["results"]["G_100_800_0.json"]["save_to_json"]
+        result["median"] /= 3
+        result["peak_memory"] /= 3
+        regressions = compare(self.results, baseline, floor=0)
+        self.assertEqual(2, len(regressions))
+        self.assertTrue(all(r.startswith("G_100_800_0.json save_to_json") for r in regressions))
+        # the current run was measured on a machine 3 times slower, only the memory regressed
+        current = copy.deepcopy(self.results)
+        for calibration in current["meta"]["calibration"]:
+            current["meta"]["calibration"][calibration] *= 3
+        self.assertEqual(["peak memory"], [r.split(": ")[1][:11] for r in compare(current, baseline, floor=0)])
+        # operations and graphs that are not in the baseline are ignored
+        del baseline["results"]["G_100_800_0.json"]
+        self.assertEqual([], compare(self.results, baseline))
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "results.json")
+            save_results(self.results, out)
+            self.assertEqual(json.loads(json.dumps(self.results)), load_results(out))
+            args = ["suite", "--files", "../data/G_10_80_0.json", "--count", "5", "--repeat", "2"]
+            self.assertEqual(0, main(args + ["--out", out]))
+            baseline = load_results(out)
+            for result in baseline["results"]["G_10_80_0.json"].values():
+                result["peak_memory"] = 1
+            save_results(baseline, out)
+            self.assertEqual(1, main(args + ["--baseline", out]))
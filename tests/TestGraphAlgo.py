@@ -1,7 +1,20 @@
+import filecmp
+import io
+import itertools
+import json
+import os
+import random
+import tempfile
+import threading
+import time
 from unittest import TestCase
 
 from src.DiGraph import DiGraph
 from src.GraphAlgo import GraphAlgo
+from src.AlgoStats import StatsHook, ProfileHook
+from src.ResultCache import ResultCache
+from src.GraphPool import GraphPool
+import numpy as np
 from numpy import inf
 
 
@@ -16,6 +29,24 @@ class TestGraphAlgo(TestCase):
         self.assertTrue(self.ga.load_from_json("../data/G_10_80_1.json"))
         self.assertTrue(self.ga.load_from_json("../data/G_10_80_2.json"))
 
+    def test_load_from_json_records(self):
+        for file in ("../data/G_100_800_0.json", "../data/A5_edited", "../data/T0.json_saved"):
+            with open(file) as f:
+                expected = json.load(f)
+            # small batches and the default batches give the same graph
+            self.assertTrue(self.ga.load_from_json(file, batch_size=7))
+            graph = self.ga.get_graph()
+            self.assertEqual(len(expected["Nodes"]), graph.v_size())
+            # self loops are not added (see DiGraph.add_edge)
+            edges = [edge for edge in expected["Edges"] if edge["src"] != edge["dest"]]
+            self.assertEqual(len(edges), graph.e_size())
+            for edge in edges:
+                self.assertEqual(edge["w"], graph.all_out_edges_of_node(edge["src"])[edge["dest"]])
+            self.ga.load_from_json(file)
+            # nodes without position get a random one, so only the edges are compared
+            self.assertEqual(graph.as_dict()["Edges"], self.ga.get_graph().as_dict()["Edges"])
+        self.assertRaises(Exception, self.ga.load_from_json, "../data/no_such_file.json")
+
     def test_save_to_json(self):
         self.ga.load_from_json("../data/G_10_80_0.json")
         self.assertTrue(self.ga.save_to_json("graph1.json"))
@@ -24,6 +55,48 @@ class TestGraphAlgo(TestCase):
         self.ga.load_from_json("../data/G_10_80_2.json")
         self.assertTrue(self.ga.save_to_json("graph3.json"))
 
+    def test_save_to_json_format(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, "graph.json")
+            for graph in (graph_2, graph_3, DiGraph()):
+                self.ga.graph = graph
+                self.assertTrue(self.ga.save_to_json(file))
+                with open(file) as f:
+                    self.assertEqual(json.dumps(graph.as_dict(), indent=4), f.read())
+                self.assertTrue(self.ga.save_to_json(file, compact=True))
+                with open(file) as f:
+                    text = f.read()
+                self.assertEqual(json.dumps(graph.as_dict(), separators=(',', ':')), text)
+            # a compact file loads back to the same graph
+            self.ga.load_from_json("../data/G_100_800_1.json")
+            self.ga.save_to_json(file, compact=True)
+            ga = GraphAlgo()
+            ga.load_from_json(file)
+            self.assertEqual(self.ga.get_graph().as_dict(), ga.get_graph().as_dict())
+            # a frozen graph is saved the same way
+            self.ga.save_to_json(os.path.join(tmp, "graph2.json"))
+            GraphAlgo(ga.get_graph().freeze()).save_to_json(file)
+            self.assertTrue(filecmp.cmp(file, os.path.join(tmp, "graph2.json"), shallow=False))
+
+    def test_save_and_load_binary(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for file in ("../data/G_100_800_0.json", "../data/A5", "../data/T0.json"):
+                self.ga.load_from_json(file)
+                self.ga.save_to_json(os.path.join(tmp, "graph.json"))
+                self.assertTrue(self.ga.save_binary(os.path.join(tmp, "graph.bin")))
+                for frozen in (False, True):
+                    ga = GraphAlgo()
+                    self.assertTrue(ga.load_binary(os.path.join(tmp, "graph.bin"), frozen))
+                    self.assertEqual(frozen, GraphAlgo.is_compact(ga.get_graph()))
+                    ga.save_to_json(os.path.join(tmp, "graph2.json"))
+                    self.assertTrue(filecmp.cmp(os.path.join(tmp, "graph.json"), os.path.join(tmp, "graph2.json"),
+                                                shallow=False))
+                    self.assertEqual(self.ga.shortest_path(0, 3), ga.shortest_path(0, 3))
+            # a frozen graph is saved as is
+            self.assertTrue(ga.save_binary(os.path.join(tmp, "graph3.bin")))
+            self.assertTrue(filecmp.cmp(os.path.join(tmp, "graph.bin"), os.path.join(tmp, "graph3.bin"), shallow=False))
+            self.assertRaises(Exception, ga.load_binary, os.path.join(tmp, "graph.json"))
+
     def test_shortest_path(self):
         self.ga.graph = graph_2
 
@@ -38,6 +111,353 @@ class TestGraphAlgo(TestCase):
         self.assertRaises(Exception, self.ga.shortest_path, (1, 10))
         self.assertRaises(Exception, self.ga.shortest_path, (9, 10))
 
+    def test_dijkstra(self):
+        self.ga.graph = graph_2
+        self.assertEqual((6, [1, 2, 4, 3, 5, 0, 6]), self.ga.dijkstra(1, 6))
+        self.assertEqual((2, [3, 5, 0]), self.ga.dijkstra(3, 0))
+        self.assertEqual((inf, []), self.ga.dijkstra(6, 1))
+        for i in range(7):
+            for j in range(7):
+                if i != j:
+                    self.assertEqual(self.ga.shortest_paths_from(i).shortest_path(j), self.ga.dijkstra(i, j))
+
+    def test_shortest_path_bidirectional(self):
+        self.ga.graph = graph_2
+        self.assertEqual((6, [1, 2, 4, 3, 5, 0, 6]), self.ga.shortest_path(1, 6, method="bidirectional"))
+        self.assertEqual((0, [2]), self.ga.shortest_path(2, 2, method="bidirectional"))
+        self.assertEqual((inf, []), self.ga.shortest_path(6, 1, method="bidirectional"))
+        for i in range(7):
+            for j in range(7):
+                self.assertEqual(self.ga.shortest_path(i, j)[0], self.ga.shortest_path(i, j, method="bidirectional")[0])
+        self.assertRaises(Exception, self.ga.shortest_path, 1, 10, "bidirectional")
+        self.assertRaises(Exception, self.ga.shortest_path, 1, 6, "no_such_method")
+        self.ga.load_from_json("../data/A5")
+        for i, j in ((1, 7), (47, 19), (20, 2), (2, 20)):
+            self.assertAlmostEqual(self.ga.shortest_path(i, j)[0], self.ga.shortest_path(i, j, "bidirectional")[0])
+
+    def test_shortest_path_astar(self):
+        self.ga.load_from_json("../data/A5")
+        self.assertTrue(self.ga.heuristic_scale() > 1)
+        for i in range(0, 48, 5):
+            for j in range(0, 48, 3):
+                self.assertAlmostEqual(self.ga.shortest_path(i, j)[0], self.ga.shortest_path(i, j, "astar")[0])
+        self.ga.get_graph().remove_edge(13, 14)
+        self.assertAlmostEqual(self.ga.shortest_path(20, 2)[0], self.ga.shortest_path(20, 2, "astar")[0])
+        # the positions of graph_3 are not a lower bound of the weights, the scale makes them one
+        self.ga.graph = graph_3
+        self.assertAlmostEqual(1 / 10 ** 0.5, self.ga.heuristic_scale())
+        self.assertEqual((3, [0, 2, 1, 3]), self.ga.shortest_path(0, 3, "astar"))
+        self.assertEqual((inf, []), self.ga.shortest_path(2, 5, "astar"))
+        # a node without position - falls back to dijkstra
+        graph = DiGraph()
+        graph.add_node(0, (0, 0, 0))
+        graph.add_node(1)
+        graph.add_edge(0, 1, 2)
+        self.ga.graph = graph
+        self.assertEqual(0, self.ga.heuristic_scale())
+        self.assertEqual((2, [0, 1]), self.ga.shortest_path(0, 1, "astar"))
+        # a position is not a change of the mc: moving a node must not leave a heuristic that is too large
+        graph = DiGraph()
+        graph.add_nodes_from([(0, (0, 0, 0)), (1, (1, 0, 0)), (2, (1, 1, 0)), (3, (2, 0, 0))])
+        graph.add_edges_from([(0, 1, 1), (1, 3, 1), (0, 2, 1.5), (2, 3, 1.5)])
+        ga = GraphAlgo(graph)
+        self.assertEqual((2, [0, 1, 3]), ga.a_star(0, 3))
+        graph.set_location(1, (100, 0, 0))
+        self.assertEqual((2, [0, 1, 3]), ga.a_star(0, 3))
+        graph.get_node(1).set_location((200, 0, 0))
+        self.assertEqual((2, [0, 1, 3]), ga.a_star(0, 3))
+
+    def test_shortest_paths_from(self):
+        self.ga.graph = graph_2
+        tree = self.ga.shortest_paths_from(1)
+        self.assertTrue(tree.is_complete())
+        self.assertEqual(6, tree.distance(6))
+        self.assertEqual([1, 2, 4, 3, 5, 0, 6], tree.path(6))
+        self.assertEqual((0, [1]), tree.shortest_path(1))
+        self.assertEqual({0: 5, 1: 0, 2: 1, 3: 3, 4: 2, 5: 4, 6: 6}, tree.distances())
+        # the cached tree is used by shortest_path
+        self.assertEqual((2, [1, 2, 4]), self.ga.shortest_path(1, 4))
+        tree_6 = self.ga.shortest_paths_from(6)
+        self.assertEqual(inf, tree_6.distance(1))
+        self.assertEqual([], tree_6.path(1))
+        self.assertRaises(Exception, self.ga.shortest_paths_from, 10)
+        self.assertRaises(Exception, tree.path, 10)
+
+    def test_shortest_path_ch(self):
+        self.ga.graph = graph_2
+        self.assertEqual((6, [1, 2, 4, 3, 5, 0, 6]), self.ga.shortest_path(1, 6, "ch"))
+        self.assertEqual((inf, []), self.ga.shortest_path(6, 1, "ch"))
+        self.ga.load_from_json("../data/A5")
+        graph = self.ga.get_graph()
+        keys = list(graph.get_all_v().keys())
+        expected = {(i, j): self.ga.shortest_path(i, j) for i in keys for j in keys}
+        ch = self.ga.build_ch()
+        self.assertIs(ch, self.ga.get_ch())
+        for (i, j), result in expected.items():
+            # the default method answers by the hierarchy, "dijkstra" still by the tree
+            self.assertEqual(result, self.ga.shortest_path(i, j, "dijkstra"))
+            dist = result[0]
+            d, path = self.ga.shortest_path(i, j, "ch")
+            self.assertEqual((d, path), self.ga.shortest_path(i, j))
+            self.assertAlmostEqual(dist, d)
+            self.assertEqual((i, j), (path[0], path[-1]))
+            self.assertAlmostEqual(d, sum(graph.all_out_edges_of_node(path[k])[path[k + 1]]
+                                          for k in range(len(path) - 1)))
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, "A5.ch")
+            self.assertTrue(self.ga.save_ch(file))
+            ga = GraphAlgo()
+            ga.load_from_json("../data/A5")
+            self.assertTrue(ga.load_ch(file))
+            for i, j in ((1, 7), (47, 19), (20, 2)):
+                self.assertEqual(self.ga.shortest_path(i, j, "ch"), ga.shortest_path(i, j, "ch"))
+            # a change in the graph drops the hierarchy, and a saved hierarchy does not fit the changed graph
+            graph.remove_edge(13, 14)
+            self.assertIsNone(self.ga.get_ch())
+            self.assertEqual(GraphAlgo(graph).shortest_path(20, 1), self.ga.shortest_path(20, 1))
+            self.assertIsNone(self.ga.get_ch())
+            self.assertAlmostEqual(GraphAlgo(graph).dijkstra(20, 2)[0], self.ga.shortest_path(20, 2, "ch")[0])
+            self.assertRaises(Exception, self.ga.load_ch, file)
+
+    def test_shortest_path_ch_core(self):
+        # on a random graph most of the nodes stay in the core, the query must not cost more than bidirectional
+        self.ga.load_from_json("../data/G_1000_8000_0.json")
+        ch = self.ga.build_ch()
+        self.assertGreater(sum(1 for r in ch.rank if r == ch.core_rank), 1)
+        rnd = random.Random(3)
+        keys = list(self.ga.get_graph().get_all_v().keys())
+        pairs = [(rnd.choice(keys), rnd.choice(keys)) for _ in range(100)]
+        settled = {}
+        for method in ("bidirectional", "ch"):
+            hook = self.ga.set_hook(StatsHook())
+            for i, j in pairs:
+                self.ga.shortest_path(i, j, method)
+            settled[method] = sum(stats.settled for stats in hook.calls)
+        self.ga.set_hook(None)
+        self.assertLessEqual(settled["ch"], settled["bidirectional"])
+        for i, j in pairs[:20]:
+            self.assertAlmostEqual(self.ga.dijkstra(i, j)[0], self.ga.shortest_path(i, j, "ch")[0])
+        # the build gives up early on a random graph: only the popped nodes run witness searches
+        ga = GraphAlgo()
+        ga.load_from_json("../data/G_10000_80000_0.json")
+        start = time.perf_counter()
+        ch = ga.build_ch()
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertAlmostEqual(ga.dijkstra(0, 9999)[0], ga.shortest_path(0, 9999, "ch")[0])
+
+    def test_shortest_path_alt(self):
+        self.ga.graph = graph_3
+        self.assertEqual((3, [0, 2, 1, 3]), self.ga.shortest_path(0, 3, "alt"))
+        self.assertEqual((inf, []), self.ga.shortest_path(2, 5, "alt"))
+        self.assertEqual(inf, self.ga.estimate_distance(4, 0))
+        self.assertEqual(0, self.ga.estimate_distance(4, 4))
+        self.ga.load_from_json("../data/G_100_800_0.json")
+        keys = list(self.ga.get_graph().get_all_v().keys())
+        landmarks = self.ga.build_landmarks(k=4)
+        self.assertEqual(4, len(set(landmarks.get_landmarks())))
+        for i in keys[::7]:
+            for j in keys[::3]:
+                dist = self.ga.dijkstra(i, j)[0]
+                self.assertAlmostEqual(dist, self.ga.shortest_path(i, j, "astar")[0])
+                lower, upper = landmarks.bounds(i, j)
+                self.assertTrue(lower <= self.ga.estimate_distance(i, j) <= dist + 1e-9 <= upper + 2e-9)
+        self.assertRaises(Exception, self.ga.estimate_distance, 0, 1000)
+        # the A* heuristic gives the same bounds, first one node at a time and then for all the nodes at once
+        self.ga.load_from_json("../data/G_1000_8000_0.json")
+        keys = list(self.ga.get_graph().get_all_v().keys())
+        landmarks = self.ga.build_landmarks(k=4)
+        for j in keys[::250]:
+            estimate = landmarks.estimate_to(j)
+            for i in keys:
+                self.assertAlmostEqual(landmarks.bounds(i, j)[0], estimate(i))
+        self.ga.load_from_json("../data/G_100_800_0.json")
+        keys = list(self.ga.get_graph().get_all_v().keys())
+        landmarks = self.ga.build_landmarks(k=4)
+        # a change in the graph drops the index
+        self.ga.get_graph().add_edge(keys[0], keys[1], 0.5)
+        self.assertIsNone(self.ga.get_landmarks())
+        self.assertEqual(0.5, self.ga.shortest_path(keys[0], keys[1], "astar")[0])
+
+    def test_shortest_path_batch(self):
+        self.ga.graph = graph_2
+        pairs = [(1, 6), (3, 0), (2, 2), (6, 1), (1, 0)]
+        results = self.ga.shortest_path_batch(pairs)
+        self.assertFalse(results[0].is_built())
+        self.assertEqual([self.ga.shortest_path(i, j) for i, j in pairs], results)
+        dist, path = results[0]
+        self.assertEqual((6, [1, 2, 4, 3, 5, 0, 6]), (dist, path))
+        self.assertTrue(results[0].is_built())
+        self.assertRaises(Exception, self.ga.shortest_path_batch, [(1, 6), (1, 10)])
+        self.ga.load_from_json("../data/G_1000_8000_2.json")
+        rnd = random.Random(0)
+        keys = list(self.ga.get_graph().get_all_v().keys())
+        pairs = [(rnd.choice(keys[:10]), rnd.choice(keys)) for _ in range(60)]
+        expected = [self.ga.dijkstra(i, j) for i, j in pairs]
+        self.assertEqual(expected, [r.as_tuple() for r in self.ga.shortest_path_batch(pairs)])
+        results = self.ga.shortest_path_batch(pairs, workers=2)
+        self.assertEqual([d for d, _ in expected], [r.distance for r in results])
+        # equal paths may differ, a path of a worker has the same ends and weight
+        for (src, dest), (dist, path) in zip(pairs, results):
+            self.assertEqual((src, dest), (path[0], path[-1]))
+            self.assertAlmostEqual(dist, sum(self.ga.get_graph().all_out_edges_of_node(path[k])[path[k + 1]]
+                                             for k in range(len(path) - 1)))
+        # a pool of the caller must hold this graph at its current version
+        with GraphPool(self.ga.get_graph(), 1) as pool:
+            self.assertEqual([d for d, _ in expected], [r.distance for r in self.ga.shortest_path_batch(pairs,
+                                                                                                       pool=pool)])
+            self.assertRaises(Exception, GraphAlgo(graph_2).shortest_path_batch, [(1, 6)], pool=pool)
+            graph = self.ga.get_graph()
+            self.assertTrue(graph.remove_edge(keys[0], next(iter(graph.all_out_edges_of_node(keys[0])))))
+            self.assertRaises(Exception, self.ga.shortest_path_batch, pairs, pool=pool)
+            # a new version of the graph runs on the same workers
+            old_file = pool.get_file()
+            pool.load(graph)
+            self.assertTrue(pool.matches(graph))
+            pool.remove(old_file)
+            expected = [self.ga.dijkstra(i, j)[0] for i, j in pairs]
+            self.assertEqual(expected, [r.distance for r in self.ga.shortest_path_batch(pairs, pool=pool)])
+
+    def test_tsp(self):
+        self.ga.graph = graph_2
+        self.assertEqual(([1], 0), self.ga.tsp([1, 1]))
+        # any order of the nodes: 1 --> 6 and no path from 6
+        self.assertEqual(([1, 2, 4, 3, 5, 0, 6], 6), self.ga.tsp([6, 1]))
+        graph = DiGraph()
+        graph.add_nodes_from([0, 1, 2])
+        graph.add_edge(0, 1, 1)
+        self.assertEqual(([], inf), GraphAlgo(graph).tsp([0, 1, 2]))
+        self.assertRaises(Exception, self.ga.tsp, [1, 10])
+        # no path back to 0: 2-opt still improves the nearest neighbour route 0, 1, 2, 3 (cost 12)
+        graph = DiGraph()
+        graph.add_nodes_from(range(4))
+        graph.add_edges_from([(0, 1, 1), (1, 2, 1), (2, 3, 10), (3, 2, 1), (1, 3, 1.5), (2, 1, 100)])
+        self.assertEqual(([0, 1, 3, 2], 3.5), GraphAlgo(graph).tsp([0, 1, 2, 3]))
+        # nearest neighbour gets stuck from every start (at 3), the exact search finds 0, 1, 2, 3
+        graph = DiGraph()
+        graph.add_nodes_from(range(4))
+        graph.add_edges_from([(0, 1, 10), (1, 2, 10), (2, 3, 10), (0, 3, 1), (1, 0, 1)])
+        self.assertEqual(([0, 1, 2, 3], 30), GraphAlgo(graph).tsp([0, 1, 2, 3]))
+        # a sink that every node reaches at 0.1: nearest neighbour is stuck from every start,
+        # above tsp_exact_nodes the beam search still finds the route quickly
+        k = 20
+        graph = DiGraph()
+        graph.add_nodes_from(range(k))
+        graph.add_edges_from([(i, j, 1) for i in range(k - 1) for j in range(k - 1) if i != j] +
+                             [(i, k - 1, 0.1) for i in range(k - 1)])
+        start = time.perf_counter()
+        path, cost = GraphAlgo(graph).tsp(list(range(k)))
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual((k - 1, k - 1.9), (path[-1], round(cost, 9)))
+        self.assertEqual(set(range(k)), set(path))
+        for file in ("../data/A5", "../data/G_100_800_1.json"):
+            self.ga.load_from_json(file)
+            graph = self.ga.get_graph()
+            rnd = random.Random(1)
+            for k in (2, 4, 6):
+                nodes = rnd.sample(list(graph.get_all_v().keys()), k)
+                path, cost = self.ga.tsp(nodes)
+                self.assertEqual(set(nodes), set(nodes).intersection(path))
+                self.assertAlmostEqual(cost, sum(graph.all_out_edges_of_node(path[t])[path[t + 1]]
+                                                 for t in range(len(path) - 1)))
+                best = min(sum(self.ga.shortest_path(i, j)[0] for i, j in zip(order, order[1:]))
+                           for order in itertools.permutations(nodes))
+                self.assertTrue(best - 1e-9 <= cost <= best * 1.2)
+
+    def test_center_point(self):
+        self.ga.graph = graph_2
+        self.assertEqual(6, self.ga.eccentricity(1))
+        self.assertEqual(inf, self.ga.eccentricity(6))
+        self.assertEqual(inf, self.ga.diameter())
+        center, ecc = self.ga.center_point()
+        self.assertEqual(min(self.ga.eccentricity(k) for k in range(7)), ecc)
+        self.assertEqual(ecc, self.ga.eccentricity(center))
+        # graph_3 has more than one component that no component reaches
+        self.ga.graph = graph_3
+        self.assertEqual((None, inf), self.ga.center_point())
+        for file in ("../data/G_100_800_0.json", "../data/G_100_800_2.json", "../data/A5"):
+            self.ga.load_from_json(file)
+            # no SCCIndex (a listener of the graph) is left behind
+            listeners = []
+            self.ga.get_graph().add_listener = listeners.append
+            eccentricities = self.ga.all_pairs_shortest_paths(workers=1).max(axis=1)
+            center, ecc = self.ga.center_point()
+            self.assertEqual(eccentricities.min(), ecc)
+            self.assertEqual(ecc, self.ga.eccentricity(center))
+            self.assertEqual(eccentricities.max(), self.ga.diameter())
+            self.assertEqual((center, ecc), GraphAlgo(self.ga.get_graph().freeze()).center_point())
+            self.assertEqual([], listeners)
+
+    def test_all_pairs_shortest_paths(self):
+        self.ga.graph = graph_2
+        matrix = self.ga.all_pairs_shortest_paths(workers=1)
+        self.assertEqual((7, 7), matrix.shape)
+        for i in range(7):
+            for j in range(7):
+                self.assertEqual(self.ga.shortest_path(i, j)[0], matrix[i][j])
+        self.ga.load_from_json("../data/G_100_800_0.json")
+        expected = self.ga.all_pairs_shortest_paths(workers=1)
+        keys = list(self.ga.get_graph().get_all_v().keys())
+        self.assertAlmostEqual(self.ga.shortest_path(keys[3], keys[70])[0], expected[3][70])
+        self.assertTrue((expected == self.ga.all_pairs_shortest_paths(workers=2)).all())
+        matrix = GraphAlgo(self.ga.get_graph().freeze()).all_pairs_shortest_paths(workers=2, dtype="float32")
+        self.assertTrue((expected.astype("float32") == matrix).all())
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, "matrix.npy")
+            self.ga.all_pairs_shortest_paths(workers=2, file_name=file)
+            self.assertTrue((expected == np.load(file, mmap_mode="r")).all())
+
+    def test_shortest_path_cache_invalidation(self):
+        graph = DiGraph()
+        for i in range(3):
+            graph.add_node(i)
+        graph.add_edge(0, 1, 1)
+        graph.add_edge(1, 2, 1)
+        self.ga.graph = graph
+        self.assertEqual((2, [0, 1, 2]), self.ga.shortest_path(0, 2))
+        graph.add_edge(0, 2, 1.5)
+        self.assertEqual((1.5, [0, 2]), self.ga.shortest_path(0, 2))
+        graph.remove_edge(0, 2)
+        graph.remove_edge(1, 2)
+        self.assertEqual((inf, []), self.ga.shortest_path(0, 2))
+
+    def test_snapshot_readers(self):
+        self.ga.load_from_json("../data/G_100_800_0.json")
+        graph = self.ga.get_graph()
+        keys = list(graph.get_all_v().keys())
+        stop, errors = threading.Event(), []
+
+        def writer():
+            rnd = random.Random(0)
+            while not stop.is_set():
+                src = rnd.choice(keys)
+                if not graph.add_edge(src, rnd.choice(keys), rnd.random() * 10):
+                    graph.remove_edge(src, rnd.choice(list(graph.all_out_edges_of_node(src)) or keys))
+
+        def reader(seed):
+            rnd = random.Random(seed)
+            try:
+                for _ in range(30):
+                    snapshot = graph.snapshot()
+                    mc, src, dest = snapshot.get_mc(), rnd.choice(keys), rnd.choice(keys)
+                    dist = GraphAlgo(snapshot).shortest_path(src, dest)[0]
+                    self.assertAlmostEqual(GraphAlgo(snapshot.thaw()).dijkstra(src, dest)[0], dist)
+                    self.assertEqual(len(GraphAlgo(snapshot.thaw()).SCC()),
+                                     len(GraphAlgo(snapshot).connected_components()))
+                    self.assertEqual(mc, snapshot.get_mc())
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(3)]
+        write = threading.Thread(target=writer)
+        write.start()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        stop.set()
+        write.join()
+        self.assertEqual([], errors)
+
     def test_connected_component(self):
         self.ga.graph = graph_3
         for i in range(0, 10):
@@ -57,6 +477,89 @@ class TestGraphAlgo(TestCase):
         self.ga.graph = graph_3
         self.assertEqual([[8, 9, 7], [5], [6], [2, 1, 0], [4, 3]], self.ga.connected_components())
 
+    def test_connected_components_tarjan(self):
+        self.ga.graph = graph_3
+        self.assertEqual([[4, 3], [1, 2, 0], [6], [5], [9, 8, 7]], self.ga.tarjan())
+        self.assertRaises(Exception, self.ga.connected_components, "no_such_algorithm")
+        # the index is built again by the algorithm that is asked for
+        self.assertEqual(self.ga.SCC(), self.ga.connected_components())
+        self.assertEqual(self.ga.tarjan(), self.ga.connected_components(algorithm="tarjan"))
+        self.assertEqual(self.ga.SCC(), self.ga.connected_components(algorithm="kosaraju"))
+        for file in ("../data/G_1000_8000_0.json", "../data/A5", "../data/T0.json"):
+            self.ga.load_from_json(file)
+            expected = sorted(sorted(c) for c in self.ga.SCC())
+            self.assertEqual(expected, sorted(sorted(c) for c in self.ga.connected_components(algorithm="tarjan")))
+            self.assertEqual(expected, sorted(sorted(c) for c in GraphAlgo(self.ga.get_graph().freeze()).tarjan()))
+        # a long path is deeper than the recursion limit
+        graph = DiGraph()
+        graph.add_nodes_from(range(5000))
+        graph.add_edges_from((i, i + 1, 1) for i in range(4999))
+        graph.add_edge(4999, 0, 1)
+        self.assertEqual([list(range(4999, -1, -1))], GraphAlgo(graph).tarjan())
+
+    def test_component_of(self):
+        for graph in (graph_2, graph_3):
+            self.ga.graph = graph
+            for key in graph.get_all_v():
+                self.assertEqual(sorted(self.ga.SCC(key)), sorted(self.ga.component_of(key)))
+        self.ga.load_from_json("../data/G_1000_8000_1.json")
+        components = self.ga.SCC()
+        for ga in (self.ga, GraphAlgo(self.ga.get_graph().freeze())):
+            for component in components:
+                self.assertEqual(sorted(component), sorted(ga.component_of(component[-1])))
+
+    def test_connected_components_incremental(self):
+        rnd = random.Random(3)
+        for batch in (1, 7, 100):
+            graph = DiGraph()
+            for i in range(40):
+                graph.add_node(i)
+            for _ in range(60):
+                graph.add_edge(rnd.randrange(40), rnd.randrange(40), 1)
+            self.ga.graph = graph
+            self.ga.connected_components()
+            next_node = 40
+            for step in range(300):
+                keys = list(graph.get_all_v().keys())
+                action = rnd.random()
+                if action < 0.5:
+                    graph.add_edge(rnd.choice(keys), rnd.choice(keys), rnd.random())
+                elif action < 0.8:
+                    src = rnd.choice(keys)
+                    if graph.all_out_edges_of_node(src):
+                        graph.remove_edge(src, rnd.choice(list(graph.all_out_edges_of_node(src))))
+                elif action < 0.9:
+                    graph.remove_node(rnd.choice(keys))
+                else:
+                    graph.add_nodes_from([next_node, next_node + 1])
+                    graph.add_edges_from([(next_node, rnd.choice(keys), 1), (rnd.choice(keys), next_node, 1)])
+                    next_node += 2
+                if step % batch == 0:
+                    expected = sorted(sorted(c) for c in GraphAlgo(graph).SCC())
+                    self.assertEqual(expected, sorted(sorted(c) for c in self.ga.connected_components()))
+                    key = rnd.choice(list(graph.get_all_v().keys()))
+                    self.assertEqual(sorted(GraphAlgo(graph).SCC(key)), sorted(self.ga.connected_component(key)))
+
+    def test_connected_components_merge_region(self):
+        # a chain 0-->1-->...-->999: an added edge searches only the components between its ends
+        graph = DiGraph()
+        graph.add_nodes_from(range(1000))
+        graph.add_edges_from((i, i + 1, 1) for i in range(999))
+        self.ga.graph = graph
+        self.assertEqual(1000, len(self.ga.connected_components()))
+        searched = []
+        for name in ("all_out_edges_of_node", "all_in_edges_of_node"):
+            edges_of = getattr(graph, name)
+            setattr(graph, name, lambda node_id, edges_of=edges_of: searched.append(node_id) or edges_of(node_id))
+        graph.add_edge(10, 900, 1)
+        self.assertEqual(1000, len(self.ga.connected_components()))
+        self.assertLessEqual(len(searched), 2)
+        searched.clear()
+        graph.add_edge(500, 497, 1)
+        self.assertEqual([497, 498, 499, 500], sorted(self.ga.connected_component(498)))
+        self.assertLessEqual(len(set(searched)), 10)
+        self.assertEqual(997, len(self.ga.connected_components()))
+
     def test_plot_graph(self):
         # plot graph without positions
         self.ga.graph = graph_2
@@ -65,6 +568,180 @@ class TestGraphAlgo(TestCase):
         self.ga.graph = graph_3
         self.ga.plot_graph()
 
+    def test_result_cache(self):
+        self.ga.load_from_json("../data/A5")
+        graph = self.ga.get_graph()
+        cache = self.ga.cache
+        hook = self.ga.set_hook(StatsHook())
+        path = self.ga.shortest_path(1, 7, "bidirectional")
+        path[1].append(100)
+        self.assertEqual({"hits": 0, "misses": 1}, {k: cache.get_stats()[k] for k in ("hits", "misses")})
+        # a hit is a copy of the cached result
+        self.assertEqual(path[1][:-1], self.ga.shortest_path(1, 7, "bidirectional")[1])
+        self.assertEqual(self.ga.shortest_path(1, 7)[0], self.ga.shortest_path(1, 7, "bidirectional")[0])
+        self.assertEqual({"hits": 2, "misses": 2}, {k: cache.get_stats()[k] for k in ("hits", "misses")})
+        component = self.ga.connected_component(3)
+        self.assertEqual(component, self.ga.connected_component(3))
+        components = self.ga.connected_components()
+        self.assertEqual(components, self.ga.connected_components())
+        self.assertEqual(4, cache.get_stats()["hits"])
+        self.assertRaises(Exception, self.ga.connected_components, "no_such_algorithm")
+        # a change of the graph drops the results
+        graph.remove_edge(13, 14)
+        self.assertEqual(self.ga.dijkstra(1, 7), self.ga.shortest_path(1, 7))
+        self.assertEqual(sorted(GraphAlgo(graph).SCC(3)), sorted(self.ga.connected_component(3)))
+        stats = cache.get_stats()
+        self.assertEqual((1, 2), (stats["invalidations"], stats["size"]))
+        # so does another graph
+        self.ga.load_from_json("../data/A5")
+        self.ga.shortest_path(0, 1)
+        self.assertEqual((2, 1), (cache.get_stats()["invalidations"], len(cache)))
+        # the least recently used results are evicted by capacity and by size
+        self.ga.cache = ResultCache(capacity=3)
+        for i in range(5):
+            self.ga.shortest_path(0, i)
+        self.ga.shortest_path(0, 2)
+        self.ga.shortest_path(0, 0)
+        self.assertEqual({"hits": 1, "misses": 6, "evictions": 3, "size": 3},
+                         {k: v for k, v in self.ga.cache.get_stats().items() if k in ("hits", "misses", "evictions",
+                                                                                        "size")})
+        self.ga.cache = ResultCache(max_bytes=ResultCache.size_of(2) * 3)
+        for i in range(5):
+            self.ga.shortest_path(0, i)
+        self.assertEqual(2, len(self.ga.cache))
+        self.ga.connected_components()
+        self.assertEqual(2, len(self.ga.cache))
+        # nothing is cached, the search runs every time (the components are kept by the SCCIndex)
+        self.ga.cache = ResultCache(capacity=0)
+        hook.reset()
+        self.ga.connected_components()
+        self.ga.connected_components()
+        self.ga.shortest_path(0, 4, "bidirectional")
+        self.ga.shortest_path(0, 4, "bidirectional")
+        self.assertEqual(0, len(self.ga.cache))
+        self.assertEqual({"shortest_path": 2}, {k: v["calls"] for k, v in hook.totals.items()})
+        self.ga.set_hook(None)
+
+    def test_stats_hook(self):
+        calls = []
+        hook = StatsHook(callback=calls.append)
+        self.ga.graph = graph_2
+        self.ga.dijkstra(1, 6)
+        self.assertIsNone(self.ga.get_hook())
+        self.assertIs(hook, self.ga.set_hook(hook))
+        frozen = GraphAlgo(graph_2.freeze())
+        frozen.set_hook(hook)
+        # 1 -> 2 -> 4 -> 3 -> 5 -> 0 -> 6, the entries (8, 0) and (9, 6) are left in the queue
+        for ga in (self.ga, frozen):
+            self.assertEqual((6, [1, 2, 4, 3, 5, 0, 6]), ga.dijkstra(1, 6))
+            stats = hook.calls[-1]
+            self.assertEqual(("dijkstra", 7, 19), (stats.name, stats.v_size, stats.e_size))
+            self.assertEqual((7, 19, 9, 0), (stats.settled, stats.relaxed, stats.pushes, stats.stale_pops))
+            self.assertTrue(stats.seconds > 0)
+            # the two dfs runs of Kosaraju's algorithm settle every node and scan every edge once
+            ga.SCC()
+            stats = hook.calls[-1]
+            self.assertEqual(("SCC", 14, 38), (stats.name, stats.settled, stats.relaxed))
+            self.assertEqual(stats.pushes, stats.settled + stats.stale_pops)
+        self.assertEqual([stats.as_dict() for stats in hook.calls], [stats.as_dict() for stats in calls])
+        self.assertEqual({"dijkstra": 2, "SCC": 2}, {k: v["calls"] for k, v in hook.totals.items()})
+        self.ga.load_from_json("../data/A5")
+        self.assertEqual(("load_from_json", 48, 166), (calls[-1].name, calls[-1].settled, calls[-1].relaxed))
+        self.ga.dfs(self.ga.get_graph(), 0, {k: 0 for k in self.ga.get_graph().get_all_v()}, [])
+        self.assertEqual(("dfs", 48, 166), (calls[-1].name, calls[-1].settled, calls[-1].relaxed))
+        hook.reset()
+        self.ga.set_hook(None)
+        self.ga.SCC()
+        self.assertEqual(0, len(hook.calls))
+
+    def test_shortest_path_hook(self):
+        for ga in (GraphAlgo(graph_2), GraphAlgo(graph_2.freeze())):
+            hook = ga.set_hook(StatsHook())
+            # the tree of 1 grows until 6 is settled, then the query from 1 to 0 is answered by the same tree
+            self.assertEqual((6, [1, 2, 4, 3, 5, 0, 6]), ga.shortest_path(1, 6))
+            stats = hook.calls[-1]
+            self.assertEqual(("shortest_path", 7, 19), (stats.name, stats.v_size, stats.e_size))
+            self.assertEqual((7, 19, 8, 0), (stats.settled, stats.relaxed, stats.pushes, stats.stale_pops))
+            ga.shortest_path(1, 0)
+            self.assertEqual((0, 0, 0), (hook.calls[-1].settled, hook.calls[-1].relaxed, hook.calls[-1].pushes))
+            # a cached result runs no search
+            ga.shortest_path(1, 6)
+            self.assertEqual(2, hook.totals["shortest_path"]["calls"])
+            for method in ("bidirectional", "astar", "alt", "ch"):
+                self.assertEqual((6, [1, 2, 4, 3, 5, 0, 6]), ga.shortest_path(1, 6, method))
+                stats = hook.calls[-1]
+                self.assertEqual("shortest_path", stats.name)
+                self.assertTrue(0 < stats.settled <= 7 and stats.pushes >= stats.settled)
+            self.assertEqual(((6, 14, 11), (4, 6, 7)), tuple((stats.settled, stats.relaxed, stats.pushes)
+                                                            for stats in (hook.calls[-4], hook.calls[-1])))
+            self.assertEqual(6, hook.totals["shortest_path"]["calls"])
+
+    def test_check(self):
+        def stop():
+            raise TimeoutError('stop')
+
+        for ga in (GraphAlgo(graph_2), GraphAlgo(graph_2.freeze())):
+            # every search checks (at least once, then every 64 steps)
+            calls = []
+            ga.set_check(lambda: calls.append(1))
+            self.assertEqual((6, [1, 2, 4, 3, 5, 0, 6]), ga.dijkstra(1, 6))
+            self.assertEqual(1, len(calls))
+            for method in ("dijkstra", "bidirectional", "astar", "ch"):
+                ga.cache.clear()
+                self.assertEqual((6, [1, 2, 4, 3, 5, 0, 6]), ga.shortest_path(1, 6, method))
+            self.assertEqual(5, len(calls))
+            for search in (ga.SCC, ga.tarjan, lambda: ga.component_of(3)):
+                checks = len(calls)
+                search()
+                self.assertTrue(len(calls) > checks)
+            # a stopped search leaves the tree of its source as it was, the next query grows it
+            ga.cache.clear()
+            ga.set_check(stop)
+            for method in ("dijkstra", "bidirectional", "astar", "ch"):
+                self.assertRaises(TimeoutError, ga.shortest_path, 3, 6, method)
+            self.assertRaises(TimeoutError, ga.connected_components)
+            self.assertRaises(TimeoutError, ga.component_of, 3)
+            ga.set_check(None)
+            self.assertEqual(ga.dijkstra(3, 6), ga.shortest_path(3, 6))
+            self.assertEqual(GraphAlgo(graph_2).connected_components(), ga.connected_components())
+
+    def test_profile_hook(self):
+        hook = ProfileHook()
+        self.ga.set_hook(hook)
+        self.assertIsNone(hook.get_profile())
+        self.ga.load_from_json("../data/A5")
+        for i in range(10):
+            self.ga.dijkstra(0, i)
+        self.assertEqual(11, hook.profiled)
+        out = io.StringIO()
+        hook.print_profile(stream=out)
+        self.assertIn("__dijkstra", out.getvalue())
+        # no call is sampled
+        hook = ProfileHook(rate=0)
+        self.ga.set_hook(hook)
+        self.ga.SCC()
+        self.assertEqual((0, 1), (hook.profiled, len(hook.calls)))
+        self.assertIsNone(hook.get_profile())
+
+    def test_plot_graph_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            file = os.path.join(tmp, "graph_2.png")
+            self.ga.graph = graph_2
+            locations = {k: node.get_location() for k, node in graph_2.get_all_v().items()}
+            self.assertIn(None, locations.values())
+            self.ga.plot_graph(file, labels=True, arrows=True)
+            self.assertTrue(os.path.getsize(file) > 0)
+            # the random positions are for the plot only, the graph is not changed
+            self.assertEqual(locations, {k: node.get_location() for k, node in graph_2.get_all_v().items()})
+            # more than 5000 edges: drawn by one LineCollection, without arrows and ids
+            self.assertTrue(self.ga.load_from_json("../data/G_1000_8000_0.json"))
+            file = os.path.join(tmp, "G_1000.png")
+            self.ga.plot_graph(file)
+            self.assertTrue(os.path.isfile(file))
+            self.assertTrue(os.path.getsize(file) > 0)
+            self.ga.plot_graph(file, labels=False, arrows=False)
+            self.assertTrue(os.path.getsize(file) > 0)
+
 
 # graph creator, |V|=7, |E|=19
 graph_2 = DiGraph()